@@ -0,0 +1,65 @@
+import os
+
+# OCR engines for the OCR worker. Each engine turns one page image (PNG or JPEG bytes) into
+# text fragments with pixel bounding boxes; heavy libraries are imported only when an
+# engine is created, so nothing here costs anything until it is used.
+
+
+class OCREngine:
+    """Interface every engine implements."""
+
+    name = 'base'
+
+    def recognize(self, image: bytes) -> list:
+        """Returns [{'text', 'bbox': [x0, top, x1, bottom] in pixels, 'confidence'}] for one image."""
+        raise NotImplementedError
+
+
+class StubOCREngine(OCREngine):
+    """
+    Engine without any model, for local runs and tests of the worker: returns the given
+    lines (or one placeholder line) for every image, stacked 20 px apart.
+    """
+
+    name = 'stub'
+
+    def __init__(self, lines: list = None):
+        self.lines = lines or [os.environ.get('STUB_OCR_TEXT', 'Stub OCR text')]
+        self.calls = 0
+
+    def recognize(self, image: bytes) -> list:
+        self.calls += 1
+        return [{'text': text, 'bbox': [10, 10 + 20 * index, 10 + 8 * len(text), 26 + 20 * index], 'confidence': 1.0}
+                for index, text in enumerate(self.lines)]
+
+
+class EasyOCREngine(OCREngine):
+    """EasyOCR on CPU. The model is loaded once per container, on first use."""
+
+    name = 'easyocr'
+
+    def __init__(self, languages: tuple = ('en',)):
+        import easyocr
+        self.reader = easyocr.Reader(list(languages), gpu=False,
+                                     model_storage_directory=os.environ.get('EASYOCR_MODEL_DIR'),
+                                     download_enabled=os.environ.get('EASYOCR_DOWNLOAD', 'false') == 'true')
+
+    def recognize(self, image: bytes) -> list:
+        fragments = []
+        for points, text, confidence in self.reader.readtext(image):
+            xs, ys = [point[0] for point in points], [point[1] for point in points]
+            fragments.append({'text': text, 'bbox': [min(xs), min(ys), max(xs), max(ys)],
+                              'confidence': round(float(confidence), 3)})
+        return fragments
+
+
+ENGINES = {
+    StubOCREngine.name: StubOCREngine,
+    EasyOCREngine.name: EasyOCREngine,
+}
+
+
+def create_engine(name: str) -> OCREngine:
+    if name not in ENGINES:
+        raise ValueError(f"Unknown OCR engine '{name}'. Available: {', '.join(sorted(ENGINES))}.")
+    return ENGINES[name]()
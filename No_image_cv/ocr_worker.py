@@ -0,0 +1,216 @@
+import json
+import logging
+import os
+import struct
+import time
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from urllib.parse import unquote_plus
+
+import boto3
+from pdfminer.pdfdocument import PDFDocument
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser
+from pdfminer.pdftypes import PDFStream, resolve1
+from pdfminer.psparser import LIT
+
+# The shared helper modules live in all_lambda_functions/ and are copied into this image.
+from layout_document import build_layout, layout_key
+from ocr_engines import create_engine
+
+# OCR worker for the PDFs text_extraction routes to routed/image_only/ (scanned CVs). It is
+# deployed on its own, as a container image (see Dockerfile), because the OCR libraries are
+# far beyond the 250 MB zip limit; the text extraction Lambda never imports any of this.
+# Triggered by the IMAGE_ONLY_QUEUE_URL queue or by S3 events on the routed/image_only/ prefix.
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+s3 = boto3.client('s3')
+DEST_BUCKET = 'ENTER YOUR BUCKET'
+IMAGE_ONLY_PREFIX = 'routed/image_only/'
+OCR_ENGINE = os.environ.get('OCR_ENGINE', 'easyocr')
+# Pages recognized at the same time. Keep it at or below the function's vCPU count.
+OCR_MAX_WORKERS = int(os.environ.get('OCR_MAX_WORKERS', 2))
+# Only the first pages of a scanned CV are recognized.
+OCR_MAX_PAGES = int(os.environ.get('OCR_MAX_PAGES', 5))
+
+_IMAGE = LIT('Image')
+_engine = None
+
+
+def get_engine():
+    """Creates the engine on first use, so the model loads once per container."""
+    global _engine
+    if _engine is None:
+        started = time.perf_counter()
+        _engine = create_engine(OCR_ENGINE)
+        logger.info(f"Loaded OCR engine '{OCR_ENGINE}' in {time.perf_counter() - started:.1f}s")
+    return _engine
+
+
+# Each byte of 1-bit samples as eight 8-bit samples (0 or 255), most significant bit first.
+_EXPAND_BITS = [bytes(255 if byte & (0x80 >> bit) else 0 for bit in range(8)) for byte in range(256)]
+
+
+def _png(width: int, height: int, components: int, bits: int, pixels: bytes) -> bytes:
+    """
+    Wraps raw grayscale or RGB pixel rows in a minimal PNG. PNG allows a bit depth of 1
+    for grayscale only, so 1-bit RGB rows are expanded to 8 bits per sample first.
+    """
+    def chunk(kind, data):
+        return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data) & 0xffffffff)
+
+    row_bytes = (width * components * bits + 7) // 8
+    if bits == 1 and components != 1:
+        samples = width * components
+        pixels = b''.join(b''.join(_EXPAND_BITS[byte] for byte in pixels[row * row_bytes:(row + 1) * row_bytes])[:samples]
+                          for row in range(height))
+        bits, row_bytes = 8, samples
+    rows = b''.join(b'\x00' + pixels[row * row_bytes:(row + 1) * row_bytes] for row in range(height))
+    header = struct.pack('>IIBBBBB', width, height, bits, 0 if components == 1 else 2, 0, 0, 0)
+    return b'\x89PNG\r\n\x1a\n' + chunk(b'IHDR', header) + chunk(b'IDAT', zlib.compress(rows)) + chunk(b'IEND', b'')
+
+
+def _components(color_space) -> int:
+    color_space = resolve1(color_space)
+    if isinstance(color_space, list) and color_space and resolve1(color_space[0]) is LIT('ICCBased'):
+        return resolve1(color_space[1]).get('N', 0)
+    return {LIT('DeviceGray'): 1, LIT('CalGray'): 1, LIT('DeviceRGB'): 3, LIT('CalRGB'): 3}.get(color_space, 0)
+
+
+def image_bytes(stream: PDFStream):
+    """
+    Returns (PNG or JPEG bytes, width, height) for an image XObject, or None when its
+    encoding (CCITT, JBIG2, indexed or CMYK colour) would need an image library.
+    """
+    filter_names = {getattr(name, 'name', None) for name, _ in stream.get_filters()}
+    width, height = resolve1(stream.get('Width')), resolve1(stream.get('Height'))
+    if filter_names & {'DCTDecode', 'JPXDecode'}:
+        return stream.get_rawdata(), width, height
+    if filter_names <= {'FlateDecode', 'LZWDecode'}:
+        components = _components(stream.get('ColorSpace'))
+        bits = resolve1(stream.get('BitsPerComponent', 8))
+        if components and bits in (1, 8):
+            return _png(width, height, components, bits, stream.get_data()), width, height
+    return None
+
+
+def page_images(pdf_bytes: bytes, max_pages: int = OCR_MAX_PAGES) -> list:
+    """Returns [(page number, [(image bytes, width, height), ...])] for the first max_pages pages."""
+    document = PDFDocument(PDFParser(BytesIO(pdf_bytes)))
+    pages = []
+    for number, page in enumerate(PDFPage.create_pages(document), start=1):
+        if number > max_pages:
+            break
+        images = []
+        xobjects = resolve1(resolve1(page.resources or {}).get('XObject')) or {}
+        for name, xobject in xobjects.items():
+            xobject = resolve1(xobject)
+            if isinstance(xobject, PDFStream) and xobject.get('Subtype') is _IMAGE:
+                image = image_bytes(xobject)
+                if image:
+                    images.append(image)
+                else:
+                    logger.warning(f"Page {number}: image '{name}' has an unsupported encoding, skipped.")
+        pages.append((number, images))
+    return pages
+
+
+def group_lines(fragments: list) -> list:
+    """Joins OCR fragments whose vertical centres line up into lines, top to bottom, left to right."""
+    lines = []
+    for fragment in sorted(fragments, key=lambda item: (item['bbox'][1], item['bbox'][0])):
+        x0, top, x1, bottom = fragment['bbox']
+        centre = (top + bottom) / 2
+        for line in lines:
+            if abs(line['centre'] - centre) <= (line['bottom'] - line['top']) / 2:
+                line['fragments'].append(fragment)
+                line['top'], line['bottom'] = min(line['top'], top), max(line['bottom'], bottom)
+                break
+        else:
+            lines.append({'centre': centre, 'top': top, 'bottom': bottom, 'fragments': [fragment]})
+    return [sorted(line['fragments'], key=lambda item: item['bbox'][0]) for line in lines]
+
+
+def ocr_page(number: int, images: list) -> dict:
+    """Recognizes every image on a page and returns the page record of a layout document."""
+    engine = get_engine()
+    width = max((image[1] for image in images), default=0)
+    height = sum(image[2] for image in images)
+    lines, offset = [], 0
+    # Images on one page are stacked top to bottom, so their boxes share one coordinate space.
+    for data, image_width, image_height in images:
+        for fragments in group_lines(engine.recognize(data)):
+            top = min(fragment['bbox'][1] for fragment in fragments) + offset
+            bottom = max(fragment['bbox'][3] for fragment in fragments) + offset
+            lines.append({
+                'text': ' '.join(fragment['text'] for fragment in fragments),
+                # Flipped to PDF-style bottom-up coordinates, like text_extraction's layout documents.
+                'bbox': [round(min(fragment['bbox'][0] for fragment in fragments), 1), round(height - bottom, 1),
+                         round(max(fragment['bbox'][2] for fragment in fragments), 1), round(height - top, 1)],
+                'size': round(bottom - top, 1),
+            })
+        offset += image_height
+    return {'number': number, 'width': width, 'height': height, 'units': 'px', 'lines': lines}
+
+
+def ocr_document(pdf_bytes: bytes) -> tuple:
+    """OCRs the document's pages in a bounded pool. Returns (text, pages, stats)."""
+    started = time.perf_counter()
+    pages = page_images(pdf_bytes)
+    with ThreadPoolExecutor(max_workers=max(1, OCR_MAX_WORKERS)) as pool:
+        records = list(pool.map(lambda page: ocr_page(*page), pages))
+    text = '\n'.join(line['text'] for record in records for line in record['lines'])
+    stats = {'strategy': 'ocr', 'engine': OCR_ENGINE, 'pages': len(records),
+             'images': sum(len(images) for _, images in pages), 'seconds': round(time.perf_counter() - started, 3)}
+    return text, records, stats
+
+
+def output_key_for(routed_key: str) -> str:
+    """routed/image_only/cv.pdf -> cv.txt, the key text_extraction would have written."""
+    key = routed_key[len(IMAGE_ONLY_PREFIX):] if routed_key.startswith(IMAGE_ONLY_PREFIX) else routed_key
+    return key.replace('.pdf', '.txt')
+
+
+def process_document(bucket: str, key: str) -> dict:
+    pdf_bytes = s3.get_object(Bucket=bucket, Key=key)['Body'].read()
+    text, pages, stats = ocr_document(pdf_bytes)
+    cleaned_text = ' '.join(text.split())
+    output_key = output_key_for(key)
+
+    # Same layout as text_extraction: layout document first, then the text that triggers the next stage.
+    s3.put_object(Bucket=DEST_BUCKET, Key=layout_key(output_key),
+                  Body=json.dumps(build_layout(pages), separators=(',', ':')).encode('utf-8'),
+                  ContentType='application/json')
+    if cleaned_text:
+        s3.put_object(Bucket=DEST_BUCKET, Key=output_key, Body=cleaned_text.encode('utf-8'),
+                      Metadata={'extraction-route': 'ocr', 'extraction-strategy': stats['strategy'],
+                                'extraction-pages': str(stats['pages']),
+                                'extraction-ms': str(round(stats['seconds'] * 1000))})
+        logger.info(f"✅ OCR text saved to s3://{DEST_BUCKET}/{output_key} ({json.dumps(stats)})")
+    else:
+        logger.warning(f"OCR found no text in {key} ({json.dumps(stats)}). Nothing written.")
+    return stats
+
+
+def lambda_handler(event, context):
+    """Handles queue messages from text_extraction or S3 events on the image-only prefix."""
+    failures = []
+    for record in event.get('Records', []):
+        if record.get('eventSource') == 'aws:sqs':
+            message = json.loads(record['body'])
+            bucket, key = message['bucket'], message['key']
+        else:
+            bucket, key = record['s3']['bucket']['name'], unquote_plus(record['s3']['object']['key'])
+        logger.info(f"OCR requested for s3://{bucket}/{key}")
+        try:
+            process_document(bucket, key)
+        except Exception as e:
+            logger.error(f"❌ OCR failed for {key}: {e}")
+            if record.get('eventSource') == 'aws:sqs':
+                failures.append({'itemIdentifier': record['messageId']})
+            else:
+                raise
+    return {'batchItemFailures': failures}
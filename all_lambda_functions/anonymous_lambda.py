@@ -1,63 +1,220 @@
 import json
+import os
 import boto3
 from botocore.exceptions import ClientError
-from faker import Faker
 import urllib.parse
-import uuid
+
+import candidate_log
+from json_stream import S3JSONArrayWriter, append_to_array, iter_array
+from pseudonymizer import Pseudonymizer
 
 # Seting the destination bucket name directly.
 DESTINATION_BUCKET = "ENTER YOUR BUCKET"
 # as well as the output bucket name
 OUTPUT_FILENAME = "ENTER YOUR BUCKET"
+# Master file published by the appender; its updates trigger this function. Other objects
+# in the same bucket (candidate log segments, snapshots, manifest) are ignored.
+MASTER_FILE_KEY = 'candidates.json'
+# "incremental" anonymizes only the candidates the candidate log compacted since the last
+# run and adds them to the output; "full" rebuilds the whole anonymized file on every event.
+ANONYMIZATION_MODE = os.environ.get('ANONYMIZATION_MODE', 'incremental')
+# Incremental state: the pseudonym scheme, the key of the last candidate log segment
+# anonymized (or the ETag of the master file, while there is no log), and the output's
+# record count and ETag. Its size doesn't depend on the number of candidates. It never goes next
+# to the anonymized output: by default it is kept in the source bucket.
+MANIFEST_BUCKET = os.environ.get('ANONYMIZATION_MANIFEST_BUCKET')
+MANIFEST_KEY = 'anonymization/manifest.json'
+# Where earlier versions kept the manifest (with the fallback key), next to the output.
+LEGACY_MANIFEST_KEY = 'anonymization_manifest.json'
+# HMAC key for the pseudonyms, from a secret: either the key itself or the ID of a Secrets
+# Manager secret holding it. Without one the function refuses to run; the key must never
+# be stored where the anonymized data can be read.
+PSEUDONYMIZATION_KEY = os.environ.get('PSEUDONYMIZATION_KEY')
+PSEUDONYMIZATION_SECRET_ID = os.environ.get('PSEUDONYMIZATION_SECRET_ID')
+# Bump when the pseudonyms change shape; a manifest with another scheme triggers a rebuild.
+PSEUDONYM_SCHEME = 'hmac-sha256-v1'
+# The source and output files are streamed item by item, so memory doesn't grow with the
+# number of candidates. New segments are added this many candidates at a time.
+MAX_PENDING_CANDIDATES = 10000
+# Candidates handed to the pseudonymizer per batch while streaming.
+STREAM_BATCH_SIZE = 1000
 
-# Initializing Boto3 S3 client and Faker instance
+# Initializing Boto3 S3 client
 s3_client = boto3.client('s3')
-fake = Faker()
+_pseudonymizer = None
+
+
+def load_pseudonymizer() -> Pseudonymizer:
+    """The pseudonymizer for the configured key, read once per container. Fails without a key."""
+    global _pseudonymizer
+    if _pseudonymizer is None:
+        key = PSEUDONYMIZATION_KEY
+        if not key and PSEUDONYMIZATION_SECRET_ID:
+            key = boto3.client('secretsmanager').get_secret_value(SecretId=PSEUDONYMIZATION_SECRET_ID)['SecretString']
+        if not key:
+            raise RuntimeError("No pseudonymization key: set PSEUDONYMIZATION_SECRET_ID or PSEUDONYMIZATION_KEY. "
+                               "Refusing to anonymize without one.")
+        _pseudonymizer = Pseudonymizer(key)
+    return _pseudonymizer
+
+
+def anonymize_batch(candidates: list, pseudonymizer: Pseudonymizer) -> list:
+    """
+    Anonymizes a list of candidates in one pass: ID, name and email are replaced by keyed
+    pseudonyms (the same candidate always gets the same ones) and the phone number is
+    masked down to its last 4 digits.
+    """
+    return pseudonymizer.pseudonymize_batch(candidates)
+
+
+def anonymize_stream(candidates, pseudonymizer: Pseudonymizer):
+    """Feeds a stream of candidates through anonymize_batch STREAM_BATCH_SIZE at a time."""
+    batch = []
+    for candidate in candidates:
+        batch.append(candidate)
+        if len(batch) == STREAM_BATCH_SIZE:
+            yield from anonymize_batch(batch, pseudonymizer)
+            batch = []
+    if batch:
+        yield from anonymize_batch(batch, pseudonymizer)
+
 
-def anonymize_data(candidate_data: dict) -> dict:
-    
-    # This function does
+def read_json(bucket: str, key: str, default):
+    """Returns (parsed object, ETag), or (default, None) if the object doesn't exist."""
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=key)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return default, None
+        raise
+    return json.loads(s3_object['Body'].read().decode('utf-8')), s3_object['ETag']
+
+
+def write_json(bucket: str, key: str, data, indent=None):
+    s3_client.put_object(Bucket=bucket, Key=key, Body=json.dumps(data, indent=indent), ContentType='application/json')
 
-    # Anonymizes the sensitive fields in a single candidate's data dictionary.
 
-    # Args:
-        # candidate_data: The original dictionary for one candidate.
+def write_output(records) -> tuple:
+    """Streams records into the anonymized output file. Returns (how many were written, its ETag)."""
+    with S3JSONArrayWriter(s3_client, DESTINATION_BUCKET, OUTPUT_FILENAME, indent=4) as writer:
+        writer.write_all(records)
+        response = writer.close()
+    return writer.count, response['ETag']
 
-    # Returns:
-        # The dictionary with anonymized PII.
 
-    # Keep a copy to avoid modifying the original data in place
+def output_etag():
+    try:
+        return s3_client.head_object(Bucket=DESTINATION_BUCKET, Key=OUTPUT_FILENAME)['ETag']
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+
 
-    anonymized = candidate_data.copy()
+def iter_output():
+    try:
+        s3_object = s3_client.get_object(Bucket=DESTINATION_BUCKET, Key=OUTPUT_FILENAME)
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return iter(())
+        raise
+    return iter_array(s3_object['Body'])
 
-    # 1. Anonymize Candidate ID: Replace with a new, randomly generated ID.
-    anonymized['candidateId'] = f"CAND_{uuid.uuid4().hex[:12].upper()}"
 
-    # 2. Anonymize Name: Replace with a new, randomly generated name.
-    anonymized['name'] = fake.name()
+def load_manifest(manifest_bucket: str) -> dict:
+    """
+    Reads the incremental state; a missing one, one from another pseudonym scheme, or one
+    from before segment watermarks (with a per-candidate map) starts fresh.
+    """
+    manifest, _ = read_json(manifest_bucket, MANIFEST_KEY, {})
+    if manifest.get('scheme') != PSEUDONYM_SCHEME or 'processed' in manifest:
+        # The legacy manifest held the fallback key and raw source IDs next to the output.
+        s3_client.delete_object(Bucket=DESTINATION_BUCKET, Key=LEGACY_MANIFEST_KEY)
+        manifest = {'scheme': PSEUDONYM_SCHEME}
+    return manifest
 
-    # 3. Anonymize Email: Generate a fake email.
-    # basing the fake email on the new fake name for consistency.
-    
-    fake_name_parts = anonymized['name'].lower().split()
-    fake_email_user = '.'.join(fake_name_parts).replace(' ', '_')
-    anonymized['email'] = f"{fake_email_user}@{fake.free_email_domain()}"
 
-    # 4. Anonymize Phone Number: Mask the number, keeping the last 4 digits.
-    phone = anonymized.get('phoneNumber')
-    if phone and isinstance(phone, str) and len(phone) > 4:
-        # Keep only digits for consistent masking
-        digits_only = ''.join(filter(str.isdigit, phone))
-        if len(digits_only) > 4:
-            masked_part = 'X' * (len(digits_only) - 4)
-            visible_part = digits_only[-4:]
-            anonymized['phoneNumber'] = f"{masked_part}{visible_part}"
-        else:
-            anonymized['phoneNumber'] = 'XXXX' # Mask short numbers completely
-    elif phone:
-        anonymized['phoneNumber'] = 'XXXX' # Mask non-string or short numbers
+def upsert_output(candidates: list, pseudonymizer: Pseudonymizer) -> tuple:
+    """
+    Streams the output through, replacing records by pseudonymous ID and appending the new
+    ones. Returns (records written, ETag).
+    """
+    updates = {record['candidateId']: record for record in anonymize_batch(candidates, pseudonymizer)}
+
+    def upserted():
+        for record in iter_output():
+            yield updates.pop(record.get('candidateId'), record)
+        yield from updates.values()
+
+    return write_output(upserted())
+
+
+def append_output(candidates: list, pseudonymizer: Pseudonymizer, etag: str) -> str:
+    """
+    Adds the pseudonymized candidates to the end of the output without reading it back
+    (json_stream.append_to_array), if the output still has the given ETag. Returns the new ETag.
+    """
+    return append_to_array(s3_client, DESTINATION_BUCKET, OUTPUT_FILENAME, anonymize_batch(candidates, pseudonymizer),
+                           indent=4, if_match=etag)['ETag']
+
+
+def anonymize_incrementally(source_bucket: str, source_key: str, pseudonymizer: Pseudonymizer) -> dict:
+    """
+    Anonymizes only what the candidate log compacted since the last run: the records of the
+    segments after the stored segment watermark, up to the manifest's. Their pseudonyms are
+    appended to the output without reading it, so the cost depends only on how many there
+    are. Only when a compaction in that range replaced existing candidates is the output
+    streamed through to upsert them by pseudonymous ID.
+
+    The output is rebuilt from scratch instead on the first run, when segments past the
+    watermark are no longer kept, when the output's ETag isn't the one the state recorded
+    (the function died between writing the output and the state, or the output was changed),
+    and, while the log has no snapshot yet (APPEND_MODE 'rewrite', or before the first
+    compaction), from the master file whenever its ETag changes.
+    """
+    manifest_bucket = MANIFEST_BUCKET or source_bucket
+    state = load_manifest(manifest_bucket)
+    log_manifest, _ = candidate_log.read_manifest(s3_client, source_bucket)
+
+    if not log_manifest['snapshotKey']:
+        master = s3_client.get_object(Bucket=source_bucket, Key=source_key)
+        if state.get('masterEtag') == master['ETag']:
+            master['Body'].close()
+            return {'new': 0, 'total': state.get('total', 0), 'skipped': True, 'rebuilt': False}
+        total, _ = write_output(anonymize_stream(iter_array(master['Body']), pseudonymizer))
+        state = {'scheme': PSEUDONYM_SCHEME, 'masterEtag': master['ETag'], 'total': total}
+        write_json(manifest_bucket, MANIFEST_KEY, state)
+        return {'new': total, 'total': total, 'skipped': False, 'rebuilt': True}
+
+    watermark, segments = state.get('segmentWatermark'), None
+    if watermark is not None and state.get('outputEtag') == output_etag():
+        segments = candidate_log.compacted_since(s3_client, source_bucket, log_manifest, watermark)
+    if segments is None:
+        total, etag = write_output(anonymize_stream(
+            candidate_log.iter_snapshot(s3_client, source_bucket, log_manifest), pseudonymizer))
+        state = {'scheme': PSEUDONYM_SCHEME, 'segmentWatermark': log_manifest['watermark'],
+                 'total': total, 'outputEtag': etag}
+        write_json(manifest_bucket, MANIFEST_KEY, state)
+        return {'new': total, 'total': total, 'skipped': False, 'rebuilt': True}
+
+    # Manifests from before replacedThrough existed can't tell, so they get the upsert.
+    replaced_through = log_manifest.get('replacedThrough')
+    upsert = replaced_through is None or replaced_through > watermark
+    new, total, etag, pending = 0, state['total'], state['outputEtag'], []
+    for index, segment in enumerate(segments):
+        pending = candidate_log.merge_records(pending, candidate_log.read_segment(s3_client, source_bucket, segment['Key']))
+        if len(pending) >= MAX_PENDING_CANDIDATES or index == len(segments) - 1:
+            if upsert:
+                total, etag = upsert_output(pending, pseudonymizer)
+            else:
+                etag = append_output(pending, pseudonymizer, etag)
+                total += len(pending)
+            new += len(pending)
+            state.update({'segmentWatermark': segment['Key'], 'total': total, 'outputEtag': etag})
+            write_json(manifest_bucket, MANIFEST_KEY, state)
+            pending = []
+    return {'new': new, 'total': total, 'skipped': not segments, 'rebuilt': False}
 
-    return anonymized
 
 def lambda_handler(event, context):
     """
@@ -70,43 +227,32 @@ def lambda_handler(event, context):
         source_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
         print(f"New file detected: '{source_key}' in bucket '{source_bucket}'.")
 
-        # 2. Read and parse the input JSON file which contains a list of candidates
-        s3_object = s3_client.get_object(Bucket=source_bucket, Key=source_key)
-        list_of_candidates = json.loads(s3_object['Body'].read().decode('utf-8'))
-        
-        if not isinstance(list_of_candidates, list):
-            raise TypeError("Input JSON is not a list. This function expects a list of candidates.")
-            
-        print(f"Successfully parsed a list of {len(list_of_candidates)} candidates.")
-
-        # 3. Anonymize each candidate in the list
-        newly_anonymized_list = [anonymize_data(candidate) for candidate in list_of_candidates]
-        print(f"Anonymized all {len(newly_anonymized_list)} candidates from the input file.")
-
-        # 4. Read existing data from the destination file
-        try:
-            existing_data_object = s3_client.get_object(Bucket=DESTINATION_BUCKET, Key=OUTPUT_FILENAME)
-            all_candidates = json.loads(existing_data_object['Body'].read().decode('utf-8'))
-            print(f"Successfully read existing file '{OUTPUT_FILENAME}' with {len(all_candidates)} records.")
-        except ClientError as e:
-            if e.response['Error']['Code'] == 'NoSuchKey':
-                print(f"File '{OUTPUT_FILENAME}' not found. Starting a new file.")
-                all_candidates = []
+        if source_key != MASTER_FILE_KEY:
+            print(f"Skipping '{source_key}', only '{MASTER_FILE_KEY}' is anonymized.")
+            return {'statusCode': 200, 'body': json.dumps(f"Skipped '{source_key}'.")}
+
+        # Fails closed: without the key nothing is written.
+        pseudonymizer = load_pseudonymizer()
+
+        if ANONYMIZATION_MODE == 'incremental':
+            result = anonymize_incrementally(source_bucket, source_key, pseudonymizer)
+            if result['skipped']:
+                success_message = f"'{source_key}' unchanged since the last run. Nothing to anonymize."
+            elif result['rebuilt']:
+                success_message = f"Rebuilt '{OUTPUT_FILENAME}' with {result['total']} candidates."
             else:
-                raise
-
-        # 5. Append the new batch of anonymized data to the existing list
-        all_candidates.extend(newly_anonymized_list)
-
-        # 6. Write the updated, combined list back to the S3 bucket
-        s3_client.put_object(
-            Bucket=DESTINATION_BUCKET,
-            Key=OUTPUT_FILENAME,
-            Body=json.dumps(all_candidates, indent=4),
-            ContentType='application/json'
-        )
-        
-        success_message = f"Successfully processed and appended {len(newly_anonymized_list)} candidates to '{OUTPUT_FILENAME}'."
+                success_message = (f"Anonymized {result['new']} new or changed candidates. "
+                                   f"'{OUTPUT_FILENAME}' now holds {result['total']} records.")
+            print(success_message)
+            return {'statusCode': 200, 'body': json.dumps(success_message)}
+
+        # 2. Stream the list of candidates from the candidate log, anonymize them in batches and
+        # stream the result into a new output file. The log holds the full list, so the
+        # output is rebuilt from it.
+        view = candidate_log.open_view(s3_client, source_bucket, seed_key=source_key)
+        total, _ = write_output(anonymize_stream(candidate_log.iter_view(view), pseudonymizer))
+
+        success_message = f"Successfully rebuilt '{OUTPUT_FILENAME}' with {total} candidates."
         print(success_message)
 
         return {'statusCode': 200, 'body': json.dumps(success_message)}
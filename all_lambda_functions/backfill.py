@@ -0,0 +1,286 @@
+import argparse
+import hashlib
+import json
+import multiprocessing
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+
+import bedrock_lambda
+from degree_classifier import classify_postgraduate
+from layout_document import build_layout, header_text
+from local_name_extractor import extract_name_locally
+from pdf_prescan import MAX_EXTRACT_PAGES, ROUTE_TEXT, ROUTE_TRUNCATE, prescan_pdf, route_for
+from text_extraction import EXTRACTION_PRESET, clean_text, extract_pdf
+
+# Offline bulk ingestion of historical resumes, without going through the upload bucket:
+#
+#   python backfill.py ./old_resumes candidates.jsonl
+#   python backfill.py s3://resume-archive/2019/ candidates.jsonl --workers 8 --llm-workers 16
+#
+# PDF parsing and the local matchers run in a process pool (--workers, one per core by
+# default); the Bedrock calls run in a bounded thread pool (--llm-workers). Candidates are
+# written as JSON lines, one record per line, the same format as candidate_log segments, so
+# the file can be handed to candidate_log.append_records. <output>.checkpoint records every
+# finished source; a rerun with the same arguments skips them and resumes where it stopped.
+# Candidate ids are derived from the PDF content, so a PDF that is backfilled twice (or a
+# candidate written just before a crash) merges into one record in the candidate log.
+
+DEFAULT_WORKERS = os.cpu_count() or 1
+DEFAULT_LLM_WORKERS = 8
+# Extracted documents waiting for an LLM worker, per LLM worker. Bounds memory when the
+# process pool is faster than Bedrock.
+LLM_BACKLOG_PER_WORKER = 4
+PROGRESS_EVERY = 100
+
+_s3_client = None
+
+
+def _s3():
+    global _s3_client
+    if _s3_client is None:
+        _s3_client = boto3.client('s3')
+    return _s3_client
+
+
+def list_sources(source: str) -> list:
+    """Lists the PDFs under a local directory or an s3://bucket/prefix, sorted."""
+    if source.startswith('s3://'):
+        bucket, _, prefix = source[len('s3://'):].partition('/')
+        sources = []
+        for page in _s3().get_paginator('list_objects_v2').paginate(Bucket=bucket, Prefix=prefix):
+            sources.extend(f"s3://{bucket}/{item['Key']}" for item in page.get('Contents', [])
+                           if item['Key'].lower().endswith('.pdf'))
+        return sorted(sources)
+    return sorted(os.path.join(directory, name) for directory, _, names in os.walk(source)
+                  for name in names if name.lower().endswith('.pdf'))
+
+
+def read_source(source: str) -> bytes:
+    if source.startswith('s3://'):
+        bucket, _, key = source[len('s3://'):].partition('/')
+        return _s3().get_object(Bucket=bucket, Key=key)['Body'].read()
+    with open(source, 'rb') as pdf_file:
+        return pdf_file.read()
+
+
+def candidate_id_for(pdf_bytes: bytes) -> str:
+    return f"CAND_{hashlib.sha256(pdf_bytes).hexdigest()[:12].upper()}"
+
+
+def cpu_stage(source: str) -> dict:
+    """
+    Runs in a pool process: reads and prescans the PDF, extracts its text and layout, and
+    runs the regex and library matchers. Never raises; failures come back as status 'failed'.
+    """
+    started = time.perf_counter()
+    try:
+        pdf_bytes = read_source(source)
+        route, reason = route_for(prescan_pdf(pdf_bytes))
+        if route not in (ROUTE_TEXT, ROUTE_TRUNCATE):
+            return {'source': source, 'status': 'routed', 'route': route, 'reason': reason,
+                    'seconds': time.perf_counter() - started}
+        page_numbers = set(range(MAX_EXTRACT_PAGES)) if route == ROUTE_TRUNCATE else None
+        text, pages = extract_pdf(pdf_bytes, EXTRACTION_PRESET, page_numbers)
+        text = clean_text(text)
+        return {
+            'source': source,
+            'status': 'extracted',
+            'candidateId': candidate_id_for(pdf_bytes),
+            'text': text,
+            'header': header_text(build_layout(pages)),
+            'contactInfo': bedrock_lambda.extract_contact_info(text),
+            'libraryItems': bedrock_lambda.LIBRARY_MATCHER.extract_items(text),
+            'seconds': time.perf_counter() - started,
+        }
+    except Exception as e:
+        return {'source': source, 'status': 'failed', 'reason': f"{type(e).__name__}: {e}",
+                'seconds': time.perf_counter() - started}
+
+
+def local_profile(text: str, header: str) -> dict:
+    """Name and postgrad flag from the local extractors only, for runs without Bedrock."""
+    return {
+        'name': extract_name_locally(header or text)['name'] or "Could not extract name.",
+        'experienceSummary': "Not defined",
+        'isPostGraduate': classify_postgraduate(text)['isPostGraduate'],
+    }
+
+
+def llm_profile(text: str, header: str) -> dict:
+    """Name, summary and postgrad flag the way bedrock_lambda gets them, through its inference cache."""
+    cache = bedrock_lambda.inference_cache
+    cached = cache.get(text) if cache else None
+    if cached is not None:
+        return cached
+
+    # A fresh usage record for this thread's calls, so other workers' errors don't count here.
+    usage, started = bedrock_lambda.reset_bedrock_usage(), time.perf_counter()
+    if bedrock_lambda.EXTRACTION_MODE == 'combined':
+        profile = bedrock_lambda.extract_profile_via_bedrock(text, header)
+    else:
+        profile = {
+            'name': bedrock_lambda.determine_candidate_name(text, header),
+            'experienceSummary': bedrock_lambda.get_experience_summary_via_bedrock(text),
+            'isPostGraduate': bedrock_lambda.determine_postgraduation_status(text),
+        }
+    # Any error during these calls keeps the answer out of the cache.
+    if cache and not usage['errors']:
+        cache.put(text, profile, compute_ms=(time.perf_counter() - started) * 1000)
+    return profile
+
+
+class StageStats:
+    """Items and busy seconds per stage, for the throughput report."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.stages = {}
+
+    def add(self, stage: str, seconds: float, count: int = 1):
+        with self._lock:
+            entry = self.stages.setdefault(stage, {'items': 0, 'busySeconds': 0.0})
+            entry['items'] += count
+            entry['busySeconds'] += seconds
+
+    def report(self, wall_seconds: float) -> dict:
+        return {
+            stage: {
+                'items': entry['items'],
+                'busySeconds': round(entry['busySeconds'], 1),
+                'itemsPerSecond': round(entry['items'] / wall_seconds, 2) if wall_seconds else 0.0,
+                'msPerItem': round(entry['busySeconds'] * 1000 / entry['items'], 1) if entry['items'] else 0.0,
+            }
+            for stage, entry in self.stages.items()
+        }
+
+
+class BackfillOutput:
+    """Appends candidates and checkpoint entries; safe to call from the LLM threads."""
+
+    def __init__(self, output_path: str):
+        self.output_path = output_path
+        self.checkpoint_path = output_path + '.checkpoint'
+        self._lock = threading.Lock()
+        self.counts = {'candidates': 0, 'routed': 0, 'failed': 0}
+        self.finished = self._read_lines(self.checkpoint_path, 'source')
+        self.written_ids = self._read_lines(output_path, 'candidateId')
+        self._output = self._open_for_append(output_path)
+        self._checkpoint = self._open_for_append(self.checkpoint_path)
+
+    @staticmethod
+    def _open_for_append(path: str):
+        # Ends a line cut off by a crash, so the next record starts on a line of its own.
+        complete = True
+        if os.path.exists(path) and os.path.getsize(path):
+            with open(path, 'rb') as existing:
+                existing.seek(-1, os.SEEK_END)
+                complete = existing.read(1) == b'\n'
+        file = open(path, 'a', encoding='utf-8')
+        if not complete:
+            file.write('\n')
+        return file
+
+    @staticmethod
+    def _read_lines(path: str, field: str) -> set:
+        values = set()
+        if os.path.exists(path):
+            with open(path, encoding='utf-8') as lines:
+                for line in lines:
+                    try:
+                        values.add(json.loads(line)[field])
+                    except (ValueError, KeyError):
+                        pass  # a line cut off by a crash
+        return values
+
+    def write(self, source: str, status: str, candidate: dict = None, reason: str = None):
+        with self._lock:
+            if candidate and candidate['candidateId'] not in self.written_ids:
+                self._output.write(json.dumps(candidate) + '\n')
+                self._output.flush()
+                self.written_ids.add(candidate['candidateId'])
+            # Failed sources are logged but not checkpointed, so the next run retries them.
+            self.counts['candidates' if status == 'done' else status] += 1
+            entry = {'source': source, 'status': status, 'reason': reason}
+            if candidate:
+                entry['candidateId'] = candidate['candidateId']
+            if status != 'failed':
+                self._checkpoint.write(json.dumps(entry) + '\n')
+                self._checkpoint.flush()
+            else:
+                print(f"❌ {source}: {reason}")
+
+    def close(self):
+        self._output.close()
+        self._checkpoint.close()
+
+
+def run_backfill(source: str, output_path: str, workers: int = DEFAULT_WORKERS,
+                 llm_workers: int = DEFAULT_LLM_WORKERS, use_llm: bool = True) -> dict:
+    started = time.perf_counter()
+    output = BackfillOutput(output_path)
+    sources = [item for item in list_sources(source) if item not in output.finished]
+    print(f"{len(sources)} PDFs to process ({len(output.finished)} already done), "
+          f"{workers} extraction processes, {llm_workers if use_llm else 0} LLM workers.")
+
+    stats = StageStats()
+    backlog = threading.BoundedSemaphore(max(1, llm_workers) * LLM_BACKLOG_PER_WORKER)
+    profile_for = llm_profile if use_llm else local_profile
+
+    def enrich(result: dict):
+        try:
+            enrich_started = time.perf_counter()
+            profile = profile_for(result['text'], result['header'])
+            stats.add('llm' if use_llm else 'localProfile', time.perf_counter() - enrich_started)
+            candidate = bedrock_lambda.candidate_record(profile, result['contactInfo'], result['libraryItems'],
+                                                        result['candidateId'])
+            output.write(result['source'], 'done', candidate)
+        except Exception as e:
+            output.write(result['source'], 'failed', reason=f"{type(e).__name__}: {e}")
+        finally:
+            backlog.release()
+
+    with multiprocessing.Pool(processes=max(1, workers)) as pool, \
+            ThreadPoolExecutor(max_workers=max(1, llm_workers)) as llm_pool:
+        for index, result in enumerate(pool.imap_unordered(cpu_stage, sources), start=1):
+            stats.add('extract', result['seconds'])
+            if result['status'] == 'extracted':
+                # Blocks while the LLM stage is LLM_BACKLOG_PER_WORKER documents per worker behind.
+                backlog.acquire()
+                llm_pool.submit(enrich, result)
+            else:
+                output.write(result['source'], result['status'], reason=result['reason'])
+            if index % PROGRESS_EVERY == 0:
+                elapsed = time.perf_counter() - started
+                print(f"{index}/{len(sources)} extracted, {output.counts['candidates']} candidates, "
+                      f"{index / elapsed:.1f} PDFs/s")
+    output.close()
+
+    wall_seconds = time.perf_counter() - started
+    return {
+        'sources': len(sources),
+        **output.counts,
+        'seconds': round(wall_seconds, 1),
+        'pdfsPerSecond': round(len(sources) / wall_seconds, 2) if wall_seconds else 0.0,
+        'stages': stats.report(wall_seconds),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Parse a directory or S3 prefix of resume PDFs into candidate JSON lines.")
+    parser.add_argument('source', help="local directory or s3://bucket/prefix")
+    parser.add_argument('output', help="candidates .jsonl file; <output>.checkpoint is written next to it")
+    parser.add_argument('--workers', type=int, default=DEFAULT_WORKERS, help="extraction processes")
+    parser.add_argument('--llm-workers', type=int, default=DEFAULT_LLM_WORKERS, help="concurrent Bedrock requests")
+    parser.add_argument('--no-llm', action='store_true', help="local name and degree extractors only, no Bedrock")
+    arguments = parser.parse_args()
+    report = run_backfill(arguments.source, arguments.output, arguments.workers, arguments.llm_workers,
+                          use_llm=not arguments.no_llm)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
@@ -5,10 +5,46 @@ import urllib.parse
 import os
 import re
 import uuid
+import time
+import threading
+import contextvars
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from datetime import datetime
+from functools import partial
+
+from degree_classifier import classify_postgraduate
+from local_name_extractor import extract_name_locally
+from layout_document import header_text, load_layout
+from resume_sections import context_for_field
+from inference_cache import InferenceCache, DynamoDBCacheBackend, SQLiteCacheBackend
+from pipeline_timing import UPLOADED_AT_METADATA, is_fused_artifact
+from skill_matcher import SkillMatcher, matcher_for_library
 
 # --- Configuration ---
 DESTINATION_BUCKET = "ENTER YOUR BUCKET"
+# "combined" asks for name, summary and postgrad flag in one Bedrock call,
+# "separate" keeps the original three prompts.
+EXTRACTION_MODE = os.environ.get("EXTRACTION_MODE", "combined")
+# Independent enrichment steps (Bedrock calls, contact regex, library scan) run in a
+# bounded thread pool. A step that fails or runs past its timeout gets its default value.
+ENRICHMENT_MAX_WORKERS = int(os.environ.get("ENRICHMENT_MAX_WORKERS", "4"))
+ENRICHMENT_TASK_TIMEOUT = float(os.environ.get("ENRICHMENT_TASK_TIMEOUT", "25"))
+BEDROCK_MODEL_ID = "amazon.nova-pro-v1:0"
+# Send each prompt only the resume sections it needs (header for the name, education
+# for the postgrad flag...) within a fixed token budget, instead of the whole text.
+PROMPT_TRIMMING = os.environ.get("PROMPT_TRIMMING", "on") == "on"
+# Parsed Bedrock fields are cached by resume content. Bump PROMPT_VERSION whenever a
+# prompt changes so older cached answers are no longer served.
+PROMPT_VERSION = f"{EXTRACTION_MODE}-{'trimmed' if PROMPT_TRIMMING else 'full'}-v4"
+# The local degree classifier settles the postgrad flag on its own at or above this
+# confidence; below it Bedrock is asked.
+POSTGRAD_CONFIDENCE_THRESHOLD = float(os.environ.get("POSTGRAD_CONFIDENCE_THRESHOLD", "0.8"))
+# Same for the candidate name and the local header-based name extractor.
+NAME_CONFIDENCE_THRESHOLD = float(os.environ.get("NAME_CONFIDENCE_THRESHOLD", "0.75"))
+INFERENCE_CACHE_BACKEND = os.environ.get("INFERENCE_CACHE_BACKEND", "dynamodb")  # "dynamodb", "sqlite" or "none"
+INFERENCE_CACHE_TABLE = os.environ.get("INFERENCE_CACHE_TABLE", "ENTER YOUR TABLE")
+INFERENCE_CACHE_PATH = os.environ.get("INFERENCE_CACHE_PATH", "/tmp/inference_cache.sqlite3")
+INFERENCE_CACHE_TTL_SECONDS = int(os.environ.get("INFERENCE_CACHE_TTL_SECONDS", str(30 * 24 * 3600)))
 # ----------------------------------------------------
 
 
@@ -16,6 +52,15 @@ DESTINATION_BUCKET = "ENTER YOUR BUCKET"
 s3_client = boto3.client('s3')
 bedrock_runtime = boto3.client('bedrock-runtime') # Only Bedrock client is needed for AI tasks
 
+if INFERENCE_CACHE_BACKEND == "dynamodb":
+    inference_cache = InferenceCache(DynamoDBCacheBackend(boto3.resource('dynamodb').Table(INFERENCE_CACHE_TABLE)),
+                                     PROMPT_VERSION, BEDROCK_MODEL_ID, INFERENCE_CACHE_TTL_SECONDS)
+elif INFERENCE_CACHE_BACKEND == "sqlite":
+    inference_cache = InferenceCache(SQLiteCacheBackend(INFERENCE_CACHE_PATH),
+                                     PROMPT_VERSION, BEDROCK_MODEL_ID, INFERENCE_CACHE_TTL_SECONDS)
+else:
+    inference_cache = None
+
 # --- Skill & Language Libraries (unchanged) ---
 TECHNICAL_SKILLS_LIBRARY = [
     # --- Programming Languages & Scripting (40+) ---
@@ -108,23 +153,81 @@ LANGUAGES_SPOKEN_LIBRARY = [
     "persian", "polish", "pashto", "kannada", "malayalam", "dutch"
 ]
 
+# One trie over all three libraries, built once per container, so each resume
+# is scanned a single time instead of once per library entry.
+LIBRARY_MATCHER = SkillMatcher({
+    'technical': TECHNICAL_SKILLS_LIBRARY,
+    'nonTechnical': NON_TECHNICAL_SKILLS_LIBRARY,
+    'languages': LANGUAGES_SPOKEN_LIBRARY,
+})
+
+# Token usage of the Bedrock calls of one invocation. Each invocation starts its own record
+# with reset_bedrock_usage(); enrichment steps record into the record of the invocation that
+# submitted them, so a step still running after its invocation gave up on it can't add its
+# tokens to the next invocation on a warm container.
+_usage = contextvars.ContextVar('bedrock_usage')
+_usage_lock = threading.Lock()
+
+
+def reset_bedrock_usage() -> dict:
+    usage = {'calls': 0, 'errors': 0, 'inputTokens': 0, 'outputTokens': 0}
+    _usage.set(usage)
+    return usage
+
+
+def bedrock_usage() -> dict:
+    """The usage record of the current invocation."""
+    usage = _usage.get(None)
+    return usage if usage is not None else reset_bedrock_usage()
+
+
+def _record_bedrock_usage(usage: dict):
+    record = bedrock_usage()
+    with _usage_lock:
+        record['calls'] += 1
+        record['inputTokens'] += usage.get('inputTokens', 0)
+        record['outputTokens'] += usage.get('outputTokens', 0)
+
+
+def _record_bedrock_error():
+    record = bedrock_usage()
+    with _usage_lock:
+        record['errors'] += 1
+
+
+# How many fields this container settled with a local rule vs a Bedrock call.
+LOCAL_DECISIONS = {'nameLocal': 0, 'nameBedrock': 0, 'postgradLocal': 0, 'postgradBedrock': 0}
+
+
+def _record_local_decision(counter: str):
+    with _usage_lock:
+        LOCAL_DECISIONS[counter] += 1
+
+
+def _prompt_context(resume_text: str, field: str) -> str:
+    return context_for_field(resume_text, field) if PROMPT_TRIMMING else resume_text
+
+
 def call_bedrock_nova_model(prompt: str, max_tokens: int) -> str:
     
     #  Calling the Bedrock Nova Pro model with a specific prompt.
     
-    model_id = "amazon.nova-pro-v1:0"
+    model_id = BEDROCK_MODEL_ID
     try:
         response = bedrock_runtime.converse(
             modelId=model_id,
             messages=[{"role": "user", "content": [{"text": prompt}]}],
             inferenceConfig={"maxTokens": max_tokens, "temperature": 0.1}
         )
+        _record_bedrock_usage(response.get('usage', {}))
         return response['output']['message']['content'][0]['text'].strip()
     except ClientError as e:
         print(f"AWS Bedrock ClientError: {e}")
+        _record_bedrock_error()
         return f"API Request Error: {e}"
     except Exception as e:
         print(f"An unexpected error occurred in call_bedrock_nova_model: {e}")
+        _record_bedrock_error()
         return f"An unexpected error occurred during API call: {e}"
 
 
@@ -134,34 +237,43 @@ def get_name_via_bedrock(resume_text: str) -> str:
 
     if not resume_text: return "Could not extract name."
 
+    prompt_context = _prompt_context(resume_text, 'name')
+
     # strict prompting is done to ensure only the name is returned.
     prompt = f"""
     From the following resume text, extract only the full name of the person. Do not add any extra text, titles, explanations, or punctuation. Just return the name.
 
     Resume Text:
     ---
-    {resume_text}
+    {prompt_context}
     ---
     Name:"""
 
     # Call the generic Bedrock function with a low max_tokens for a name
     name = call_bedrock_nova_model(prompt, max_tokens=20)
 
+    return _clean_name(name) or "Could not extract name."
+
+
+def _clean_name(name: str):
+    """Returns the cleaned name, or None if the model response doesn't look like a name."""
     # Basic cleanup in case the model adds extra characters
     name = name.strip().strip('"').strip("'")
     
     # A simple check to see if the response is reasonable (not a long sentence)
     if len(name.split()) > 5: # If more than 5 words, it's likely not just a name
         print(f"Warning: Name extraction returned a long string: '{name}'. Falling back.")
-        return "Could not extract name."
+        return None
 
-    return name if name else "Could not extract name."
+    return name if name else None
 
 
 def get_experience_summary_via_bedrock(resume_text: str) -> str:
     """Creating a 1-2 line experience summary using the Bedrock Nova pro model."""
     if not resume_text: return "Not defined"
 
+    prompt_context = _prompt_context(resume_text, 'summary')
+
     prompt = f"""
     Act as an expert technical recruiter. Analyze the following resume text and provide a 1-2 line professional summary.
     Do not exceed more than 20 charecters just give a short crisp detail of the candidate and dont give double quotes before and after
@@ -174,13 +286,17 @@ def get_experience_summary_via_bedrock(resume_text: str) -> str:
 
     Resume Text:
     ---
-    {resume_text}
+    {prompt_context}
     ---
     """
 
     # Call the generic Bedrock function with more tokens for a summary
     api_response = call_bedrock_nova_model(prompt, max_tokens=150)
 
+    return _clean_summary(api_response)
+
+
+def _clean_summary(api_response: str) -> str:
     response_lower = api_response.lower()
     if "none" in response_lower or "sorry" in response_lower or "unable" in response_lower or not api_response or "error" in response_lower:
         return "Not defined"
@@ -196,6 +312,8 @@ def check_postgraduation_status_via_bedrock(resume_text: str) -> int:
     if not resume_text:
         return 0
 
+    prompt_context = _prompt_context(resume_text, 'postgrad')
+
     # A very specific prompt to get a binary (1/0) answer.
     prompt = f"""
     Analyze the following resume text to determine if the candidate has a postgraduate degree.
@@ -208,7 +326,7 @@ def check_postgraduation_status_via_bedrock(resume_text: str) -> int:
 
     Resume Text:
     ---
-    {resume_text}
+    {prompt_context}
     ---
     Result:"""
 
@@ -223,6 +341,137 @@ def check_postgraduation_status_via_bedrock(resume_text: str) -> int:
         return 0
 
 
+def determine_candidate_name(resume_text: str, header: str = None) -> str:
+    """
+    Returns the candidate name from the local header extractor when it is confident,
+    otherwise from Bedrock. header, the header lines from the layout document, is used
+    instead of the full text when text_extraction wrote one.
+    """
+    resume_text = header or resume_text
+    result = extract_name_locally(resume_text)
+    if result['confidence'] >= NAME_CONFIDENCE_THRESHOLD:
+        _record_local_decision('nameLocal')
+        print(f"Name settled locally: {result}")
+        return result['name']
+
+    _record_local_decision('nameBedrock')
+    print(f"Name not clear locally ({result}). Asking Bedrock.")
+    return get_name_via_bedrock(resume_text)
+
+
+def determine_postgraduation_status(resume_text: str) -> int:
+    """
+    Returns 1 if the resume mentions a postgraduate degree, otherwise 0.
+    The local degree classifier answers when it is confident; Bedrock is only asked otherwise.
+    """
+    result = classify_postgraduate(resume_text)
+    if result['confidence'] >= POSTGRAD_CONFIDENCE_THRESHOLD:
+        _record_local_decision('postgradLocal')
+        print(f"Postgrad status settled locally: {result}")
+        return result['isPostGraduate']
+
+    _record_local_decision('postgradBedrock')
+    print(f"Postgrad status ambiguous locally ({result}). Asking Bedrock.")
+    return check_postgraduation_status_via_bedrock(resume_text)
+
+
+def extract_profile_via_bedrock(resume_text: str, header: str = None) -> dict:
+    """
+    Extracts name, experience summary and post-graduation status with a single Bedrock call.
+    The model must answer with one JSON object; every field that is missing or fails
+    validation is re-fetched with its dedicated single-field prompt. The name and the
+    postgrad flag are only asked for when the local extractors aren't confident; header
+    (the layout document's header lines, if any) is where the name is looked for.
+    """
+    if not resume_text:
+        return {'name': "Could not extract name.", 'experienceSummary': "Not defined", 'isPostGraduate': 0}
+
+    local_name = extract_name_locally(header or resume_text)
+    if local_name['confidence'] >= NAME_CONFIDENCE_THRESHOLD:
+        _record_local_decision('nameLocal')
+        name_instruction = ""
+    else:
+        _record_local_decision('nameBedrock')
+        name_instruction = """
+    - "name": the full name of the person only, without titles or extra words."""
+
+    local_degree = classify_postgraduate(resume_text)
+    if local_degree['confidence'] >= POSTGRAD_CONFIDENCE_THRESHOLD:
+        _record_local_decision('postgradLocal')
+        postgrad_instruction = ""
+    else:
+        _record_local_decision('postgradBedrock')
+        postgrad_instruction = """
+    - "isPostGraduate": 1 if the resume mentions a postgraduate degree (completed or ongoing) such as "Master's",
+      "M.S.", "M.Sc.", "M.Tech", "MBA", "PhD", "Post Graduate", "PGDM" or similar, otherwise 0."""
+
+    # With name and postgrad settled locally only the summary sections are needed.
+    prompt_context = _prompt_context(resume_text, 'profile' if name_instruction or postgrad_instruction else 'summary')
+
+    prompt = f"""
+    Act as an expert technical recruiter. Read the following resume text and return a JSON object with exactly these keys:{name_instruction}
+    - "experienceSummary": a short crisp summary of the candidate's main field, not more than 20 characters,
+      like "experienced in aiml", "experienced in front end" or "experienced in cloud". If a total duration of
+      experience is clearly mentioned (e.g. "5 years"), integrate it. If you cannot confidently determine it, use "NONE".{postgrad_instruction}
+
+    Your entire response must be only the JSON object. Do not add any other text, explanation or markdown.
+
+    Resume Text:
+    ---
+    {prompt_context}
+    ---
+    JSON:"""
+
+    api_response = call_bedrock_nova_model(prompt, max_tokens=200)
+    parsed = _parse_json_object(api_response)
+
+    profile = {}
+
+    name = parsed.get('name')
+    if not name_instruction:
+        profile['name'] = local_name['name']
+    else:
+        profile['name'] = _clean_name(name) if isinstance(name, str) else None
+    if profile['name'] is None:
+        print("Combined extraction returned no usable name. Falling back to the name prompt.")
+        profile['name'] = get_name_via_bedrock(header or resume_text)
+
+    summary = parsed.get('experienceSummary')
+    if isinstance(summary, str):
+        profile['experienceSummary'] = _clean_summary(summary.strip().strip('"'))
+    else:
+        print("Combined extraction returned no summary. Falling back to the summary prompt.")
+        profile['experienceSummary'] = get_experience_summary_via_bedrock(resume_text)
+
+    is_post_graduate = parsed.get('isPostGraduate')
+    if isinstance(is_post_graduate, bool):
+        is_post_graduate = int(is_post_graduate)
+    if not postgrad_instruction:
+        profile['isPostGraduate'] = local_degree['isPostGraduate']
+    elif is_post_graduate in (0, 1, '0', '1'):
+        profile['isPostGraduate'] = int(is_post_graduate)
+    else:
+        print("Combined extraction returned no postgraduate flag. Falling back to the postgraduate prompt.")
+        profile['isPostGraduate'] = check_postgraduation_status_via_bedrock(resume_text)
+
+    return profile
+
+
+def _parse_json_object(api_response: str) -> dict:
+    """Parses the first JSON object in a model response, returning {} if there is none."""
+    clean_text = re.sub(r'```json\s*|\s*```', '', api_response).strip()
+    start, end = clean_text.find('{'), clean_text.rfind('}')
+    if start == -1 or end < start:
+        print(f"Warning: Model response is not JSON: '{api_response[:100]}'")
+        return {}
+    try:
+        parsed = json.loads(clean_text[start:end + 1])
+    except json.JSONDecodeError as e:
+        print(f"Warning: Could not parse model response as JSON: {e}")
+        return {}
+    return parsed if isinstance(parsed, dict) else {}
+
+
 def extract_contact_info(resume_text: str) -> dict:
     """Extracts email and phone number using regex."""
     email_match = re.search(r'[\w\.-]+@[\w\.-]+', resume_text)
@@ -239,12 +488,122 @@ def extract_contact_info(resume_text: str) -> dict:
 
 def extract_items_from_library(resume_text: str, library: list) -> list:
     """Generic function to find items from a given library within the resume text."""
-    found_items = set()
-    lower_resume = resume_text.lower()
-    for item in library:
-        if re.search(r'\b' + re.escape(item) + r'\b', lower_resume):
-            found_items.add(item.title())
-    return sorted(list(found_items))
+    return matcher_for_library(library).extract_items(resume_text)['items']
+
+
+def run_enrichment_tasks(resume_text: str, tasks: dict) -> tuple:
+    """
+    Runs independent extraction steps concurrently on the same resume text.
+
+    tasks maps a result name to (function, default). Every function is called with
+    resume_text. A task that raises or does not finish within ENRICHMENT_TASK_TIMEOUT
+    seconds (counted from submission) gets its default, so one slow or failing call
+    never loses the results of the others.
+
+    Returns (results, names of the steps that fell back to their default).
+    """
+    results = {}
+    failed_steps = []
+    executor = ThreadPoolExecutor(max_workers=max(1, min(ENRICHMENT_MAX_WORKERS, len(tasks))))
+    try:
+        deadline = time.monotonic() + ENRICHMENT_TASK_TIMEOUT
+        # Each step runs in a copy of the caller's context, so it records its Bedrock usage
+        # into this invocation's record even if it outlives the invocation.
+        futures = {name: executor.submit(contextvars.copy_context().run, function, resume_text)
+                   for name, (function, _) in tasks.items()}
+        for name, future in futures.items():
+            default = tasks[name][1]
+            try:
+                results[name] = future.result(timeout=max(0, deadline - time.monotonic()))
+            except FutureTimeoutError:
+                print(f"Warning: Enrichment step '{name}' timed out after {ENRICHMENT_TASK_TIMEOUT}s. Using default.")
+                results[name] = default
+                failed_steps.append(name)
+            except Exception as e:
+                print(f"Warning: Enrichment step '{name}' failed: {e}. Using default.")
+                results[name] = default
+                failed_steps.append(name)
+    finally:
+        # Don't block the invocation on a step that already timed out.
+        executor.shutdown(wait=False, cancel_futures=True)
+    return results, failed_steps
+
+
+def build_candidate(resume_text: str, header: str = None) -> dict:
+    """Runs the enrichment steps on extracted resume text and returns the candidate record."""
+    print(f"Extracting details using Amazon Bedrock ({EXTRACTION_MODE} mode), contact info and skills...")
+    usage = reset_bedrock_usage()
+    enrichment_start = time.perf_counter()
+
+    # None of these steps depends on another, so they run side by side.
+    tasks = {
+        'contact_info': (extract_contact_info, {'email': None, 'phone_number': None}),
+        'library_items': (LIBRARY_MATCHER.extract_items, {'technical': [], 'nonTechnical': [], 'languages': []}),
+    }
+    # Use Bedrock for name, summary, and post-graduation status, unless this exact
+    # resume text was already parsed with the same prompts and model.
+    cached_profile = inference_cache.get(resume_text) if inference_cache else None
+    if cached_profile is not None:
+        print("Inference cache hit. Skipping Bedrock.")
+        tasks['profile'] = (lambda _: cached_profile, cached_profile)
+    elif EXTRACTION_MODE == "combined":
+        tasks['profile'] = (partial(extract_profile_via_bedrock, header=header), {
+            'name': "Could not extract name.", 'experienceSummary': "Not defined", 'isPostGraduate': 0
+        })
+    else:
+        tasks['name'] = (partial(determine_candidate_name, header=header), "Could not extract name.")
+        tasks['experienceSummary'] = (get_experience_summary_via_bedrock, "Not defined")
+        tasks['isPostGraduate'] = (determine_postgraduation_status, 0)
+
+    results, failed_steps = run_enrichment_tasks(resume_text, tasks)
+    profile = results.get('profile', results)
+
+    enrichment_ms = (time.perf_counter() - enrichment_start) * 1000
+    print(f"Bedrock usage ({EXTRACTION_MODE}): {usage['calls']} calls, "
+          f"{usage['inputTokens']} input tokens, {usage['outputTokens']} output tokens, "
+          f"enrichment took {enrichment_ms:.0f} ms")
+
+    if inference_cache:
+        # Only cache answers that came back cleanly; defaults and API errors are retried next time.
+        llm_steps = {'profile', 'name', 'experienceSummary', 'isPostGraduate'}
+        if cached_profile is None and not usage['errors'] and not llm_steps.intersection(failed_steps):
+            inference_cache.put(resume_text, {
+                'name': profile['name'],
+                'experienceSummary': profile['experienceSummary'],
+                'isPostGraduate': profile['isPostGraduate']
+            }, usage['inputTokens'], usage['outputTokens'], enrichment_ms)
+        print(f"Inference cache stats: {inference_cache.stats}, hit rate {inference_cache.hit_rate():.0%}")
+
+    for field in ('name', 'postgrad'):
+        settled = LOCAL_DECISIONS[f'{field}Local'] + LOCAL_DECISIONS[f'{field}Bedrock']
+        if settled:
+            print(f"{field} settled locally for {LOCAL_DECISIONS[f'{field}Local']}/{settled} resumes in this container.")
+
+    print("Extraction complete.")
+    return candidate_record(profile, results['contact_info'], results['library_items'])
+
+
+def candidate_record(profile: dict, contact_info: dict, library_items: dict, candidate_id: str = None) -> dict:
+    """Assembles the candidate JSON from the enrichment results."""
+    languages_spoken = library_items['languages']
+
+    # Get current UTC time in ISO 8601 format
+    upload_timestamp = datetime.utcnow().isoformat() + "Z"
+
+    return {
+        'candidateId': candidate_id or f"CAND_{uuid.uuid4().hex[:12].upper()}",
+        'uploadDate': upload_timestamp,
+        'name': profile['name'],
+        'email': contact_info['email'],
+        'phoneNumber': contact_info['phone_number'],
+        'skills': {
+            'technical': library_items['technical'],
+            'nonTechnical': library_items['nonTechnical']
+        },
+        'languages': languages_spoken if languages_spoken else "Not defined",
+        'experienceSummary': profile['experienceSummary'],
+        'isPostGraduate': profile['isPostGraduate']
+    }
 
 
 def lambda_handler(event, context):
@@ -254,39 +613,20 @@ def lambda_handler(event, context):
         source_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
         print(f"New file detected: '{source_key}' in bucket '{source_bucket}'.")
 
+        if not source_key.endswith('.txt'):
+            print(f"Skipping '{source_key}', only extracted .txt files are processed.")
+            return {'statusCode': 200, 'body': json.dumps(f"Skipped '{source_key}'.")}
+
         s3_object = s3_client.get_object(Bucket=source_bucket, Key=source_key)
+        if is_fused_artifact(s3_object):
+            print(f"Skipping '{source_key}', the fused pipeline already processed it.")
+            return {'statusCode': 200, 'body': json.dumps(f"Skipped '{source_key}'.")}
         resume_text = s3_object['Body'].read().decode('utf-8')
+        # The layout document keeps line breaks, so the header can be taken directly.
+        layout = load_layout(s3_client, source_bucket, source_key)
+        header = header_text(layout) if layout else None
 
-        print("Extracting details using Amazon Bedrock...")
-        # Use Bedrock for name, summary, and post-graduation status
-        extracted_name = get_name_via_bedrock(resume_text)
-        experience_summary = get_experience_summary_via_bedrock(resume_text)
-        is_post_graduate = check_postgraduation_status_via_bedrock(resume_text)
-
-        print("Extracting contact info and skills...")
-        contact_info = extract_contact_info(resume_text)
-        technical_skills = extract_items_from_library(resume_text, TECHNICAL_SKILLS_LIBRARY)
-        non_technical_skills = extract_items_from_library(resume_text, NON_TECHNICAL_SKILLS_LIBRARY)
-        languages_spoken = extract_items_from_library(resume_text, LANGUAGES_SPOKEN_LIBRARY)
-        print("Extraction complete.")
-
-        # Get current UTC time in ISO 8601 format
-        upload_timestamp = datetime.utcnow().isoformat() + "Z"
-
-        output_data = {
-            'candidateId': f"CAND_{uuid.uuid4().hex[:12].upper()}",
-            'uploadDate': upload_timestamp,
-            'name': extracted_name,
-            'email': contact_info['email'],
-            'phoneNumber': contact_info['phone_number'],
-            'skills': {
-                'technical': technical_skills,
-                'nonTechnical': non_technical_skills
-            },
-            'languages': languages_spoken if languages_spoken else "Not defined",
-            'experienceSummary': experience_summary,
-            'isPostGraduate': is_post_graduate
-        }
+        output_data = build_candidate(resume_text, header)
 
         output_key = os.path.splitext(source_key)[0] + '.json'
 
@@ -294,7 +634,9 @@ def lambda_handler(event, context):
             Bucket=DESTINATION_BUCKET,
             Key=output_key,
             Body=json.dumps(output_data, indent=4),
-            ContentType='application/json'
+            ContentType='application/json',
+            # Carried along so the appender can report the upload-to-dashboard time.
+            Metadata={key: value for key, value in s3_object.get('Metadata', {}).items() if key == UPLOADED_AT_METADATA}
         )
         success_message = f"Successfully processed '{source_key}' and saved result to '{output_key}' in bucket '{DESTINATION_BUCKET}'."
         print(success_message)
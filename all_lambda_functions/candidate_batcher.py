@@ -0,0 +1,175 @@
+import json
+import random
+import time
+import urllib.parse
+import uuid
+from collections import deque
+
+from botocore.exceptions import ClientError
+
+from candidate_log import merge_record_stream
+from json_stream import S3JSONArrayWriter, iter_array
+from pipeline_timing import is_fused_artifact
+
+# Retries of the conditional master-file write when another writer got there first.
+MAX_WRITE_ATTEMPTS = 6
+
+
+class InMemoryQueue:
+    """Local stand-in for an SQS queue with the subset of behaviour the batcher uses."""
+
+    def __init__(self):
+        self._messages = deque()
+        self._in_flight = {}
+
+    def send(self, body: str):
+        self._messages.append({'MessageId': uuid.uuid4().hex, 'Body': body})
+
+    def receive(self, max_messages: int) -> list:
+        received = []
+        while self._messages and len(received) < max_messages:
+            message = dict(self._messages.popleft(), ReceiptHandle=uuid.uuid4().hex)
+            self._in_flight[message['ReceiptHandle']] = message
+            received.append(message)
+        return received
+
+    def delete(self, receipt_handles: list):
+        for handle in receipt_handles:
+            self._in_flight.pop(handle, None)
+
+    def release(self, receipt_handles: list):
+        """Makes messages visible again, like an expired SQS visibility timeout."""
+        for handle in receipt_handles:
+            message = self._in_flight.pop(handle, None)
+            if message:
+                self._messages.append({'MessageId': message['MessageId'], 'Body': message['Body']})
+
+    def __len__(self):
+        return len(self._messages)
+
+
+class SQSQueue:
+    """The same interface on top of a real SQS queue."""
+
+    def __init__(self, sqs_client, queue_url: str):
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+
+    def send(self, body: str):
+        self.sqs_client.send_message(QueueUrl=self.queue_url, MessageBody=body)
+
+    def receive(self, max_messages: int) -> list:
+        received = []
+        while len(received) < max_messages:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url, MaxNumberOfMessages=min(10, max_messages - len(received)), WaitTimeSeconds=0
+            )
+            messages = response.get('Messages', [])
+            if not messages:
+                break
+            received.extend(messages)
+        return received
+
+    def delete(self, receipt_handles: list):
+        for start in range(0, len(receipt_handles), 10):
+            entries = [{'Id': str(index), 'ReceiptHandle': handle}
+                       for index, handle in enumerate(receipt_handles[start:start + 10])]
+            self.sqs_client.delete_message_batch(QueueUrl=self.queue_url, Entries=entries)
+
+    def release(self, receipt_handles: list):
+        for handle in receipt_handles:
+            self.sqs_client.change_message_visibility(QueueUrl=self.queue_url, ReceiptHandle=handle,
+                                                      VisibilityTimeout=0)
+
+
+def keys_from_message(body: str) -> list:
+    """Returns [(bucket, key)] from an S3 event notification message body (ignores s3:TestEvent)."""
+    notification = json.loads(body)
+    keys = []
+    for record in notification.get('Records', []):
+        if 's3' in record:
+            keys.append((record['s3']['bucket']['name'],
+                         urllib.parse.unquote_plus(record['s3']['object']['key'], encoding='utf-8')))
+    return keys
+
+
+def merge_into_master(s3_client, bucket: str, master_key: str, new_records: list) -> dict:
+    """
+    Adds new_records to the master JSON list with one read-modify-write.
+
+    The write is conditional on the ETag that was read (or on the file not existing yet),
+    so a concurrent writer can never be overwritten; on a conflict the file is re-read
+    and the merge retried with jittered backoff.
+    """
+    for attempt in range(1, MAX_WRITE_ATTEMPTS + 1):
+        try:
+            response = s3_client.get_object(Bucket=bucket, Key=master_key)
+            existing = iter_array(response['Body'])
+            condition = {'IfMatch': response['ETag']}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('NoSuchKey', '404'):
+                raise
+            existing = iter(())
+            condition = {'IfNoneMatch': '*'}
+
+        # The master file is streamed through the merge, so memory doesn't grow with its size.
+        try:
+            with S3JSONArrayWriter(s3_client, bucket, master_key, condition=condition) as writer:
+                writer.write_all(merge_record_stream(existing, new_records))
+                writer.close()
+            return {'attempts': attempt, 'totalCandidates': writer.count}
+        except ClientError as e:
+            if e.response['Error']['Code'] not in ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409'):
+                raise
+            print(f"'{master_key}' changed while merging (attempt {attempt}/{MAX_WRITE_ATTEMPTS}). Retrying.")
+            time.sleep(random.uniform(0, 0.1 * 2 ** attempt))
+
+    raise RuntimeError(f"Could not update '{master_key}' after {MAX_WRITE_ATTEMPTS} attempts.")
+
+
+def load_candidates(s3_client, messages: list):
+    """
+    Reads the candidate JSON files referenced by the messages.
+    Returns (records, ids of messages whose files could not be read).
+    """
+    records, failed = [], []
+    for message in messages:
+        try:
+            for bucket, key in keys_from_message(message['Body']):
+                response = s3_client.get_object(Bucket=bucket, Key=key)
+                if is_fused_artifact(response):
+                    continue
+                records.append(json.loads(response['Body'].read().decode('utf-8')))
+        except Exception as e:
+            print(f"Could not read candidate for message {message['MessageId']}: {e}")
+            failed.append(message['MessageId'])
+    return records, failed
+
+
+def drain_queue(queue, s3_client, bucket: str, master_key: str, max_records: int = 500) -> dict:
+    """
+    Drains up to max_records pending messages and merges all of them into the master file
+    with a single conditional write. Messages are deleted only after the write succeeded;
+    the ones whose candidate file couldn't be read are released for a later retry.
+    """
+    started = time.perf_counter()
+    messages = queue.receive(max_records)
+    if not messages:
+        return {'messages': 0, 'records': 0, 'writes': 0, 'recordsPerWrite': 0.0}
+
+    records, failed = load_candidates(s3_client, messages)
+    write = merge_into_master(s3_client, bucket, master_key, records) if records else {'attempts': 0}
+
+    queue.delete([message['ReceiptHandle'] for message in messages if message['MessageId'] not in failed])
+    queue.release([message['ReceiptHandle'] for message in messages if message['MessageId'] in failed])
+
+    writes = 1 if records else 0
+    return {
+        'messages': len(messages),
+        'records': len(records),
+        'failedMessages': len(failed),
+        'writes': writes,
+        'writeAttempts': write['attempts'],
+        'recordsPerWrite': len(records) / writes if writes else 0.0,
+        'seconds': round(time.perf_counter() - started, 3),
+    }
@@ -0,0 +1,290 @@
+import json
+import time
+import uuid
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+from json_stream import S3JSONArrayWriter, iter_array
+
+# Layout inside the dashboard bucket:
+#   candidates/segments/<utc time>-<id>.jsonl   immutable append segments, one JSON record per line
+#   candidates/snapshots/<watermark>-<id>.json  consolidated snapshots written by compact()
+#   candidates/manifest.json                    current snapshot key + watermark (last compacted segment key)
+#   candidates.json                             copy of the latest snapshot
+# Readers (the dashboard index) use open_view(): the snapshot plus the tail, so a candidate
+# is visible as soon as its segment is written, not only after compaction. A compaction
+# keeps the segments it absorbed until the next one, so consumers that follow the log by
+# segment key (the anonymizer, with compacted_since()) can read what changed.
+SEGMENT_PREFIX = 'candidates/segments/'
+SNAPSHOT_PREFIX = 'candidates/snapshots/'
+MANIFEST_KEY = 'candidates/manifest.json'
+
+# Compaction policy, checked by the appender's scheduled invocation (never on upload):
+# compact once the tail has this many segments, this many bytes, or its oldest segment
+# is this old.
+COMPACTION_MAX_SEGMENTS = 50
+COMPACTION_MAX_BYTES = 1024 * 1024
+COMPACTION_MAX_AGE_SECONDS = 60
+# Segments younger than this are never compacted. Segment keys are named before they are
+# written, so this has to be longer than the slowest writer (the 60 s Lambda timeout).
+COMPACTION_GRACE_SECONDS = 120
+
+
+def _is_missing(error: ClientError) -> bool:
+    return error.response['Error']['Code'] in ('NoSuchKey', '404')
+
+
+def _is_conflict(error: ClientError) -> bool:
+    return error.response['Error']['Code'] in ('PreconditionFailed', 'ConditionalRequestConflict', '412', '409')
+
+
+def _segment_time(key: str) -> float:
+    stamp = key[len(SEGMENT_PREFIX):].split('-', 1)[0]
+    return datetime.strptime(stamp, '%Y%m%dT%H%M%S%fZ').replace(tzinfo=timezone.utc).timestamp()
+
+
+def append_records(s3_client, bucket: str, records: list) -> str:
+    """Writes records as one new immutable segment. Cost depends only on len(records)."""
+    stamp = datetime.now(timezone.utc).strftime('%Y%m%dT%H%M%S%fZ')
+    key = f"{SEGMENT_PREFIX}{stamp}-{uuid.uuid4().hex[:8]}.jsonl"
+    body = ''.join(json.dumps(record) + '\n' for record in records)
+    s3_client.put_object(Bucket=bucket, Key=key, Body=body.encode('utf-8'), ContentType='application/x-ndjson')
+    return key
+
+
+def read_manifest(s3_client, bucket: str):
+    """Returns (manifest, etag). An empty manifest and None etag mean nothing was compacted yet."""
+    try:
+        response = s3_client.get_object(Bucket=bucket, Key=MANIFEST_KEY)
+    except ClientError as e:
+        if _is_missing(e):
+            return {'snapshotKey': None, 'watermark': ''}, None
+        raise
+    return json.loads(response['Body'].read().decode('utf-8')), response['ETag']
+
+
+def list_tail_segments(s3_client, bucket: str, watermark: str) -> list:
+    """Lists segments written after the watermark, oldest first: [{'Key', 'Size', ...}]."""
+    segments = []
+    paginator = s3_client.get_paginator('list_objects_v2')
+    for page in paginator.paginate(Bucket=bucket, Prefix=SEGMENT_PREFIX, StartAfter=watermark or SEGMENT_PREFIX):
+        segments.extend(page.get('Contents', []))
+    return segments
+
+
+def read_segment(s3_client, bucket: str, key: str) -> list:
+    body = s3_client.get_object(Bucket=bucket, Key=key)['Body'].read().decode('utf-8')
+    return [json.loads(line) for line in body.splitlines() if line.strip()]
+
+
+def merge_records(records: list, new_records: list) -> list:
+    """Appends new_records, replacing earlier records with the same candidateId."""
+    positions = {record.get('candidateId'): index for index, record in enumerate(records) if record.get('candidateId')}
+    for record in new_records:
+        index = positions.get(record.get('candidateId'))
+        if index is None:
+            positions[record.get('candidateId')] = len(records)
+            records.append(record)
+        else:
+            records[index] = record
+    return records
+
+
+def merge_record_stream(records, new_records: list):
+    """
+    Streaming merge_records: yields records, with the ones sharing a candidateId with a new
+    record replaced, then the remaining new records. Only new_records is held in memory.
+    """
+    latest = {record['candidateId']: record for record in new_records if record.get('candidateId')}
+    written = set()
+    for record in records:
+        candidate_id = record.get('candidateId')
+        if candidate_id in latest and candidate_id not in written:
+            written.add(candidate_id)
+            yield latest[candidate_id]
+        else:
+            yield record
+    for record in new_records:
+        candidate_id = record.get('candidateId')
+        if not candidate_id:
+            yield record
+        elif candidate_id not in written:
+            written.add(candidate_id)
+            yield latest[candidate_id]
+
+
+def _open_snapshot(s3_client, bucket: str, manifest: dict, seed_key: str = None):
+    """
+    Opens the snapshot the manifest points to: (response, key), or (None, None) when there is
+    nothing yet. Before the first compaction there is no snapshot, and seed_key (the master
+    file written before the log existed) is used instead.
+    """
+    key = manifest['snapshotKey'] or seed_key
+    if not key:
+        return None, None
+    try:
+        return s3_client.get_object(Bucket=bucket, Key=key), key
+    except ClientError as e:
+        if _is_missing(e) and not manifest['snapshotKey']:
+            return None, None
+        raise
+
+
+def iter_snapshot(s3_client, bucket: str, manifest: dict, seed_key: str = None):
+    """Streams the snapshot the manifest points to (see _open_snapshot)."""
+    snapshot, _ = _open_snapshot(s3_client, bucket, manifest, seed_key)
+    return iter_array(snapshot['Body']) if snapshot else iter(())
+
+
+def _open_view_once(s3_client, bucket: str, seed_key: str = None) -> dict:
+    manifest, _ = read_manifest(s3_client, bucket)
+    tail = list_tail_segments(s3_client, bucket, manifest['watermark'])
+    tail_records = []
+    for segment in tail:
+        tail_records = merge_records(tail_records, read_segment(s3_client, bucket, segment['Key']))
+    # Opened last: compaction deletes the old snapshot before the segments it absorbed, so
+    # if the snapshot is still there, the segments read above were all of its tail.
+    snapshot, snapshot_key = _open_snapshot(s3_client, bucket, manifest, seed_key)
+    snapshot_etag = snapshot['ETag'] if snapshot else ''
+    return {
+        'snapshotKey': snapshot_key,
+        'snapshot': iter_array(snapshot['Body']) if snapshot else iter(()),
+        'tail': tail_records,
+        'tailSegments': len(tail),
+        'version': f"{snapshot_etag}|{tail[-1]['Key'] if tail else ''}",
+    }
+
+
+def open_view(s3_client, bucket: str, seed_key: str = None, retries: int = 3) -> dict:
+    """
+    Opens the current view of the log for a reader: the snapshot named by the manifest,
+    streamed, plus the records of every tail segment. Returns {'snapshot': iterator over the
+    snapshot records, 'tail': tail records, 'version': ...}; iterate the merged candidates
+    with iter_view(). version changes whenever the view does (new snapshot or new tail
+    segment), so readers can skip work when it didn't. If a compaction removes files while
+    the view is opened, it is opened again with the new manifest.
+    """
+    for attempt in range(retries):
+        try:
+            return _open_view_once(s3_client, bucket, seed_key)
+        except ClientError as e:
+            if not _is_missing(e) or attempt == retries - 1:
+                raise
+            print("Candidate log changed during read. Retrying with the new manifest.")
+
+
+def iter_view(view: dict):
+    """Streams every candidate of an opened view; only the tail records are held in memory."""
+    return merge_record_stream(view['snapshot'], view['tail'])
+
+
+def read_candidates(s3_client, bucket: str, seed_key: str = None, retries: int = 3) -> list:
+    """Returns every candidate: the snapshot named by the manifest plus all tail segments."""
+    return list(iter_view(open_view(s3_client, bucket, seed_key, retries)))
+
+
+def _segments_between(s3_client, bucket: str, after: str, through: str) -> list:
+    if not through:
+        return []
+    return [segment for segment in list_tail_segments(s3_client, bucket, after) if segment['Key'] <= through]
+
+
+def compacted_since(s3_client, bucket: str, manifest: dict, watermark: str):
+    """
+    The segments compacted after watermark, up to the manifest's watermark, oldest first;
+    their records are what the current snapshot added. Returns None when some of them may
+    be gone already: only the segments of the latest compaction are kept.
+    """
+    if watermark < manifest.get('previousWatermark', manifest['watermark']):
+        return None
+    return _segments_between(s3_client, bucket, watermark, manifest['watermark'])
+
+
+def should_compact(tail: list, now: float = None) -> bool:
+    if not tail:
+        return False
+    now = now or time.time()
+    return (len(tail) >= COMPACTION_MAX_SEGMENTS
+            or sum(segment['Size'] for segment in tail) >= COMPACTION_MAX_BYTES
+            or now - _segment_time(tail[0]['Key']) >= COMPACTION_MAX_AGE_SECONDS)
+
+
+def compact(s3_client, bucket: str, published_key: str = None, force: bool = False) -> dict:
+    """
+    Merges the snapshot and settled tail segments into a new snapshot, if the policy says so.
+
+    The manifest is replaced with an ETag-conditional put, so of two concurrent compactions
+    only one wins; the loser deletes its snapshot and leaves everything as it was. Segments
+    are only deleted once the winning manifest no longer needs them. When published_key is
+    given the new snapshot is also copied there (e.g. candidates.json for the dashboard),
+    and the first compaction starts from what is already stored under that key.
+    """
+    manifest, manifest_etag = read_manifest(s3_client, bucket)
+    tail = list_tail_segments(s3_client, bucket, manifest['watermark'])
+
+    settled_before = time.time() - COMPACTION_GRACE_SECONDS
+    settled = [segment for segment in tail if _segment_time(segment['Key']) <= settled_before]
+    if not settled or not (force or should_compact(tail)):
+        return {'compacted': False, 'reason': 'policy', 'tailSegments': len(tail)}
+
+    # The snapshot is streamed through the merge into the new one, so only the settled
+    # segments' records are held in memory. Records from unsettled segments stay in the tail.
+    watermark = settled[-1]['Key']
+    # Unique per attempt: a compaction that loses the manifest race deletes its own snapshot,
+    # which must never be the one the winner just published.
+    snapshot_key = f"{SNAPSHOT_PREFIX}{watermark[len(SEGMENT_PREFIX):-len('.jsonl')]}-{uuid.uuid4().hex[:8]}.json"
+    try:
+        new_records = []
+        for segment in settled:
+            new_records = merge_records(new_records, read_segment(s3_client, bucket, segment['Key']))
+        new_ids = {record['candidateId'] for record in new_records if record.get('candidateId')}
+        replaced = False
+
+        def snapshot_records():
+            nonlocal replaced
+            for record in iter_snapshot(s3_client, bucket, manifest, published_key):
+                replaced = replaced or record.get('candidateId') in new_ids
+                yield record
+
+        with S3JSONArrayWriter(s3_client, bucket, snapshot_key) as writer:
+            writer.write_all(merge_record_stream(snapshot_records(), new_records))
+            writer.close()
+    except ClientError as e:
+        if _is_missing(e):
+            return {'compacted': False, 'reason': 'concurrent compaction'}
+        raise
+    records = writer.count
+
+    # replacedThrough: the watermark of the latest compaction whose segments replaced
+    # candidates already in the snapshot. Consumers past it know the rest only added some.
+    new_manifest = {'snapshotKey': snapshot_key, 'watermark': watermark, 'previousWatermark': manifest['watermark'],
+                    'replacedThrough': watermark if replaced else manifest.get('replacedThrough', ''),
+                    'records': records, 'compactedAt': datetime.now(timezone.utc).isoformat()}
+    condition = {'IfMatch': manifest_etag} if manifest_etag else {'IfNoneMatch': '*'}
+    try:
+        s3_client.put_object(Bucket=bucket, Key=MANIFEST_KEY, Body=json.dumps(new_manifest).encode('utf-8'),
+                             ContentType='application/json', **condition)
+    except ClientError as e:
+        if not _is_conflict(e):
+            raise
+        print("Another compaction updated the manifest first. Discarding this snapshot.")
+        s3_client.delete_object(Bucket=bucket, Key=snapshot_key)
+        return {'compacted': False, 'reason': 'concurrent compaction'}
+
+    if published_key:
+        s3_client.copy_object(Bucket=bucket, Key=published_key, ContentType='application/json',
+                              MetadataDirective='REPLACE', CopySource={'Bucket': bucket, 'Key': snapshot_key})
+
+    # The new manifest no longer references these, so they can go. The old snapshot goes
+    # first: a reader that still finds it also found all of its tail segments (open_view).
+    # The segments just absorbed stay until the next compaction (see compacted_since); the
+    # ones the previous compaction absorbed go now.
+    if manifest['snapshotKey']:
+        s3_client.delete_object(Bucket=bucket, Key=manifest['snapshotKey'])
+    obsolete = [{'Key': segment['Key']} for segment in _segments_between(
+        s3_client, bucket, manifest.get('previousWatermark', ''), manifest['watermark'])]
+    for start in range(0, len(obsolete), 1000):
+        s3_client.delete_objects(Bucket=bucket, Delete={'Objects': obsolete[start:start + 1000], 'Quiet': True})
+
+    return {'compacted': True, 'records': records, 'segments': len(settled), 'snapshotKey': snapshot_key}
@@ -0,0 +1,95 @@
+import re
+
+from resume_sections import segment_resume
+
+# Normalized degree taxonomy: (normalized name, level, pattern).
+# 'postgraduate' entries are unambiguous; 'ambiguous' ones also mean other things in
+# resumes ("MS Excel", "LLM" the model) and only count when they sit in the education
+# section, where they are left to the LLM.
+DEGREE_TAXONOMY = [
+    ("M.Tech", 'postgraduate', r"m\.?\s?tech"),
+    ("M.E.", 'postgraduate', r"m\.e\.?(?!\w)"),
+    ("M.S.", 'postgraduate', r"m\.s\.?(?!\w)|ms\s+(?:in|of)\b"),
+    ("M.Sc", 'postgraduate', r"m\.?\s?sc"),
+    ("MBA", 'postgraduate', r"m\.?b\.?a\.?"),
+    ("MCA", 'postgraduate', r"m\.?c\.?a\.?"),
+    # Capital M only: a lowercase "m.com" is a domain, not a degree.
+    ("M.Com", 'postgraduate', r"(?-i:M)\.?\s?com"),
+    ("M.A.", 'postgraduate', r"m\.a\.(?!\w)|ma\s+in\b"),
+    ("M.Phil", 'postgraduate', r"m\.?\s?phil"),
+    ("M.Pharm", 'postgraduate', r"m\.?\s?pharm"),
+    ("Master's", 'postgraduate', r"master'?s|masters?\s+(?:of|in|degree)\b"),
+    ("Post Graduate", 'postgraduate', r"post[\s-]?graduat(?:e|ion)|pg\s?diploma|pgd(?:m|ba)"),
+    ("PhD", 'postgraduate', r"ph\.?\s?d\.?|doctorate|d\.phil"),
+    ("MS", 'ambiguous', r"ms|md|llm"),
+    ("B.Tech", 'undergraduate', r"b\.?\s?tech|b\.e\.(?!\w)|b\.?\s?sc|bca|bba|b\.?\s?com|b\.s\.(?!\w)|b\.a\.(?!\w)"),
+    ("Bachelor's", 'undergraduate', r"bachelor'?s?|under[\s-]?graduate"),
+]
+
+# One regex for the whole taxonomy; the named group that matched identifies the entry.
+# The lookahead lists every first letter in the taxonomy so most positions fail fast.
+_DEGREE_PATTERN = re.compile(
+    r"(?<![\w.])(?=[mbpdlu])(?:" + '|'.join(f"(?P<d{index}>{pattern})" for index, (_, _, pattern) in enumerate(DEGREE_TAXONOMY)) + r")(?!\w)",
+    re.IGNORECASE
+)
+
+# Words near a degree that say it is still in progress, or only planned.
+_PURSUING_PATTERN = re.compile(r"pursuing|ongoing|currently|expected|in progress|present|final year|till date", re.IGNORECASE)
+_INTENT_PATTERN = re.compile(r"planning|plan to|aspir|intend|wish to|want to|preparing for|applying", re.IGNORECASE)
+_CONTEXT_CHARS = 60
+# Emails and web addresses are blanked out before matching ("m.com", "mba.example.org").
+_ADDRESS_PATTERN = re.compile(r"\S+@\S+|(?:https?://|www\.)\S+", re.IGNORECASE)
+# Master-like tokens the taxonomy doesn't know ("M Eng", "MArch"); when the education
+# section has one, an undergraduate degree alone doesn't settle the answer.
+_LOOSE_MASTER_PATTERN = re.compile(
+    r"(?<![\w.])(?:m(?:\.\s?|\s)[a-z]{1,5}|(?-i:M(?:Eng|Des|Arch|Res|FA|PA|Ed|St)))\b|master|post[\s-]?grad", re.IGNORECASE)
+
+
+def _mentions(text: str, token: str) -> bool:
+    return re.search(r"(?<![\w.])" + re.escape(token) + r"(?!\w)", text) is not None
+
+
+def classify_postgraduate(resume_text: str) -> dict:
+    """
+    Decides locally whether a resume mentions a postgraduate degree (completed or ongoing).
+
+    Returns {'isPostGraduate': 1/0, 'confidence': 0..1, 'status': 'completed'/'pursuing'/None,
+    'evidence': normalized degree names found}. Low confidence means the text was ambiguous
+    and the caller should ask the LLM. Only degrees named in the education section are
+    confident: a mention elsewhere ("built an MBA admissions portal") is left to the LLM.
+    """
+    resume_text = _ADDRESS_PATTERN.sub(lambda match: ' ' * len(match.group(0)), resume_text)
+    education = segment_resume(resume_text)['education']
+
+    postgraduate, planned, ambiguous, undergraduate = [], [], [], []
+    for match in _DEGREE_PATTERN.finditer(resume_text):
+        name, level, _ = DEGREE_TAXONOMY[int(match.lastgroup[1:])]
+        if level == 'undergraduate':
+            undergraduate.append((name, _mentions(education, match.group(0))))
+        elif level == 'ambiguous':
+            if _mentions(education, match.group(0)):
+                ambiguous.append(match.group(0))
+        elif _INTENT_PATTERN.search(resume_text, max(0, match.start() - _CONTEXT_CHARS), match.start()):
+            planned.append(name)
+        else:
+            window = resume_text[max(0, match.start() - _CONTEXT_CHARS):match.end() + _CONTEXT_CHARS]
+            postgraduate.append((name, bool(_PURSUING_PATTERN.search(window)), _mentions(education, match.group(0))))
+
+    if postgraduate:
+        evidence = sorted({name for name, _, _ in postgraduate})
+        status = 'completed' if any(not pursuing for _, pursuing, _ in postgraduate) else 'pursuing'
+        confidence = 0.95 if any(in_education for _, _, in_education in postgraduate) else 0.6
+        return {'isPostGraduate': 1, 'confidence': confidence, 'status': status, 'evidence': evidence}
+
+    if planned:
+        return {'isPostGraduate': 0, 'confidence': 0.5, 'status': None, 'evidence': sorted(set(planned))}
+    if ambiguous:
+        return {'isPostGraduate': 0, 'confidence': 0.4, 'status': None, 'evidence': sorted(set(ambiguous))}
+    if undergraduate:
+        # Confident only when the education section lists the undergraduate degree and nothing
+        # that looks like a master's the taxonomy missed; otherwise the LLM decides.
+        settled = any(in_education for _, in_education in undergraduate) and not _LOOSE_MASTER_PATTERN.search(education)
+        return {'isPostGraduate': 0, 'confidence': 0.85 if settled else 0.5, 'status': None,
+                'evidence': sorted({name for name, _ in undergraduate})}
+    # No degree words at all: either there is no education info or it's phrased in a way we don't know.
+    return {'isPostGraduate': 0, 'confidence': 0.5, 'status': None, 'evidence': []}
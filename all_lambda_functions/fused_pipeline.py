@@ -0,0 +1,153 @@
+import json
+import logging
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from urllib.parse import unquote_plus
+
+import bedrock_lambda
+import json_appender_lambda
+import text_extraction
+from layout_document import header_text, layout_key
+from pdf_prescan import MAX_EXTRACT_PAGES, MAX_PDF_BYTES, ROUTE_REJECT, record_route
+from pipeline_timing import PIPELINE_FUSED, PIPELINE_METADATA, UPLOADED_AT_METADATA
+from text_cache import TEXT_CACHE_ENABLED, cache_key, content_digest, load, record_lookup
+
+# Fused pipeline: one invocation takes an uploaded PDF through extraction, enrichment and
+# the append to the candidate log, keeping the text, layout and candidate in memory instead
+# of passing them from Lambda to Lambda through S3 events.
+#
+# Selected per deployment: point the PDF bucket's trigger at fused_pipeline.lambda_handler
+# instead of text_extraction's handler (the package must contain the modules of all three
+# stages; see pipeline_mode in aws/config.py). The anonymizer still runs off candidates.json.
+# The intermediate .layout.json, .txt and .json are still written for audit, in the
+# background while the next step runs. They carry pipeline=fused metadata, so a chained
+# stage that is still wired to those buckets skips them.
+
+logger = logging.getLogger()
+logger.setLevel(logging.INFO)
+
+FUSED_AUDIT_WRITES = os.environ.get('FUSED_AUDIT_WRITES', 'true').lower() == 'true'
+AUDIT_MAX_WORKERS = 4
+
+
+def _audit_put(pool: ThreadPoolExecutor, futures: list, **put_arguments):
+    if FUSED_AUDIT_WRITES:
+        futures.append(pool.submit(text_extraction.s3.put_object, **put_arguments))
+
+
+def extract(bucket: str, key: str, pool: ThreadPoolExecutor, futures: list):
+    """
+    Returns (text, layout, metadata) for the PDF, from the text cache when an identical PDF
+    was extracted before, or None when the PDF is routed away from extraction.
+    """
+    s3_object = text_extraction.s3.get_object(Bucket=bucket, Key=key)
+    if s3_object['ContentLength'] > MAX_PDF_BYTES:
+        s3_object['Body'].close()
+        record_route(ROUTE_REJECT)
+        text_extraction.route_document(bucket, key, ROUTE_REJECT,
+                                       f"{s3_object['ContentLength']} bytes is over the {MAX_PDF_BYTES} byte limit")
+        return None
+
+    pdf_bytes, cached = None, None
+    digest = content_digest(s3_object) if TEXT_CACHE_ENABLED else None
+    if digest:
+        cached = load(text_extraction.s3, text_extraction.DEST_BUCKET,
+                      cache_key(digest, text_extraction.EXTRACTION_PRESET, MAX_EXTRACT_PAGES),
+                      with_layout=text_extraction.STRUCTURED_OUTPUT)
+    if cached is None:
+        pdf_bytes = s3_object['Body'].read()
+        if TEXT_CACHE_ENABLED and digest is None:
+            digest = content_digest(s3_object, pdf_bytes)
+            cached = load(text_extraction.s3, text_extraction.DEST_BUCKET,
+                          cache_key(digest, text_extraction.EXTRACTION_PRESET, MAX_EXTRACT_PAGES),
+                          with_layout=text_extraction.STRUCTURED_OUTPUT)
+    else:
+        s3_object['Body'].close()
+    if TEXT_CACHE_ENABLED:
+        record_lookup(hit=cached is not None)
+
+    if cached is not None:
+        text, layout = cached
+        return (text.decode('utf-8'), json.loads(layout) if layout else None,
+                {'extraction-strategy': 'cache', 'content-digest': digest})
+
+    extraction = text_extraction.prescan_and_extract(bucket, key, pdf_bytes)
+    if extraction is None:
+        return None
+    if TEXT_CACHE_ENABLED:
+        layout_body = json.dumps(extraction['layout'], separators=(',', ':')).encode('utf-8') \
+            if extraction['layout'] is not None else None
+        futures.append(pool.submit(text_extraction.cache_extraction, digest, key,
+                                   extraction['text'].encode('utf-8'), layout_body, extraction['metadata']))
+    return extraction['text'], extraction['layout'], extraction['metadata']
+
+
+def process_pdf(bucket: str, key: str, uploaded_at: str, pool: ThreadPoolExecutor, futures: list):
+    """Runs extraction and enrichment for one PDF. Returns (candidate, timings) or None if it was routed away."""
+    timings = {}
+    started = time.perf_counter()
+    extracted = extract(bucket, key, pool, futures)
+    timings['extractMs'] = round((time.perf_counter() - started) * 1000)
+    if extracted is None:
+        return None
+    text, layout, metadata = extracted
+
+    text_key = key.replace('.pdf', '.txt')
+    audit_metadata = dict(metadata, **{PIPELINE_METADATA: PIPELINE_FUSED})
+    if uploaded_at:
+        audit_metadata[UPLOADED_AT_METADATA] = uploaded_at
+    if layout is not None:
+        _audit_put(pool, futures, Bucket=text_extraction.DEST_BUCKET, Key=layout_key(text_key),
+                   Body=json.dumps(layout, separators=(',', ':')).encode('utf-8'), ContentType='application/json',
+                   Metadata={PIPELINE_METADATA: PIPELINE_FUSED})
+    _audit_put(pool, futures, Bucket=text_extraction.DEST_BUCKET, Key=text_key, Body=text.encode('utf-8'),
+               Metadata=audit_metadata)
+
+    started = time.perf_counter()
+    candidate = bedrock_lambda.build_candidate(text, header_text(layout) if layout else None)
+    timings['enrichMs'] = round((time.perf_counter() - started) * 1000)
+    _audit_put(pool, futures, Bucket=bedrock_lambda.DESTINATION_BUCKET, Key=os.path.splitext(text_key)[0] + '.json',
+               Body=json.dumps(candidate, indent=4), ContentType='application/json',
+               Metadata={PIPELINE_METADATA: PIPELINE_FUSED})
+    return candidate, timings
+
+
+def lambda_handler(event, context):
+    candidates, processed = [], []
+    failed = 0
+    with ThreadPoolExecutor(max_workers=AUDIT_MAX_WORKERS) as pool:
+        futures = []
+        for record in event.get('Records', []):
+            bucket = record['s3']['bucket']['name']
+            key = unquote_plus(record['s3']['object']['key'])
+            logger.info(f"Received file: s3://{bucket}/{key}")
+            try:
+                result = process_pdf(bucket, key, record.get('eventTime'), pool, futures)
+            except Exception as e:
+                logger.error(f"❌ Fused pipeline failed for {key}: {e}")
+                failed += 1
+                continue
+            if result:
+                candidates.append(result[0])
+                processed.append((key, record.get('eventTime'), result[1]))
+
+        # All candidates of the invocation go into the candidate log with one write.
+        if candidates:
+            started = time.perf_counter()
+            json_appender_lambda.append_batch(candidates)
+            append_ms = round((time.perf_counter() - started) * 1000)
+            for key, uploaded_at, timings in processed:
+                timings['appendMs'] = append_ms
+                logger.info(f"Fused pipeline timings for {key}: {json.dumps(timings)}")
+                json_appender_lambda.report_latency(key, uploaded_at, 'fused')
+
+        # The audit copies must be in S3 before the invocation ends and the container is frozen.
+        done, _ = wait(futures)
+        audit_failures = [future.exception() for future in done if future.exception()]
+        for error in audit_failures:
+            logger.warning(f"Audit write failed: {error}")
+
+    if failed:
+        return {'statusCode': 500, 'body': json.dumps(f"{failed} PDF(s) failed in the fused pipeline.")}
+    return {'statusCode': 200, 'body': json.dumps(f"✅ {len(candidates)} candidate(s) appended.")}
@@ -0,0 +1,134 @@
+import hashlib
+import json
+import sqlite3
+import threading
+import time
+
+
+def cache_key(resume_text: str, prompt_version: str, model_id: str) -> str:
+    """Content address of one LLM extraction: same text, prompts and model give the same key."""
+    digest = hashlib.sha256()
+    for part in (prompt_version, model_id, resume_text):
+        digest.update(part.encode('utf-8'))
+        digest.update(b'\0')
+    return digest.hexdigest()
+
+
+class DynamoDBCacheBackend:
+    """
+    Stores cache records in the DynamoDB table created by aws.dynamodb_utils.setup_inference_cache_table.
+    'expiresAt' is the table's TTL attribute, so DynamoDB removes stale records on its own.
+    """
+
+    def __init__(self, table):
+        # table is a boto3 dynamodb Table resource
+        self.table = table
+
+    def get(self, key: str):
+        item = self.table.get_item(Key={'cacheKey': key}).get('Item')
+        if not item:
+            return None
+        return {
+            'cacheVersion': item.get('cacheVersion'),
+            'fields': json.loads(item['fields']),
+            'expiresAt': int(item.get('expiresAt', 0)),
+            'inputTokens': int(item.get('inputTokens', 0)),
+            'outputTokens': int(item.get('outputTokens', 0)),
+            'computeMs': int(item.get('computeMs', 0)),
+        }
+
+    def put(self, key: str, record: dict):
+        item = dict(record, cacheKey=key, fields=json.dumps(record['fields']))
+        self.table.put_item(Item=item)
+
+
+class SQLiteCacheBackend:
+    """Local file backend, used for tests and offline runs. ':memory:' keeps everything in process."""
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        # A single connection is shared so ':memory:' databases survive between calls.
+        self._connection = sqlite3.connect(path, check_same_thread=False)
+        with self._lock, self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS inference_cache (cache_key TEXT PRIMARY KEY, record TEXT NOT NULL)"
+            )
+
+    def get(self, key: str):
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT record FROM inference_cache WHERE cache_key = ?", (key,)
+            ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def put(self, key: str, record: dict):
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO inference_cache (cache_key, record) VALUES (?, ?)",
+                (key, json.dumps(record))
+            )
+
+
+class InferenceCache:
+    """
+    Caches parsed LLM fields keyed by a hash of the resume text, prompt version and model id.
+
+    Records expire after ttl_seconds and are ignored when their cacheVersion doesn't match,
+    so bumping the prompt version invalidates everything cached with older prompts.
+    Backend errors are logged and treated as misses; the cache never fails an extraction.
+    """
+
+    def __init__(self, backend, prompt_version: str, model_id: str, ttl_seconds: int = 30 * 24 * 3600):
+        self.backend = backend
+        self.prompt_version = prompt_version
+        self.model_id = model_id
+        self.ttl_seconds = ttl_seconds
+        self._lock = threading.Lock()
+        self.stats = {'hits': 0, 'misses': 0, 'writes': 0, 'errors': 0,
+                      'savedInputTokens': 0, 'savedOutputTokens': 0, 'savedMs': 0}
+
+    def _count(self, **increments):
+        with self._lock:
+            for field, amount in increments.items():
+                self.stats[field] += amount
+
+    def key_for(self, resume_text: str) -> str:
+        return cache_key(resume_text, self.prompt_version, self.model_id)
+
+    def get(self, resume_text: str):
+        """Returns the cached fields for this resume text, or None on a miss."""
+        try:
+            record = self.backend.get(self.key_for(resume_text))
+        except Exception as e:
+            print(f"Warning: Inference cache read failed: {e}")
+            self._count(errors=1, misses=1)
+            return None
+
+        if not record or record.get('cacheVersion') != self.prompt_version or record.get('expiresAt', 0) < time.time():
+            self._count(misses=1)
+            return None
+
+        self._count(hits=1, savedInputTokens=record.get('inputTokens', 0),
+                    savedOutputTokens=record.get('outputTokens', 0), savedMs=record.get('computeMs', 0))
+        return record['fields']
+
+    def put(self, resume_text: str, fields: dict, input_tokens: int = 0, output_tokens: int = 0, compute_ms: int = 0):
+        record = {
+            'cacheVersion': self.prompt_version,
+            'fields': fields,
+            'expiresAt': int(time.time()) + self.ttl_seconds,
+            'inputTokens': int(input_tokens),
+            'outputTokens': int(output_tokens),
+            'computeMs': int(compute_ms),
+        }
+        try:
+            self.backend.put(self.key_for(resume_text), record)
+            self._count(writes=1)
+        except Exception as e:
+            print(f"Warning: Inference cache write failed: {e}")
+            self._count(errors=1)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
@@ -1,7 +1,12 @@
 import json
+import os
 import boto3
 import urllib.parse
 
+import candidate_batcher
+import candidate_log
+from pipeline_timing import UPLOADED_AT_METADATA, is_fused_artifact, milliseconds_since
+
 # Initializing the S3 client
 s3_client = boto3.client('s3')
 
@@ -10,14 +15,88 @@ s3_client = boto3.client('s3')
 DESTINATION_BUCKET = 'ENTER YOUR BUCKET' 
 # The name of the master JSON file.
 MASTER_FILE_KEY = 'candidates.json'
+# "segmented" appends each candidate as a small immutable segment; the segments are compacted
+# into MASTER_FILE_KEY (see candidate_log.py) only by the one-minute scheduled invocation
+# (see create_appender_compaction_schedule in aws/lambda_utils3.py), so an upload never pays
+# for a compaction. "rewrite" rewrites the whole master file on every upload.
+APPEND_MODE = os.environ.get('APPEND_MODE', 'segmented')
+
+
+def append_segmented(new_candidate_data: dict) -> str:
+    """Appends one candidate as a new segment; compaction is left to the scheduled invocation."""
+    segment_key = candidate_log.append_records(s3_client, DESTINATION_BUCKET, [new_candidate_data])
+    print(f"Appended new candidate as segment '{segment_key}'.")
+    return segment_key
+
+
+def append_batch(records: list):
+    """Adds a whole batch of candidates with a single write, whatever the append mode."""
+    if APPEND_MODE == 'segmented':
+        candidate_log.append_records(s3_client, DESTINATION_BUCKET, records)
+    else:
+        write = candidate_batcher.merge_into_master(s3_client, DESTINATION_BUCKET, MASTER_FILE_KEY, records)
+        print(f"Merged into '{MASTER_FILE_KEY}' after {write['attempts']} attempt(s), "
+              f"{write['totalCandidates']} candidates in total.")
+
+
+def handle_queue_batch(event) -> dict:
+    """
+    Handles a batch of S3 notifications delivered through SQS (the json bucket notifies a
+    queue, the queue triggers this function with a batching window). All candidates in the
+    batch are merged with one write; messages whose file can't be read are reported back
+    as batch item failures so only they are retried.
+    """
+    messages = [{'MessageId': record['messageId'], 'Body': record['body']} for record in event['Records']]
+    records, failed = candidate_batcher.load_candidates(s3_client, messages)
+
+    if records:
+        append_batch(records)
+    print(f"Queue batch: {len(messages)} messages, {len(records)} candidates, "
+          f"{1 if records else 0} write(s), {len(failed)} failed.")
+
+    return {'batchItemFailures': [{'itemIdentifier': message_id} for message_id in failed]}
+
+
+def report_latency(source_key: str, uploaded_at: str, pipeline: str):
+    """
+    Logs the time from the PDF upload to this append. Compare the two pipelines in
+    CloudWatch Logs Insights with:
+      filter @message like /Upload to append/ | parse @message "(*): * ms" as pipeline, ms
+      | stats avg(ms), pct(ms, 50), pct(ms, 95) by pipeline
+    In segmented mode the dashboard reads the segments too, so it shows the candidate at
+    its next index refresh; MASTER_FILE_KEY only gets it at the next compaction.
+    """
+    elapsed = milliseconds_since(uploaded_at)
+    if elapsed is not None:
+        print(f"Upload to append for '{source_key}' ({pipeline}): {elapsed} ms")
+
+
+def compact_candidates(force: bool = False) -> dict:
+    result = candidate_log.compact(s3_client, DESTINATION_BUCKET, published_key=MASTER_FILE_KEY, force=force)
+    if result['compacted']:
+        print(f"Compacted {result['segments']} segments into '{MASTER_FILE_KEY}' ({result['records']} candidates).")
+    else:
+        print(f"No compaction: {result['reason']}.")
+    return result
 
 def lambda_handler(event, context):
     """
     This function is triggered by a new JSON file upload. It reads the
     master JSON file, appends the new candidate data, and overwrites
     the master file with the updated content.
+
+    In segmented mode the new candidate becomes its own segment instead, and that put is
+    all an upload costs. Compaction runs only when the function is invoked every minute by
+    an EventBridge rule (an event without 'Records').
     """
 
+    if 'Records' not in event:
+        result = compact_candidates()
+        return {'statusCode': 200, 'body': json.dumps(result)}
+
+    if event['Records'][0].get('eventSource') == 'aws:sqs':
+        return handle_queue_batch(event)
+
     # 1. Get the bucket and file key of the NEWLY uploaded file from the trigger event
     source_bucket = event['Records'][0]['s3']['bucket']['name']
     source_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
@@ -27,30 +106,26 @@ def lambda_handler(event, context):
     try:
         # 2. Get the new candidate's data
         new_candidate_response = s3_client.get_object(Bucket=source_bucket, Key=source_key)
+        if is_fused_artifact(new_candidate_response):
+            print(f"Skipping '{source_key}', the fused pipeline already appended it.")
+            return {'statusCode': 200, 'body': json.dumps(f"Skipped '{source_key}'.")}
         new_candidate_data = json.loads(new_candidate_response['Body'].read().decode('utf-8'))
         print("Successfully read new candidate data.")
+        uploaded_at = new_candidate_response.get('Metadata', {}).get(UPLOADED_AT_METADATA)
+
+        if APPEND_MODE == 'segmented':
+            append_segmented(new_candidate_data)
+            report_latency(source_key, uploaded_at, 'chained')
+            return {
+                'statusCode': 200,
+                'body': json.dumps('Successfully appended the new candidate.')
+            }
 
-        # 3. Get the existing master candidates.json file
-        try:
-            existing_file_response = s3_client.get_object(Bucket=DESTINATION_BUCKET, Key=MASTER_FILE_KEY)
-            all_candidates = json.loads(existing_file_response['Body'].read().decode('utf-8'))
-            print(f"Successfully read master file with {len(all_candidates)} existing candidates.")
-        except s3_client.exceptions.NoSuchKey:
-            # If the master file doesn't exist yet, start with an empty list
-            print("Master file not found. Starting with a new list.")
-            all_candidates = []
-
-        # 4. Append the new candidate data to the list
-        all_candidates.append(new_candidate_data)
-        print(f"Appended new candidate. Total candidates now: {len(all_candidates)}.")
-
-        # 5. Upload the updated list back to S3, overwriting the old file
-        s3_client.put_object(
-            Bucket=DESTINATION_BUCKET,
-            Key=MASTER_FILE_KEY,
-            Body=json.dumps(all_candidates, indent=4), # indent makes the JSON readable
-            ContentType='application/json'
-        )
+        # 3. Merge the new candidate into the master candidates.json file. The write is
+        # conditional on the ETag that was read, so concurrent uploads can't clobber each other.
+        write = candidate_batcher.merge_into_master(s3_client, DESTINATION_BUCKET, MASTER_FILE_KEY, [new_candidate_data])
+        print(f"Appended new candidate. Total candidates now: {write['totalCandidates']}.")
+        report_latency(source_key, uploaded_at, 'chained')
 
         print(f"Successfully updated and uploaded '{MASTER_FILE_KEY}' to bucket '{DESTINATION_BUCKET}'.")
 
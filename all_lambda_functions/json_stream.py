@@ -0,0 +1,323 @@
+import abc
+import codecs
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import textwrap
+import time
+
+# Bytes read from the source stream at a time.
+READ_CHUNK_SIZE = 64 * 1024
+# Size of each multipart upload part. S3 requires at least 5 MB for every part but the last.
+PART_SIZE = 8 * 1024 * 1024
+MIN_PART_SIZE = 5 * 1024 * 1024
+# Largest part UploadPartCopy accepts.
+MAX_COPY_PART_SIZE = 5 * 1024 ** 3
+
+_WHITESPACE = ' \t\r\n'
+_NUMBER_CHARS = '0123456789.eE+-'
+
+
+def iter_array(stream, chunk_size: int = READ_CHUNK_SIZE):
+    """
+    Yields the items of a top-level JSON array one at a time from a binary stream (an S3
+    StreamingBody or an open file), holding only the current item and one chunk in memory.
+    """
+    decoder = json.JSONDecoder()
+    utf8 = codecs.getincrementaldecoder('utf-8')()
+    buffer, position, eof = '', 0, False
+
+    def fill():
+        nonlocal buffer, position, eof
+        chunk = stream.read(chunk_size)
+        buffer = buffer[position:] + utf8.decode(chunk or b'', final=not chunk)
+        position, eof = 0, not chunk
+
+    def next_char():
+        nonlocal position
+        while True:
+            while position < len(buffer) and buffer[position] in _WHITESPACE:
+                position += 1
+            if position < len(buffer):
+                return buffer[position]
+            if eof:
+                return ''
+            fill()
+
+    if next_char() != '[':
+        raise ValueError("Expected a JSON array.")
+    position += 1
+    if next_char() == ']':
+        return
+
+    while True:
+        next_char()
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, position)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                fill()
+                continue
+            # A number cut off by the end of the chunk ("-0." / "12") decodes early; read on.
+            if not eof and (end == len(buffer) or buffer[end] in _NUMBER_CHARS):
+                fill()
+                continue
+            break
+        position = end
+        yield item
+
+        separator = next_char()
+        position += 1
+        if separator == ']':
+            return
+        if separator != ',':
+            raise ValueError(f"Expected ',' or ']' in JSON array, found {separator!r}.")
+
+
+def _item_text(item, indent: int = None, first: bool = False) -> str:
+    if indent is None:
+        return ('[' if first else ', ') + json.dumps(item)
+    return ('[\n' if first else ',\n') + textwrap.indent(json.dumps(item, indent=indent), ' ' * indent)
+
+
+def _closing_text(indent: int = None, empty: bool = False) -> str:
+    return '[]' if empty else (']' if indent is None else '\n]')
+
+
+class JSONArrayWriter(abc.ABC):
+    """
+    Serializes a JSON array item by item and hands it on in parts of at least part_size
+    bytes, so only one part is ever held in memory. Subclasses decide where parts go.
+    With indent=4 the output is byte-for-byte what json.dumps(items, indent=4) gives.
+    """
+
+    def __init__(self, indent: int = None, part_size: int = PART_SIZE):
+        self.indent = indent
+        self.part_size = part_size
+        self.count = 0
+        self.bytes_written = 0
+        self._parts = []
+        self._buffered = 0
+
+    def _emit(self, text: str):
+        data = text.encode('utf-8')
+        self._parts.append(data)
+        self._buffered += len(data)
+        if self._buffered >= self.part_size:
+            self._flush(final=False)
+
+    def _flush(self, final: bool):
+        data = b''.join(self._parts)
+        self._parts, self._buffered = [], 0
+        self.bytes_written += len(data)
+        self.write_part(data, final)
+
+    def write(self, item):
+        self._emit(_item_text(item, self.indent, first=self.count == 0))
+        self.count += 1
+
+    def write_all(self, items):
+        for item in items:
+            self.write(item)
+        return self
+
+    def close(self):
+        self._emit(_closing_text(self.indent, empty=self.count == 0))
+        self._flush(final=True)
+        return self.finish()
+
+    @abc.abstractmethod
+    def write_part(self, data: bytes, final: bool):
+        """Takes the next part of the serialized array; final is True for the last one."""
+
+    def finish(self):
+        return None
+
+    def abort(self):
+        pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        if exc_type is not None:
+            self.abort()
+        return False
+
+
+class S3JSONArrayWriter(JSONArrayWriter):
+    """
+    Streams the array to S3 with a multipart upload. Arrays that fit in one part are sent
+    with a single put_object instead. condition ({'IfMatch': etag} or {'IfNoneMatch': '*'})
+    is applied to the final write, so a conditional update stays atomic. close() returns
+    the response of that write.
+    """
+
+    def __init__(self, s3_client, bucket: str, key: str, condition: dict = None,
+                 content_type: str = 'application/json', **kwargs):
+        super().__init__(**kwargs)
+        self.s3_client = s3_client
+        self.bucket = bucket
+        self.key = key
+        self.condition = condition or {}
+        self.content_type = content_type
+        self.upload_id = None
+        self._etags = []
+        self._response = None
+
+    def write_part(self, data: bytes, final: bool):
+        if final and self.upload_id is None:
+            self._response = self.s3_client.put_object(Bucket=self.bucket, Key=self.key, Body=data,
+                                                       ContentType=self.content_type, **self.condition)
+            return
+        if self.upload_id is None:
+            self.upload_id = self.s3_client.create_multipart_upload(
+                Bucket=self.bucket, Key=self.key, ContentType=self.content_type)['UploadId']
+        response = self.s3_client.upload_part(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                              PartNumber=len(self._etags) + 1, Body=data)
+        self._etags.append(response['ETag'])
+
+    def finish(self):
+        if self.upload_id is None:
+            return self._response
+        parts = [{'ETag': etag, 'PartNumber': number} for number, etag in enumerate(self._etags, start=1)]
+        try:
+            return self.s3_client.complete_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id,
+                                                            MultipartUpload={'Parts': parts}, **self.condition)
+        except Exception:
+            self.abort()
+            raise
+
+    def abort(self):
+        if self.upload_id is not None:
+            self.s3_client.abort_multipart_upload(Bucket=self.bucket, Key=self.key, UploadId=self.upload_id)
+            self.upload_id = None
+
+
+def append_to_array(s3_client, bucket: str, key: str, items: list, indent: int = None, if_match: str = None) -> dict:
+    """
+    Appends items to the JSON array stored at key (written by S3JSONArrayWriter with the
+    same indent) without downloading it: the stored bytes up to the closing bracket are
+    copied server-side into a multipart upload (UploadPartCopy) and only the new items are
+    uploaded. Arrays shorter than the 5 MB minimum part are read and put back whole. The
+    write is conditional on the ETag that was read (or if_match, when given), so nothing
+    written in between is lost. Returns {'ETag', 'appended'}.
+    """
+    head = s3_client.head_object(Bucket=bucket, Key=key, **({'IfMatch': if_match} if if_match else {}))
+    size, etag = head['ContentLength'], head['ETag']
+    tail = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=-{min(size, 64)}", IfMatch=etag)['Body'].read()
+    body_end = tail.rstrip()
+    if not body_end.endswith(b']'):
+        raise ValueError(f"s3://{bucket}/{key} doesn't end with a JSON array.")
+    body_end = body_end[:-1].rstrip()
+    if not items:
+        return {'ETag': etag, 'appended': 0}
+    if body_end.endswith(b'['):
+        # An empty array: nothing worth copying.
+        with S3JSONArrayWriter(s3_client, bucket, key, condition={'IfMatch': etag}, indent=indent) as writer:
+            writer.write_all(items)
+            response = writer.close()
+        return {'ETag': response['ETag'], 'appended': len(items)}
+
+    kept = size - len(tail) + len(body_end)
+    appended = (''.join(_item_text(item, indent) for item in items) + _closing_text(indent)).encode('utf-8')
+    if kept < MIN_PART_SIZE:
+        kept_bytes = s3_client.get_object(Bucket=bucket, Key=key, Range=f"bytes=0-{kept - 1}", IfMatch=etag)['Body'].read()
+        response = s3_client.put_object(Bucket=bucket, Key=key, Body=kept_bytes + appended,
+                                        ContentType=head.get('ContentType', 'application/json'), IfMatch=etag)
+        return {'ETag': response['ETag'], 'appended': len(items)}
+
+    upload_id = s3_client.create_multipart_upload(Bucket=bucket, Key=key,
+                                                  ContentType=head.get('ContentType', 'application/json'))['UploadId']
+    try:
+        # Equal copy parts, so none of them falls under the minimum part size.
+        copies = -(-kept // MAX_COPY_PART_SIZE)
+        copy_size = -(-kept // copies)
+        parts = []
+        for start in range(0, kept, copy_size):
+            response = s3_client.upload_part_copy(
+                Bucket=bucket, Key=key, UploadId=upload_id, PartNumber=len(parts) + 1,
+                CopySource={'Bucket': bucket, 'Key': key}, CopySourceIfMatch=etag,
+                CopySourceRange=f"bytes={start}-{min(start + copy_size, kept) - 1}")
+            parts.append({'ETag': response['CopyPartResult']['ETag'], 'PartNumber': len(parts) + 1})
+        response = s3_client.upload_part(Bucket=bucket, Key=key, UploadId=upload_id,
+                                         PartNumber=len(parts) + 1, Body=appended)
+        parts.append({'ETag': response['ETag'], 'PartNumber': len(parts) + 1})
+        response = s3_client.complete_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id,
+                                                       MultipartUpload={'Parts': parts}, IfMatch=etag)
+    except Exception:
+        s3_client.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+    return {'ETag': response['ETag'], 'appended': len(items)}
+
+
+class FileJSONArrayWriter(JSONArrayWriter):
+    """Writes the array to an open binary file; used for local runs and the memory check below."""
+
+    def __init__(self, file, **kwargs):
+        super().__init__(**kwargs)
+        self.file = file
+
+    def write_part(self, data: bytes, final: bool):
+        self.file.write(data)
+
+
+def peak_rss_mb() -> float:
+    # ru_maxrss is in KB on Linux and bytes on macOS.
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return round(peak / (1024 * 1024 if sys.platform == 'darwin' else 1024), 1)
+
+
+def write_synthetic_array(path: str, record_count: int):
+    """Writes an array of record_count synthetic candidates to path, item by item."""
+    with open(path, 'wb') as file:
+        FileJSONArrayWriter(file).write_all(
+            {'candidateId': f"id-{index}", 'name': 'Real Name', 'email': 'real@mail.com',
+             'phoneNumber': '+91 98765 43210', 'skills': {'items': ['Python', 'SQL']}}
+            for index in range(record_count)
+        ).close()
+
+
+def stream_file(source: str, target: str) -> dict:
+    """The streaming pass: reads source item by item, changes each record and writes target."""
+    started = time.perf_counter()
+    with open(source, 'rb') as reader, open(target, 'wb') as file:
+        writer = FileJSONArrayWriter(file, indent=4)
+        for record in iter_array(reader):
+            record['name'] = 'Anonymous'
+            writer.write(record)
+        writer.close()
+    return {
+        'records': writer.count,
+        'sourceMB': round(os.path.getsize(source) / 1024 ** 2, 1),
+        'targetMB': round(writer.bytes_written / 1024 ** 2, 1),
+        'seconds': round(time.perf_counter() - started, 1),
+        'peakRssMB': peak_rss_mb(),
+    }
+
+
+def check_memory(record_count: int = 1000000) -> dict:
+    """
+    Writes a synthetic array of record_count candidates to a temporary file, then runs the
+    streaming pass over it in a fresh interpreter and reports that process's peak RSS. ru_maxrss
+    never goes down, so only a process that does nothing but the pass measures the pass.
+    Run it with different counts (python json_stream.py 100000 / 1000000): the peak stays flat.
+    """
+    with tempfile.TemporaryDirectory() as directory:
+        source, target = os.path.join(directory, 'source.json'), os.path.join(directory, 'target.json')
+        write_synthetic_array(source, record_count)
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--stream', source, target],
+                                check=True, capture_output=True, text=True).stdout
+        return json.loads(output)
+
+
+if __name__ == '__main__':
+    if sys.argv[1:2] == ['--stream']:
+        print(json.dumps(stream_file(sys.argv[2], sys.argv[3])))
+    else:
+        print(check_memory(int(sys.argv[1]) if len(sys.argv) > 1 else 1000000))
@@ -0,0 +1,84 @@
+import json
+import os
+
+from botocore.exceptions import ClientError
+
+from resume_sections import heading_section
+
+# text_extraction writes <name>.layout.json next to <name>.txt when STRUCTURED_OUTPUT is on.
+LAYOUT_SUFFIX = '.layout.json'
+LAYOUT_VERSION = 1
+# Lines of page 1 treated as the header when the resume starts with a section heading.
+HEADER_MAX_LINES = 12
+
+# Document shape:
+# {
+#   "version": 1,
+#   "lineCount": 57,
+#   "pages": [{"number": 1, "width": 612.0, "height": 792.0,
+#              "lines": [{"text": "JANE DOE", "bbox": [50.0, 770.1, 98.4, 780.1], "size": 18.0}, ...]}],
+#   "sections": {"header": [[0, 3]], "summary": [[3, 9]], ...}
+# }
+# Section ranges are [start, end) indexes into the document's lines in reading order, so a
+# consumer can take one section without scanning the rest.
+
+
+def layout_key(text_key: str) -> str:
+    return os.path.splitext(text_key)[0] + LAYOUT_SUFFIX
+
+
+def build_layout(pages: list) -> dict:
+    """Wraps per-page line records into a layout document and indexes its sections by heading."""
+    sections = {}
+    current, start, index = 'header', 0, 0
+    for page in pages:
+        for line in page['lines']:
+            section = heading_section(line['text'])
+            if section:
+                if index > start:
+                    sections.setdefault(current, []).append([start, index])
+                current, start = section, index
+            index += 1
+    if index > start:
+        sections.setdefault(current, []).append([start, index])
+    return {'version': LAYOUT_VERSION, 'lineCount': index, 'pages': pages, 'sections': sections}
+
+
+def all_lines(layout: dict) -> list:
+    return [line for page in layout['pages'] for line in page['lines']]
+
+
+def section_lines(layout: dict, section: str) -> list:
+    """The lines of one section (all its occurrences, in order), heading lines included."""
+    ranges = layout['sections'].get(section, [])
+    if not ranges:
+        return []
+    lines = all_lines(layout)
+    return [line for start, end in ranges for line in lines[start:end]]
+
+
+def section_text(layout: dict, section: str) -> str:
+    return '\n'.join(line['text'] for line in section_lines(layout, section))
+
+
+def header_text(layout: dict, max_lines: int = HEADER_MAX_LINES) -> str:
+    """
+    The header lines (name, title, contact details), one per line. If the resume opens with
+    a section heading, the first lines of page 1 are used instead.
+    """
+    lines = section_lines(layout, 'header')
+    if not lines and layout['pages']:
+        lines = layout['pages'][0]['lines']
+    return '\n'.join(line['text'] for line in lines[:max_lines])
+
+
+def load_layout(s3_client, bucket: str, text_key: str):
+    """Reads the layout document written next to text_key, or returns None if there is none."""
+    try:
+        s3_object = s3_client.get_object(Bucket=bucket, Key=layout_key(text_key))
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    layout = json.loads(s3_object['Body'].read().decode('utf-8'))
+    return layout if layout.get('version') == LAYOUT_VERSION else None
@@ -0,0 +1,455 @@
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+from io import BytesIO
+from urllib.parse import quote_plus
+
+import boto3
+from botocore.exceptions import ClientError
+
+# In-memory stand-ins for the AWS services the Lambdas use, with just the calls they make.
+# pipeline_harness.py wires them into the handler modules and drives the whole chain
+# offline; they are not part of any Lambda package.
+
+
+def _error(code: str, message: str = '', operation: str = 'Operation') -> ClientError:
+    return ClientError({'Error': {'Code': code, 'Message': message or code}}, operation)
+
+
+def _now_iso() -> str:
+    return datetime.now(timezone.utc).isoformat(timespec='milliseconds').replace('+00:00', 'Z')
+
+
+class EventDispatcher:
+    """
+    Delivers S3 notifications to handlers like Lambda would: asynchronously, after
+    delay_ms, with at most `concurrency` invocations of each function at a time.
+    Records every invocation's timing, and lets the caller wait until all work is done.
+    """
+
+    def __init__(self, delay_ms: float = 0, concurrency: int = 4):
+        self.delay_ms = delay_ms
+        self.concurrency = concurrency
+        self.invocations = []
+        self._pools = {}
+        self._pending = 0
+        self._idle = threading.Condition()
+
+    def _pool(self, name: str) -> ThreadPoolExecutor:
+        with self._idle:
+            if name not in self._pools:
+                self._pools[name] = ThreadPoolExecutor(max_workers=self.concurrency, thread_name_prefix=name)
+            return self._pools[name]
+
+    def dispatch(self, name: str, handler, event: dict):
+        with self._idle:
+            self._pending += 1
+        queued = time.perf_counter()
+        self._pool(name).submit(self._invoke, name, handler, event, queued)
+
+    def _invoke(self, name: str, handler, event: dict, queued: float):
+        try:
+            if self.delay_ms:
+                time.sleep(max(0.0, self.delay_ms / 1000 - (time.perf_counter() - queued)))
+            started = time.perf_counter()
+            error = None
+            try:
+                result = handler(event, None)
+                if isinstance(result, dict) and str(result.get('statusCode', 200)).startswith('5'):
+                    error = result.get('body')
+            except Exception as e:
+                error = f"{type(e).__name__}: {e}"
+            self.invocations.append({
+                'function': name,
+                'key': event['Records'][0]['s3']['object']['key'] if event.get('Records') else None,
+                'waitMs': (started - queued) * 1000,
+                'durationMs': (time.perf_counter() - started) * 1000,
+                'finishedAt': time.perf_counter(),
+                'error': error,
+            })
+        finally:
+            with self._idle:
+                self._pending -= 1
+                self._idle.notify_all()
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        with self._idle:
+            return self._idle.wait_for(lambda: self._pending == 0, timeout)
+
+    def shutdown(self):
+        for pool in self._pools.values():
+            pool.shutdown(wait=True)
+
+
+def _byte_range(body: bytes, byte_range: str = None) -> bytes:
+    """body cut to an HTTP Range header: 'bytes=first-last' or 'bytes=-suffix length'."""
+    if not byte_range:
+        return body
+    first, last = byte_range[len('bytes='):].split('-')
+    if not first:
+        return body[-int(last):]
+    return body[int(first):int(last) + 1 if last else len(body)]
+
+
+class FakeS3:
+    """Buckets in a dict, with ETags, metadata, conditional writes, ranged reads, multipart uploads and notifications."""
+
+    def __init__(self, dispatcher: EventDispatcher = None):
+        self.dispatcher = dispatcher
+        self.objects = {}
+        self.calls = {}
+        self._uploads = {}
+        self._notifications = []
+        self._observers = []
+        self._lock = threading.RLock()
+
+    def add_notification(self, bucket: str, name: str, handler, prefix: str = '', suffix: str = ''):
+        """Invokes handler for every object created in bucket whose key matches prefix and suffix."""
+        self._notifications.append((bucket, prefix, suffix, name, handler))
+
+    def observe(self, callback):
+        """Calls callback(bucket, key, body) synchronously for every object created."""
+        self._observers.append(callback)
+
+    def _count(self, operation: str):
+        self.calls[operation] = self.calls.get(operation, 0) + 1
+
+    def _created(self, bucket: str, key: str, event_name: str, stored: dict):
+        for callback in self._observers:
+            callback(bucket, key, stored['Body'])
+        if not self.dispatcher:
+            return
+        for notify_bucket, prefix, suffix, name, handler in self._notifications:
+            if notify_bucket == bucket and key.startswith(prefix) and key.endswith(suffix):
+                self.dispatcher.dispatch(name, handler, {'Records': [{
+                    'eventVersion': '2.1', 'eventSource': 'aws:s3', 'eventTime': _now_iso(),
+                    'eventName': f'ObjectCreated:{event_name}',
+                    's3': {'bucket': {'name': bucket},
+                           'object': {'key': quote_plus(key), 'size': len(stored['Body']),
+                                      'eTag': stored['ETag'].strip('"')}},
+                }]})
+
+    def _check_condition(self, bucket: str, key: str, IfMatch: str = None, IfNoneMatch: str = None):
+        current = self.objects.get((bucket, key))
+        if IfNoneMatch == '*' and current is not None:
+            raise _error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold')
+        if IfMatch is not None and (current is None or current['ETag'] != IfMatch):
+            raise _error('PreconditionFailed', 'At least one of the pre-conditions you specified did not hold')
+
+    def _store(self, bucket: str, key: str, body: bytes, etag: str, metadata: dict = None, content_type: str = None):
+        stored = {'Body': body, 'ETag': etag, 'Metadata': dict(metadata or {}),
+                  'ContentType': content_type or 'binary/octet-stream', 'LastModified': datetime.now(timezone.utc)}
+        self.objects[(bucket, key)] = stored
+        return stored
+
+    def put_object(self, Bucket, Key, Body=b'', ContentType=None, Metadata=None, IfMatch=None, IfNoneMatch=None, **_):
+        body = Body.encode('utf-8') if isinstance(Body, str) else (Body.read() if hasattr(Body, 'read') else Body)
+        with self._lock:
+            self._count('PutObject')
+            self._check_condition(Bucket, Key, IfMatch, IfNoneMatch)
+            etag = f'"{hashlib.md5(body).hexdigest()}"'
+            stored = self._store(Bucket, Key, body, etag, Metadata, ContentType)
+        self._created(Bucket, Key, 'Put', stored)
+        return {'ETag': etag}
+
+    def get_object(self, Bucket, Key, IfMatch=None, IfNoneMatch=None, Range=None, **_):
+        with self._lock:
+            self._count('GetObject')
+            stored = self.objects.get((Bucket, Key))
+            if stored is None:
+                raise _error('NoSuchKey', 'The specified key does not exist.', 'GetObject')
+            if IfMatch is not None and stored['ETag'] != IfMatch:
+                raise _error('PreconditionFailed', operation='GetObject')
+            if IfNoneMatch is not None and stored['ETag'] == IfNoneMatch:
+                raise _error('304', 'Not Modified', 'GetObject')
+        body = _byte_range(stored['Body'], Range)
+        return {'Body': BytesIO(body), 'ETag': stored['ETag'], 'ContentLength': len(body),
+                'ContentType': stored['ContentType'], 'Metadata': dict(stored['Metadata']),
+                'LastModified': stored['LastModified']}
+
+    def head_object(self, Bucket, Key, **_):
+        response = self.get_object(Bucket, Key)
+        response.pop('Body')
+        return response
+
+    def copy_object(self, Bucket, Key, CopySource, MetadataDirective='COPY', Metadata=None, **_):
+        with self._lock:
+            self._count('CopyObject')
+            source = self.objects.get((CopySource['Bucket'], CopySource['Key']))
+            if source is None:
+                raise _error('NoSuchKey', 'The specified key does not exist.', 'CopyObject')
+            metadata = Metadata if MetadataDirective == 'REPLACE' else source['Metadata']
+            stored = self._store(Bucket, Key, source['Body'], source['ETag'], metadata, source['ContentType'])
+        self._created(Bucket, Key, 'Copy', stored)
+        return {'CopyObjectResult': {'ETag': source['ETag']}}
+
+    def delete_object(self, Bucket, Key, **_):
+        with self._lock:
+            self._count('DeleteObject')
+            self.objects.pop((Bucket, Key), None)
+        return {}
+
+    def delete_objects(self, Bucket, Delete, **_):
+        with self._lock:
+            self._count('DeleteObjects')
+            for item in Delete['Objects']:
+                self.objects.pop((Bucket, item['Key']), None)
+        return {'Deleted': [{'Key': item['Key']} for item in Delete['Objects']]}
+
+    def list_objects_v2(self, Bucket, Prefix='', StartAfter='', ContinuationToken=None, MaxKeys=1000, **_):
+        with self._lock:
+            self._count('ListObjectsV2')
+            after = ContinuationToken or StartAfter
+            keys = sorted(key for bucket, key in self.objects if bucket == Bucket and key.startswith(Prefix) and key > after)
+            page = keys[:MaxKeys]
+            contents = [{'Key': key, 'Size': len(self.objects[(Bucket, key)]['Body']),
+                         'ETag': self.objects[(Bucket, key)]['ETag'],
+                         'LastModified': self.objects[(Bucket, key)]['LastModified']} for key in page]
+        response = {'Contents': contents, 'KeyCount': len(contents), 'IsTruncated': len(keys) > MaxKeys}
+        if response['IsTruncated']:
+            response['NextContinuationToken'] = page[-1]
+        return response
+
+    def get_paginator(self, operation: str):
+        s3 = self
+
+        class Paginator:
+            def paginate(self, **kwargs):
+                token = None
+                while True:
+                    page = s3.list_objects_v2(**kwargs, ContinuationToken=token)
+                    yield page
+                    if not page['IsTruncated']:
+                        return
+                    token = page['NextContinuationToken']
+
+        return Paginator()
+
+    def create_multipart_upload(self, Bucket, Key, ContentType=None, Metadata=None, **_):
+        upload_id = uuid.uuid4().hex
+        with self._lock:
+            self._count('CreateMultipartUpload')
+            self._uploads[upload_id] = {'parts': {}, 'ContentType': ContentType, 'Metadata': Metadata}
+        return {'UploadId': upload_id, 'Bucket': Bucket, 'Key': Key}
+
+    def upload_part(self, Bucket, Key, UploadId, PartNumber, Body, **_):
+        body = Body.encode('utf-8') if isinstance(Body, str) else Body
+        with self._lock:
+            self._count('UploadPart')
+            self._uploads[UploadId]['parts'][PartNumber] = body
+        return {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}
+
+    def upload_part_copy(self, Bucket, Key, UploadId, PartNumber, CopySource, CopySourceRange=None,
+                         CopySourceIfMatch=None, **_):
+        with self._lock:
+            self._count('UploadPartCopy')
+            source = self.objects.get((CopySource['Bucket'], CopySource['Key']))
+            if source is None:
+                raise _error('NoSuchKey', 'The specified key does not exist.', 'UploadPartCopy')
+            if CopySourceIfMatch is not None and source['ETag'] != CopySourceIfMatch:
+                raise _error('PreconditionFailed', operation='UploadPartCopy')
+            body = _byte_range(source['Body'], CopySourceRange)
+            self._uploads[UploadId]['parts'][PartNumber] = body
+        return {'CopyPartResult': {'ETag': f'"{hashlib.md5(body).hexdigest()}"'}}
+
+    def complete_multipart_upload(self, Bucket, Key, UploadId, MultipartUpload, IfMatch=None, IfNoneMatch=None, **_):
+        with self._lock:
+            self._count('CompleteMultipartUpload')
+            self._check_condition(Bucket, Key, IfMatch, IfNoneMatch)
+            upload = self._uploads.pop(UploadId)
+            numbers = [part['PartNumber'] for part in MultipartUpload['Parts']]
+            body = b''.join(upload['parts'][number] for number in numbers)
+            digests = b''.join(hashlib.md5(upload['parts'][number]).digest() for number in numbers)
+            etag = f'"{hashlib.md5(digests).hexdigest()}-{len(numbers)}"'
+            stored = self._store(Bucket, Key, body, etag, upload['Metadata'], upload['ContentType'])
+        self._created(Bucket, Key, 'CompleteMultipartUpload', stored)
+        return {'ETag': etag}
+
+    def abort_multipart_upload(self, Bucket, Key, UploadId, **_):
+        with self._lock:
+            self._uploads.pop(UploadId, None)
+        return {}
+
+
+def default_bedrock_answer(prompt: str) -> str:
+    """
+    A plausible answer for each of bedrock_lambda's prompts: the first line of the resume
+    context as the name, a fixed summary and the postgrad flag from a keyword check.
+    """
+    context = prompt.split('---', 1)[1] if '---' in prompt else prompt
+    words = re.findall(r"[A-Za-z][A-Za-z'\-]+", context)
+    name = ' '.join(words[:2]).title() if words else 'NONE'
+    postgrad = 1 if re.search(r"\b(master|m\.?tech|mba|ph\.?d|m\.?sc)\b", context, re.IGNORECASE) else 0
+    if 'JSON object' in prompt:
+        return json.dumps({'name': name, 'experienceSummary': 'experienced in cloud', 'isPostGraduate': postgrad})
+    if 'full name' in prompt:
+        return name
+    if 'postgraduate' in prompt.lower():
+        return str(postgrad)
+    return 'experienced in cloud'
+
+
+class FakeBedrockRuntime:
+    """
+    converse() with a configurable latency (mean and jitter), a random throttling rate and a
+    concurrency quota: calls beyond max_concurrency in flight are throttled, like a quota.
+    """
+
+    def __init__(self, latency_ms: float = 300, jitter_ms: float = 100, throttle_rate: float = 0.0,
+                 max_concurrency: int = None, responder=default_bedrock_answer, seed: int = None):
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.throttle_rate = throttle_rate
+        self.max_concurrency = max_concurrency
+        self.responder = responder
+        self.stats = {'calls': 0, 'throttled': 0, 'inputTokens': 0, 'outputTokens': 0}
+        self._in_flight = 0
+        self._lock = threading.Lock()
+        self._random = random.Random(seed)
+
+    def converse(self, modelId, messages, inferenceConfig=None, **_):
+        prompt = messages[-1]['content'][0]['text']
+        with self._lock:
+            throttled = (self._random.random() < self.throttle_rate or
+                         (self.max_concurrency is not None and self._in_flight >= self.max_concurrency))
+            if throttled:
+                self.stats['throttled'] += 1
+            else:
+                self._in_flight += 1
+                delay = max(0.0, self._random.gauss(self.latency_ms, self.jitter_ms)) / 1000
+        if throttled:
+            raise _error('ThrottlingException', 'Too many requests, please wait before trying again.', 'Converse')
+        try:
+            time.sleep(delay)
+            text = self.responder(prompt)
+        finally:
+            with self._lock:
+                self._in_flight -= 1
+        usage = {'inputTokens': len(prompt) // 4, 'outputTokens': max(1, len(text) // 4)}
+        with self._lock:
+            self.stats['calls'] += 1
+            self.stats['inputTokens'] += usage['inputTokens']
+            self.stats['outputTokens'] += usage['outputTokens']
+        usage['totalTokens'] = usage['inputTokens'] + usage['outputTokens']
+        return {'output': {'message': {'role': 'assistant', 'content': [{'text': text}]}},
+                'stopReason': 'end_turn', 'usage': usage, 'metrics': {'latencyMs': round(delay * 1000)}}
+
+
+class FakeComprehend:
+    """detect_entities() that reports capitalised word pairs as PERSON entities."""
+
+    def __init__(self, latency_ms: float = 100):
+        self.latency_ms = latency_ms
+        self.calls = 0
+
+    def detect_entities(self, Text, LanguageCode='en', **_):
+        time.sleep(self.latency_ms / 1000)
+        self.calls += 1
+        entities = [{'Score': 0.99, 'Type': 'PERSON', 'Text': match.group(0),
+                     'BeginOffset': match.start(), 'EndOffset': match.end()}
+                    for match in re.finditer(r"\b[A-Z][a-z]+ [A-Z][a-z]+\b", Text)]
+        return {'Entities': entities}
+
+
+class FakeSES:
+    """send_email() that keeps the messages."""
+
+    def __init__(self):
+        self.sent = []
+        self._lock = threading.Lock()
+
+    def send_email(self, Source, Destination, Message, **_):
+        message_id = uuid.uuid4().hex
+        with self._lock:
+            self.sent.append({'MessageId': message_id, 'Source': Source, 'Destination': Destination,
+                              'Subject': Message['Subject']['Data']})
+        return {'MessageId': message_id}
+
+
+class FakeDynamoDBTable:
+    """get_item / put_item / delete_item on a single hash key."""
+
+    def __init__(self, name: str, key_name: str = None):
+        self.name = name
+        self.key_name = key_name
+        self.items = {}
+        self._lock = threading.Lock()
+
+    def _key(self, key: dict):
+        return tuple(sorted(key.items()))
+
+    def get_item(self, Key, **_):
+        with self._lock:
+            item = self.items.get(self._key(Key))
+        return {'Item': dict(item)} if item is not None else {}
+
+    def put_item(self, Item, **_):
+        key_name = self.key_name or next(iter(Item))
+        with self._lock:
+            self.items[self._key({key_name: Item[key_name]})] = dict(Item)
+        return {}
+
+    def delete_item(self, Key, **_):
+        with self._lock:
+            self.items.pop(self._key(Key), None)
+        return {}
+
+
+class FakeDynamoDB:
+    """The boto3 dynamodb resource: Table(name) returns the same fake table every time."""
+
+    def __init__(self):
+        self.tables = {}
+
+    def Table(self, name: str) -> FakeDynamoDBTable:
+        if name not in self.tables:
+            self.tables[name] = FakeDynamoDBTable(name)
+        return self.tables[name]
+
+
+class LocalAWS:
+    """One set of fakes, and a patch of boto3.client / boto3.resource that hands them out."""
+
+    def __init__(self, dispatcher: EventDispatcher = None, bedrock: FakeBedrockRuntime = None):
+        self.dispatcher = dispatcher or EventDispatcher()
+        self.s3 = FakeS3(self.dispatcher)
+        self.bedrock = bedrock or FakeBedrockRuntime()
+        self.comprehend = FakeComprehend()
+        self.ses = FakeSES()
+        self.dynamodb = FakeDynamoDB()
+        self._originals = None
+
+    def client(self, service: str, *args, **kwargs):
+        clients = {'s3': self.s3, 'bedrock-runtime': self.bedrock, 'comprehend': self.comprehend, 'ses': self.ses}
+        if service not in clients:
+            raise ValueError(f"No local stand-in for the '{service}' client.")
+        return clients[service]
+
+    def resource(self, service: str, *args, **kwargs):
+        if service != 'dynamodb':
+            raise ValueError(f"No local stand-in for the '{service}' resource.")
+        return self.dynamodb
+
+    def install(self):
+        """Makes boto3.client / boto3.resource return the fakes, so modules imported now get them."""
+        self._originals = (boto3.client, boto3.resource)
+        boto3.client, boto3.resource = self.client, self.resource
+        return self
+
+    def uninstall(self):
+        if self._originals:
+            boto3.client, boto3.resource = self._originals
+            self._originals = None
+
+    def __enter__(self):
+        return self.install()
+
+    def __exit__(self, exc_type, exc, tb):
+        self.uninstall()
+        return False
@@ -0,0 +1,105 @@
+import re
+
+from resume_sections import SECTION_HEADINGS, segment_resume
+
+# Words that end a run of capitalized tokens: job titles, header labels and section titles.
+# "JOHN SMITH SOFTWARE ENGINEER" gives the candidate "JOHN SMITH".
+STOP_WORDS = {
+    'resume', 'curriculum', 'vitae', 'cv', 'biodata', 'email', 'e-mail', 'mail', 'phone', 'mobile', 'contact',
+    'address', 'linkedin', 'github', 'portfolio', 'website', 'tel', 'mob', 'name', 'dob', 'india',
+    'data', 'software', 'senior', 'junior', 'lead', 'full', 'stack', 'front', 'back', 'end', 'web', 'cloud',
+    'machine', 'learning', 'engineer', 'developer', 'analyst', 'scientist', 'manager', 'consultant', 'intern',
+    'student', 'architect', 'designer', 'administrator', 'specialist', 'associate', 'executive', 'officer',
+    'director', 'tester', 'devops', 'professional', 'fresher', 'graduate', 'the', 'and', 'of', 'for', 'in',
+    'at', 'to', 'with', 'a', 'an', 'i', 'my', 'am',
+}
+STOP_WORDS.update(word for phrases in SECTION_HEADINGS.values() for phrase in phrases for word in phrase.split())
+
+# Name-shaped token: Title Case, ALL CAPS or an initial ("J." / "J"), letters plus ' and -.
+_NAME_TOKEN = re.compile(r"^(?:[A-Z][a-z]+(?:['-][A-Z]?[a-z]+)*|[A-Z]{2,}(?:['-][A-Z]+)*|[A-Z]\.?)$")
+_WORD = re.compile(r"[A-Za-z][A-Za-z'.-]*")
+_CONTACT = re.compile(r"[\w.+-]+@[\w-]+\.[\w.-]+|\+?\d[\d\s().-]{8,}\d")
+_HEADER_CHARS = 400
+
+
+def _candidate_runs(header: str):
+    """Yields (start offset, tokens) for maximal runs of name-shaped tokens separated only by spaces."""
+    run, run_start, previous_end = [], 0, 0
+    for match in _WORD.finditer(header):
+        token = match.group(0).rstrip('.') if len(match.group(0)) > 2 else match.group(0)
+        gap = header[previous_end:match.start()]
+        is_name_token = _NAME_TOKEN.match(token) is not None and token.lower() not in STOP_WORDS
+        if run and (not is_name_token or gap.strip()):
+            yield run_start, run
+            run = []
+        if is_name_token:
+            if not run:
+                run_start = match.start()
+            run.append(token)
+        previous_end = match.end()
+    if run:
+        yield run_start, run
+
+
+def extract_name_locally(resume_text: str) -> dict:
+    """
+    Guesses the candidate name from the resume header without any network call.
+
+    Runs of capitalized tokens in the header are scored by length (2-3 tokens is typical),
+    position (the first run near the top), distance to the email/phone, and how many of the
+    tokens the email address confirms. Returns {'name': str or None, 'confidence': 0..1}.
+    """
+    if not resume_text:
+        return {'name': None, 'confidence': 0.0}
+
+    lines = resume_text.splitlines()
+    if len(lines) >= 5:
+        # Line breaks survived extraction: look at the first lines, one candidate run per line.
+        header = '\n'.join(line.strip() for line in lines[:8])
+        header = re.sub(r'\n', ' | ', header)
+    else:
+        header = segment_resume(resume_text)['header'] or resume_text
+    header = header[:_HEADER_CHARS]
+
+    contact = _CONTACT.search(header)
+    email = re.search(r"([\w.+-]+)@", header)
+    email_user = re.sub(r'[^a-z]', '', email.group(1).lower()) if email else ''
+
+    best = {'name': None, 'confidence': 0.0}
+    for index, (start, tokens) in enumerate(_candidate_runs(header)):
+        if contact and start > contact.start():
+            break
+
+        # Whitespace-collapsed text glues the city onto the name ("Priya Sharma Bangalore"). The
+        # run is cut after the last token the email confirms; tokens past that, or past the
+        # second one when the email confirms none, are unconfirmed and cost confidence.
+        confirmed = [position for position, token in enumerate(tokens)
+                     if email_user and len(token) >= 3 and token.lower() in email_user]
+        kept = max(confirmed[-1] + 1 if confirmed else 0, 2)
+        tokens = tokens[:kept] if confirmed and confirmed[-1] >= 1 else tokens
+        unconfirmed = max(0, len(tokens) - kept)
+
+        if 2 <= len(tokens) <= 3:
+            score = 0.35
+        elif len(tokens) == 4:
+            score = 0.2
+        else:
+            continue
+
+        if index == 0 and start < 40:
+            score += 0.3
+        elif index == 1:
+            score += 0.1
+
+        end = start + len(' '.join(tokens))
+        if contact and contact.start() - end <= 120:
+            score += 0.15
+        if confirmed and not unconfirmed:
+            score += 0.25
+        score -= 0.2 * unconfirmed
+
+        score = min(score, 1.0)
+        if score > best['confidence']:
+            name = ' '.join(tokens)
+            best = {'name': name.title() if name.isupper() else name, 'confidence': round(score, 2)}
+    return best
@@ -0,0 +1,184 @@
+import os
+import re
+from io import BytesIO
+
+from pdfminer.pdfdocument import PDFDocument, PDFEncryptionError, PDFPasswordIncorrect
+from pdfminer.pdfpage import PDFPage
+from pdfminer.pdfparser import PDFParser, PDFSyntaxError
+from pdfminer.pdftypes import PDFObjRef, PDFStream, resolve1
+from pdfminer.psparser import LIT
+
+# Only the first pages are inspected; a resume that has no text there has none anywhere.
+PRESCAN_SAMPLE_PAGES = int(os.environ.get('PRESCAN_SAMPLE_PAGES', 5))
+# Larger files are rejected without being read.
+MAX_PDF_BYTES = int(os.environ.get('MAX_PDF_BYTES', 20 * 1024 * 1024))
+# Documents with more pages are rejected outright; a CV of that length is not a CV.
+REJECT_PAGE_COUNT = int(os.environ.get('REJECT_PAGE_COUNT', 200))
+# Documents with more pages than this have only their first MAX_EXTRACT_PAGES pages extracted.
+MAX_EXTRACT_PAGES = int(os.environ.get('MAX_EXTRACT_PAGES', 20))
+
+ROUTE_TEXT = 'text'
+ROUTE_TRUNCATE = 'truncate'
+ROUTE_IMAGE_ONLY = 'image_only'
+ROUTE_REJECT = 'reject'
+ROUTE_COUNTS = {ROUTE_TEXT: 0, ROUTE_TRUNCATE: 0, ROUTE_IMAGE_ONLY: 0, ROUTE_REJECT: 0}
+
+# Text-showing operators (Tj, TJ, ' and ") in a decoded content stream.
+_TEXT_OPERATOR = re.compile(rb"(?:\)|\]|>)\s*(?:Tj|TJ|'|\")")
+# Inline images: BI <image dictionary> ID <data> EI.
+_INLINE_IMAGE = re.compile(rb"(?<!\S)BI\s.{0,1024}?\sID\s", re.DOTALL)
+_IMAGE = LIT('Image')
+_FORM = LIT('Form')
+# Form XObjects can contain further forms; deeper nesting than this is not followed.
+MAX_FORM_DEPTH = 8
+
+
+def _content_bytes(page) -> bytes:
+    data = b''
+    for stream in page.contents:
+        stream = resolve1(stream)
+        if isinstance(stream, PDFStream):
+            data += stream.get_data()
+    return data
+
+
+def _scan_content(data: bytes, resources, depth: int = 0, visited: set = None) -> tuple:
+    """
+    (whether the content shows text, how many images it places) for a content stream and
+    the Form XObjects it can draw, followed down to MAX_FORM_DEPTH and each form once.
+    Resumes exported from design tools often keep all their text inside forms.
+    """
+    visited = set() if visited is None else visited
+    has_text = _TEXT_OPERATOR.search(data) is not None
+    images = len(_INLINE_IMAGE.findall(data))
+    xobjects = resolve1(resolve1(resources or {}).get('XObject')) or {}
+    for reference in xobjects.values():
+        xobject = resolve1(reference)
+        if not isinstance(xobject, PDFStream):
+            continue
+        subtype = xobject.get('Subtype')
+        if subtype is _IMAGE:
+            images += 1
+        elif subtype is _FORM and depth < MAX_FORM_DEPTH:
+            identity = reference.objid if isinstance(reference, PDFObjRef) else id(xobject)
+            if identity in visited:
+                continue
+            visited.add(identity)
+            # A form without its own resources uses the ones of the page that draws it.
+            form_text, form_images = _scan_content(xobject.get_data(), xobject.get('Resources') or resources,
+                                                   depth + 1, visited)
+            has_text, images = has_text or form_text, images + form_images
+    return has_text, images
+
+
+def prescan_pdf(pdf_bytes: bytes, sample_pages: int = PRESCAN_SAMPLE_PAGES) -> dict:
+    """
+    Reads only the PDF structure, without layout analysis or text decoding: the page count
+    from the page tree, and for the first sample_pages pages whether their content streams,
+    or the Form XObjects they draw, show any text and place any images (XObject or inline).
+    Returns {'sizeBytes', 'pages', 'sampledPages', 'textPages', 'imagePages', 'imageRatio', 'error'}.
+    """
+    scan = {'sizeBytes': len(pdf_bytes), 'pages': 0, 'sampledPages': 0, 'textPages': 0,
+            'imagePages': 0, 'imageRatio': 0.0, 'error': None}
+    try:
+        document = PDFDocument(PDFParser(BytesIO(pdf_bytes)))
+        count = resolve1(resolve1(document.catalog['Pages']).get('Count'))
+        for page in PDFPage.create_pages(document):
+            if scan['sampledPages'] >= sample_pages:
+                break
+            scan['sampledPages'] += 1
+            has_text, images = _scan_content(_content_bytes(page), page.resources)
+            if has_text:
+                scan['textPages'] += 1
+            if images:
+                scan['imagePages'] += 1
+        scan['pages'] = count if isinstance(count, int) else scan['sampledPages']
+    except (PDFEncryptionError, PDFPasswordIncorrect):
+        scan['error'] = 'encrypted'
+    except (PDFSyntaxError, KeyError, TypeError, ValueError) as e:
+        scan['error'] = f"unreadable: {e}"
+    if scan['sampledPages']:
+        scan['imageRatio'] = round(scan['imagePages'] / scan['sampledPages'], 2)
+    return scan
+
+
+def route_for(scan: dict) -> tuple:
+    """Returns (route, reason) for a prescan result."""
+    if scan['error']:
+        return ROUTE_REJECT, scan['error']
+    if scan['sizeBytes'] > MAX_PDF_BYTES:
+        return ROUTE_REJECT, f"{scan['sizeBytes']} bytes is over the {MAX_PDF_BYTES} byte limit"
+    if scan['pages'] == 0:
+        return ROUTE_REJECT, "no pages"
+    if scan['pages'] > REJECT_PAGE_COUNT:
+        return ROUTE_REJECT, f"{scan['pages']} pages is over the {REJECT_PAGE_COUNT} page limit"
+    if scan['textPages'] == 0:
+        if scan['imagePages']:
+            return ROUTE_IMAGE_ONLY, f"no text on {scan['sampledPages']} sampled pages, images on {scan['imagePages']}"
+        return ROUTE_REJECT, f"no text or images on {scan['sampledPages']} sampled pages"
+    if scan['pages'] > MAX_EXTRACT_PAGES:
+        return ROUTE_TRUNCATE, f"{scan['pages']} pages, extracting the first {MAX_EXTRACT_PAGES}"
+    return ROUTE_TEXT, "text found"
+
+
+def record_route(route: str):
+    ROUTE_COUNTS[route] += 1
+
+
+def _sample_pdf(content: bytes, xobjects: dict = None) -> bytes:
+    """
+    A one-page PDF for check_routes. xobjects maps a name to (dictionary entries, stream
+    data); all of them are in the page's resources, which forms without their own inherit.
+    """
+    xobjects = xobjects or {}
+    numbers = {name: 5 + index for index, name in enumerate(xobjects)}
+    references = b' '.join(b"/%s %d 0 R" % (name.encode(), number) for name, number in numbers.items())
+    resources = b"<< /Font << /F1 4 0 R >> /XObject << %s >> >>" % references
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               b"<< /Type /Pages /Kids [3 0 R] /Count 1 >>",
+               b"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 612 792] /Contents %d 0 R /Resources %s >>"
+               % (5 + len(xobjects), resources),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for entries, data in list(xobjects.values()) + [(b'', content)]:
+        objects.append(b"<< %s /Length %d >>\nstream\n%s\nendstream" % (entries, len(data), data))
+
+    pdf, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(pdf)
+
+
+def check_routes() -> dict:
+    """Routes a few hand-built PDFs and compares them with the expected route; returns the mismatches."""
+    text = b"BT /F1 11 Tf 56 770 Td (Jane Doe Python Developer) Tj ET"
+    image = (b"/Type /XObject /Subtype /Image /Width 1 /Height 1 /ColorSpace /DeviceGray /BitsPerComponent 8", b"\x00")
+    form = b"/Type /XObject /Subtype /Form /BBox [0 0 612 792]"
+    inline_image = b"q 100 0 0 100 56 600 cm BI /W 1 /H 1 /CS /G /BPC 8 ID \x00 EI Q"
+    samples = {
+        'text': (_sample_pdf(text), ROUTE_TEXT),
+        'text in a form': (_sample_pdf(b"/Fm1 Do", {'Fm1': (form, text)}), ROUTE_TEXT),
+        'text in a nested form': (_sample_pdf(b"/Fm1 Do", {'Fm1': (form, b"/Fm2 Do"), 'Fm2': (form, text)}), ROUTE_TEXT),
+        'text in a form and an image': (_sample_pdf(b"/Fm1 Do /Im1 Do", {'Fm1': (form, text), 'Im1': image}), ROUTE_TEXT),
+        'image': (_sample_pdf(b"q 612 0 0 792 0 0 cm /Im1 Do Q", {'Im1': image}), ROUTE_IMAGE_ONLY),
+        'inline image': (_sample_pdf(inline_image), ROUTE_IMAGE_ONLY),
+        'image in a form': (_sample_pdf(b"/Fm1 Do", {'Fm1': (form, b"/Im1 Do"), 'Im1': image}), ROUTE_IMAGE_ONLY),
+        # Forms without their own resources see the page's, including themselves.
+        'form drawing itself': (_sample_pdf(b"/Fm1 Do", {'Fm1': (form, b"/Fm1 Do")}), ROUTE_REJECT),
+        'empty page': (_sample_pdf(b""), ROUTE_REJECT),
+    }
+    mismatches = {}
+    for name, (pdf_bytes, expected) in samples.items():
+        route, reason = route_for(prescan_pdf(pdf_bytes))
+        if route != expected:
+            mismatches[name] = {'expected': expected, 'route': route, 'reason': reason}
+    return mismatches
+
+
+if __name__ == '__main__':
+    # python pdf_prescan.py
+    print(check_routes() or "All prescan routes as expected.")
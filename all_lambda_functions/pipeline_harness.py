@@ -0,0 +1,300 @@
+import argparse
+import contextlib
+import io
+import json
+import logging
+import random
+import threading
+import time
+
+from local_aws import EventDispatcher, FakeBedrockRuntime, LocalAWS
+from pseudonymizer import FIRST_NAMES, LAST_NAMES
+
+# Drives the whole resume pipeline offline against local_aws's in-memory fakes:
+#
+#   python pipeline_harness.py --resumes 200 --bedrock-latency-ms 400 --event-delay-ms 150
+#   python pipeline_harness.py --resumes 200 --pipeline fused
+#   python pipeline_harness.py --resumes 200 --append-mode segmented --throttle-rate 0.05
+#
+# Synthetic resume PDFs are uploaded to the upload bucket. From there S3 notifications fan
+# out to the handlers exactly as aws/lambda_utils*.py wire them:
+#   pdf -> text_extraction (or fused_pipeline) -> .txt -> bedrock_lambda -> .json
+#   -> json_appender_lambda -> candidates.json -> anonymous_lambda -> ses_lambda_function
+# The report gives the upload-to-dashboard latency percentiles (a resume is on the dashboard
+# once candidates.json contains its candidate), throughput, per-function durations and
+# queueing, and the Bedrock and S3 call counts.
+# All handlers share one interpreter, so CPU-bound stages compete for the GIL; compare runs
+# made with the same settings rather than reading the numbers as Lambda timings.
+
+BUCKETS = {
+    'pdf': 'local-resume-uploads',
+    'text': 'local-extracted-text',
+    'json': 'local-candidate-json',
+    'dashboard': 'local-dashboard',
+    'anonymous': 'local-anonymized',
+}
+MASTER_FILE_KEY = 'candidates.json'
+
+SECTIONS = {
+    'SUMMARY': ["{years} years building {area} systems for product and analytics teams.",
+                "Focused on reliability, cost and delivery speed."],
+    'EXPERIENCE': ["Senior Engineer, Example Corp ({start} - present)",
+                   "Led a team of {team} engineers shipping {area} services.",
+                   "Software Engineer, Sample Labs ({previous} - {start})",
+                   "Built internal tools and data pipelines used by {users} people."],
+    'EDUCATION': ["{degree}, Example University, {graduation}"],
+}
+AREAS = ['cloud', 'data', 'backend', 'frontend', 'machine learning', 'mobile', 'devops']
+DEGREES = ['B.Tech in Computer Science', 'B.Sc in Mathematics', 'M.Tech in Software Engineering',
+           'MBA', 'M.Sc in Data Science', 'Bachelor of Engineering']
+SKILLS = ['python', 'java', 'sql', 'aws', 'docker', 'kubernetes', 'react', 'node.js', 'spark', 'airflow',
+          'terraform', 'git', 'linux', 'postgresql', 'tableau', 'excel', 'communication', 'leadership']
+
+
+def make_pdf(pages: list) -> bytes:
+    """A minimal text PDF (Helvetica, one text object per page) from lists of lines."""
+    objects = [b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    pages_id = 2 + 2 * len(pages)
+    page_ids = []
+    for lines in pages:
+        escaped = [line.replace('\\', '\\\\').replace('(', '\\(').replace(')', '\\)') for line in lines]
+        stream = ("BT /F1 11 Tf 56 770 Td 15 TL\n" + ''.join(f"({line}) '\n" for line in escaped) + "ET").encode('latin-1', 'replace')
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(stream), stream))
+        objects.append(b"<< /Type /Page /Parent %d 0 R /MediaBox [0 0 612 792] /Contents %d 0 R "
+                       b"/Resources << /Font << /F1 1 0 R >> >> >>" % (pages_id, len(objects)))
+        page_ids.append(len(objects))
+    objects.append(b"<< /Type /Pages /Kids [%s] /Count %d >>" % (b' '.join(b"%d 0 R" % number for number in page_ids), len(page_ids)))
+    objects.append(b"<< /Type /Catalog /Pages %d 0 R >>" % pages_id)
+
+    pdf, offsets = bytearray(b"%PDF-1.4\n"), []
+    for number, body in enumerate(objects, start=1):
+        offsets.append(len(pdf))
+        pdf += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(pdf)
+    pdf += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    pdf += b''.join(b"%010d 00000 n \n" % offset for offset in offsets)
+    pdf += b"trailer\n<< /Size %d /Root %d 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, len(objects), xref)
+    return bytes(pdf)
+
+
+def synthetic_resume(rng: random.Random, pages: int = 1) -> bytes:
+    first, last = rng.choice(FIRST_NAMES), rng.choice(LAST_NAMES)
+    start = rng.randint(2012, 2022)
+    values = {'years': 2025 - start + rng.randint(1, 4), 'area': rng.choice(AREAS), 'team': rng.randint(3, 12),
+              'start': start, 'previous': start - rng.randint(2, 5), 'users': rng.choice([50, 200, 1000]),
+              'degree': rng.choice(DEGREES), 'graduation': start - rng.randint(0, 2)}
+    lines = [f"{first} {last}".upper(),
+             f"{first.lower()}.{last.lower()}@example.com | +91 9{rng.randint(100000000, 999999999)}"]
+    for heading, templates in SECTIONS.items():
+        lines += ['', heading] + [template.format(**values) for template in templates]
+    lines += ['', 'SKILLS', ', '.join(rng.sample(SKILLS, rng.randint(5, 10)))]
+    # Longer resumes repeat the experience section with other projects on the extra pages.
+    extra = [f"Project {number}: {rng.choice(AREAS)} platform work with {', '.join(rng.sample(SKILLS, 3))}."
+             for number in range(40)]
+    return make_pdf([lines] + [extra] * (pages - 1))
+
+
+def percentiles(values: list) -> dict:
+    if not values:
+        return {'count': 0}
+    ordered = sorted(values)
+
+    def rank(fraction):
+        return round(ordered[min(len(ordered) - 1, max(0, int(round(fraction * len(ordered))) - 1))], 1)
+
+    return {'count': len(ordered), 'p50': rank(0.5), 'p90': rank(0.9), 'p99': rank(0.99),
+            'max': round(ordered[-1], 1), 'mean': round(sum(ordered) / len(ordered), 1)}
+
+
+class PipelineHarness:
+    """Loads the handler modules against the fakes and wires the S3 notifications between them."""
+
+    def __init__(self, aws: LocalAWS, pipeline: str = 'chained', append_mode: str = 'rewrite',
+                 compaction_interval: float = 1.0):
+        self.aws = aws
+        self.pipeline = pipeline
+        self.append_mode = append_mode
+        self.compaction_interval = compaction_interval
+        self.uploaded = {}
+        self.candidate_stems = {}
+        self.on_dashboard = {}
+        self._lock = threading.Lock()
+        self._load_modules()
+        aws.s3.observe(self._observe)
+
+    def _load_modules(self):
+        with self.aws:
+            import anonymous_lambda
+            import bedrock_lambda
+            import candidate_log
+            import fused_pipeline
+            import json_appender_lambda
+            import ses_lambda_function
+            import text_extraction
+            from inference_cache import DynamoDBCacheBackend, InferenceCache
+
+        # Modules imported earlier in this process still hold their old clients, so every
+        # client and bucket is set explicitly.
+        s3 = self.aws.s3
+        text_extraction.s3, text_extraction.DEST_BUCKET = s3, BUCKETS['text']
+        bedrock_lambda.s3_client, bedrock_lambda.DESTINATION_BUCKET = s3, BUCKETS['json']
+        bedrock_lambda.bedrock_runtime = self.aws.bedrock
+        if bedrock_lambda.inference_cache is not None:
+            bedrock_lambda.inference_cache = InferenceCache(
+                DynamoDBCacheBackend(self.aws.dynamodb.Table(bedrock_lambda.INFERENCE_CACHE_TABLE)),
+                bedrock_lambda.PROMPT_VERSION, bedrock_lambda.BEDROCK_MODEL_ID, bedrock_lambda.INFERENCE_CACHE_TTL_SECONDS)
+        json_appender_lambda.s3_client, json_appender_lambda.DESTINATION_BUCKET = s3, BUCKETS['dashboard']
+        json_appender_lambda.APPEND_MODE = self.append_mode
+        anonymous_lambda.s3_client, anonymous_lambda.DESTINATION_BUCKET = s3, BUCKETS['anonymous']
+        anonymous_lambda.OUTPUT_FILENAME = 'anonymized_candidates.json'
+        anonymous_lambda.PSEUDONYMIZATION_KEY = anonymous_lambda.PSEUDONYMIZATION_KEY or 'local-harness-key'
+        ses_lambda_function.ses_client = self.aws.ses
+        # Scaled down so segmented mode publishes within a run; fake S3 writes are immediate.
+        candidate_log.COMPACTION_GRACE_SECONDS = 1
+        candidate_log.COMPACTION_MAX_AGE_SECONDS = 1
+
+        first_stage = fused_pipeline if self.pipeline == 'fused' else text_extraction
+        s3.add_notification(BUCKETS['pdf'], first_stage.__name__, first_stage.lambda_handler)
+        s3.add_notification(BUCKETS['text'], 'bedrock_lambda', bedrock_lambda.lambda_handler, suffix='.txt')
+        s3.add_notification(BUCKETS['json'], 'json_appender_lambda', json_appender_lambda.lambda_handler)
+        s3.add_notification(BUCKETS['dashboard'], 'anonymous_lambda', anonymous_lambda.lambda_handler,
+                            prefix=MASTER_FILE_KEY)
+        s3.add_notification(BUCKETS['anonymous'], 'ses_lambda_function', ses_lambda_function.lambda_handler)
+        self.json_appender = json_appender_lambda
+
+    def _observe(self, bucket: str, key: str, body: bytes):
+        """Maps candidate ids to resumes, and notes when each candidate first shows up in candidates.json."""
+        if bucket == BUCKETS['json'] and key.endswith('.json'):
+            candidate = json.loads(body)
+            with self._lock:
+                self.candidate_stems[candidate['candidateId']] = key[:-len('.json')]
+        elif bucket == BUCKETS['dashboard'] and key == MASTER_FILE_KEY:
+            now = time.perf_counter()
+            ids = [record.get('candidateId') for record in json.loads(body)]
+            with self._lock:
+                for candidate_id in ids:
+                    self.on_dashboard.setdefault(candidate_id, now)
+
+    def _compaction_schedule(self, stop: threading.Event):
+        # Stands in for the EventBridge rule that invokes the appender without records.
+        while not stop.wait(self.compaction_interval):
+            self.aws.dispatcher.dispatch('json_appender_lambda', self.json_appender.lambda_handler, {})
+
+    def run(self, resumes: int, upload_rate: float = 0.0, pages: int = 1, duplicate_rate: float = 0.0,
+            seed: int = 7, timeout: float = 600) -> dict:
+        rng = random.Random(seed)
+        corpus = []
+        for index in range(resumes):
+            if corpus and rng.random() < duplicate_rate:
+                corpus.append(rng.choice(corpus))
+            else:
+                corpus.append(synthetic_resume(rng, pages))
+
+        stop = threading.Event()
+        if self.append_mode == 'segmented':
+            threading.Thread(target=self._compaction_schedule, args=(stop,), daemon=True).start()
+
+        started = time.perf_counter()
+        for index, pdf in enumerate(corpus):
+            stem = f"resume-{index:05d}"
+            with self._lock:
+                self.uploaded[stem] = time.perf_counter()
+            self.aws.s3.put_object(Bucket=BUCKETS['pdf'], Key=f"{stem}.pdf", Body=pdf, ContentType='application/pdf')
+            if upload_rate:
+                time.sleep(max(0.0, started + (index + 1) / upload_rate - time.perf_counter()))
+
+        # In segmented mode the last candidates only reach the dashboard at a later compaction.
+        deadline = started + timeout
+        while time.perf_counter() < deadline:
+            self.aws.dispatcher.wait_idle(timeout=max(0.0, deadline - time.perf_counter()))
+            if self.append_mode != 'segmented' or len(self._latencies()) >= len(self.uploaded) - self._routed():
+                break
+            time.sleep(self.compaction_interval)
+        stop.set()
+        self.aws.dispatcher.wait_idle(timeout=max(0.0, deadline - time.perf_counter()))
+        return self.report(time.perf_counter() - started)
+
+    def _routed(self) -> int:
+        return sum(1 for bucket, key in self.aws.s3.objects if bucket == BUCKETS['text'] and key.startswith('routed/'))
+
+    def _latencies(self) -> dict:
+        with self._lock:
+            return {stem: (self.on_dashboard[candidate_id] - self.uploaded[stem]) * 1000
+                    for candidate_id, stem in self.candidate_stems.items()
+                    if candidate_id in self.on_dashboard and stem in self.uploaded}
+
+    def report(self, wall_seconds: float) -> dict:
+        latencies = self._latencies()
+        functions = {}
+        for invocation in self.aws.dispatcher.invocations:
+            entry = functions.setdefault(invocation['function'], {'durations': [], 'waits': [], 'errors': 0})
+            entry['durations'].append(invocation['durationMs'])
+            entry['waits'].append(invocation['waitMs'])
+            entry['errors'] += bool(invocation['error'])
+        finished = max(self.on_dashboard.values(), default=None)
+        dashboard_seconds = finished - min(self.uploaded.values()) if finished and self.uploaded else 0
+        return {
+            'pipeline': self.pipeline,
+            'appendMode': self.append_mode,
+            'resumes': len(self.uploaded),
+            'onDashboard': len(latencies),
+            'wallSeconds': round(wall_seconds, 2),
+            'resumesPerSecond': round(len(latencies) / dashboard_seconds, 2) if dashboard_seconds else 0.0,
+            'uploadToDashboardMs': percentiles(list(latencies.values())),
+            'functions': {
+                name: {'invocations': len(entry['durations']), 'errors': entry['errors'],
+                       'durationMs': percentiles(entry['durations']), 'waitMs': percentiles(entry['waits'])}
+                for name, entry in functions.items()
+            },
+            'bedrock': dict(self.aws.bedrock.stats),
+            'sesEmails': len(self.aws.ses.sent),
+            's3Calls': dict(self.aws.s3.calls),
+        }
+
+
+def run_harness(resumes: int = 50, pipeline: str = 'chained', append_mode: str = 'rewrite',
+                event_delay_ms: float = 100, concurrency: int = 4, bedrock_latency_ms: float = 300,
+                bedrock_jitter_ms: float = 100, throttle_rate: float = 0.0, bedrock_max_concurrency: int = None,
+                upload_rate: float = 0.0, pages: int = 1, duplicate_rate: float = 0.0, quiet: bool = True,
+                seed: int = 7) -> dict:
+    dispatcher = EventDispatcher(delay_ms=event_delay_ms, concurrency=concurrency)
+    bedrock = FakeBedrockRuntime(latency_ms=bedrock_latency_ms, jitter_ms=bedrock_jitter_ms,
+                                 throttle_rate=throttle_rate, max_concurrency=bedrock_max_concurrency, seed=seed)
+    aws = LocalAWS(dispatcher, bedrock)
+    harness = PipelineHarness(aws, pipeline, append_mode)
+    output = io.StringIO()
+    if quiet:
+        logging.disable(logging.INFO)
+    try:
+        with contextlib.redirect_stdout(output) if quiet else contextlib.nullcontext():
+            return harness.run(resumes, upload_rate, pages, duplicate_rate, seed)
+    finally:
+        logging.disable(logging.NOTSET)
+        dispatcher.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the resume pipeline end to end against in-memory AWS fakes.")
+    parser.add_argument('--resumes', type=int, default=50)
+    parser.add_argument('--pipeline', choices=['chained', 'fused'], default='chained')
+    parser.add_argument('--append-mode', choices=['rewrite', 'segmented'], default='rewrite')
+    parser.add_argument('--event-delay-ms', type=float, default=100, help="S3 notification delivery delay")
+    parser.add_argument('--concurrency', type=int, default=4, help="concurrent invocations per function")
+    parser.add_argument('--bedrock-latency-ms', type=float, default=300)
+    parser.add_argument('--bedrock-jitter-ms', type=float, default=100)
+    parser.add_argument('--throttle-rate', type=float, default=0.0, help="fraction of Bedrock calls throttled")
+    parser.add_argument('--bedrock-max-concurrency', type=int, default=None, help="Bedrock calls in flight before throttling")
+    parser.add_argument('--upload-rate', type=float, default=0.0, help="uploads per second, 0 for all at once")
+    parser.add_argument('--pages', type=int, default=1)
+    parser.add_argument('--duplicate-rate', type=float, default=0.0, help="fraction of uploads that repeat an earlier PDF")
+    parser.add_argument('--verbose', action='store_true', help="show the handlers' own output")
+    arguments = parser.parse_args()
+    report = run_harness(arguments.resumes, arguments.pipeline, arguments.append_mode, arguments.event_delay_ms,
+                         arguments.concurrency, arguments.bedrock_latency_ms, arguments.bedrock_jitter_ms,
+                         arguments.throttle_rate, arguments.bedrock_max_concurrency, arguments.upload_rate,
+                         arguments.pages, arguments.duplicate_rate, quiet=not arguments.verbose)
+    print(json.dumps(report, indent=2))
+
+
+if __name__ == '__main__':
+    main()
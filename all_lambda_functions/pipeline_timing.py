@@ -0,0 +1,23 @@
+from datetime import datetime, timezone
+
+# S3 metadata that follows a resume through the stages: when the PDF was uploaded (the
+# eventTime of its S3 notification), and which pipeline wrote an artifact.
+UPLOADED_AT_METADATA = 'uploaded-at'
+PIPELINE_METADATA = 'pipeline'
+# Artifacts the fused pipeline writes for audit only; the chained stages skip them.
+PIPELINE_FUSED = 'fused'
+
+
+def is_fused_artifact(s3_object: dict) -> bool:
+    return s3_object.get('Metadata', {}).get(PIPELINE_METADATA) == PIPELINE_FUSED
+
+
+def milliseconds_since(uploaded_at: str):
+    """Milliseconds from an ISO 8601 event time ('2025-01-01T10:00:00.123Z') to now, or None."""
+    if not uploaded_at:
+        return None
+    try:
+        started = datetime.fromisoformat(uploaded_at.replace('Z', '+00:00'))
+    except ValueError:
+        return None
+    return round((datetime.now(timezone.utc) - started).total_seconds() * 1000)
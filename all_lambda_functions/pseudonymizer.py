@@ -0,0 +1,117 @@
+import hashlib
+import hmac
+import json
+import re
+import time
+
+# Pools the pseudonyms are drawn from. A candidate's HMAC picks one entry from each, so the
+# same candidate always gets the same name under the same key. 64 x 64 names x 16 domains;
+# collisions between candidates are fine because the ID comes from the full digest.
+FIRST_NAMES = (
+    'Aarav', 'Aditi', 'Alex', 'Amara', 'Ananya', 'Arjun', 'Ava', 'Benjamin', 'Camila', 'Carlos', 'Chloe', 'Daniel',
+    'Deepa', 'Diego', 'Elena', 'Emma', 'Ethan', 'Fatima', 'Felix', 'Grace', 'Hana', 'Harper', 'Ishaan', 'Isla',
+    'Jack', 'Julia', 'Kabir', 'Kavya', 'Leo', 'Lina', 'Lucas', 'Maya', 'Meera', 'Mia', 'Mohan', 'Nadia', 'Naveen',
+    'Nina', 'Noah', 'Olivia', 'Omar', 'Priya', 'Rahul', 'Ravi', 'Riya', 'Rohan', 'Sara', 'Sofia', 'Sam', 'Sanjay',
+    'Shreya', 'Tara', 'Theo', 'Uma', 'Varun', 'Vera', 'Vikram', 'Wei', 'Yara', 'Yusuf', 'Zara', 'Zoe', 'Ivan',
+    'Keiko',
+)
+LAST_NAMES = (
+    'Agarwal', 'Ahmed', 'Bailey', 'Banerjee', 'Bauer', 'Brooks', 'Chen', 'Costa', 'Das', 'Desai', 'Evans', 'Fischer',
+    'Garcia', 'Ghosh', 'Gupta', 'Hansen', 'Hughes', 'Iyer', 'Jain', 'Johnson', 'Joshi', 'Kapoor', 'Kim', 'Klein',
+    'Kumar', 'Lopez', 'Mehta', 'Menon', 'Miller', 'Mishra', 'Moreau', 'Murphy', 'Nair', 'Nguyen', 'Novak', 'Okafor',
+    'Patel', 'Pereira', 'Pillai', 'Rao', 'Reddy', 'Rossi', 'Sato', 'Schmidt', 'Sen', 'Shah', 'Sharma', 'Silva',
+    'Singh', 'Smith', 'Suzuki', 'Tanaka', 'Taylor', 'Thomas', 'Varma', 'Verma', 'Wagner', 'Walker', 'Wang', 'Weber',
+    'Williams', 'Wilson', 'Yadav', 'Young',
+)
+EMAIL_DOMAINS = (
+    'example.com', 'example.org', 'example.net', 'mail.example.com', 'inbox.example.org', 'post.example.net',
+    'demo.example.com', 'test.example.org', 'users.example.net', 'people.example.com', 'talent.example.org',
+    'hire.example.net', 'jobs.example.com', 'cv.example.org', 'resume.example.net', 'careers.example.com',
+)
+
+_NON_DIGITS = re.compile(r'\D')
+
+
+def mask_phone(phone):
+    """Masks all but the last 4 digits; short or non-string numbers are masked completely."""
+    if not phone:
+        return phone
+    if not isinstance(phone, str) or len(phone) <= 4:
+        return 'XXXX'
+    digits_only = _NON_DIGITS.sub('', phone)
+    if len(digits_only) <= 4:
+        return 'XXXX'
+    return 'X' * (len(digits_only) - 4) + digits_only[-4:]
+
+
+def record_id(record: dict) -> str:
+    """The identity a pseudonym is derived from: candidateId, or the content for older records."""
+    return record.get('candidateId') or hashlib.sha256(json.dumps(record, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class Pseudonymizer:
+    """
+    Keyed, deterministic pseudonymization: HMAC-SHA256(key, candidate identity) picks the
+    pseudonymous ID, name and email domain. Without the key the pseudonyms can't be linked
+    back; with the same key they are identical across runs, so datasets can be joined and
+    updated in place.
+    """
+
+    def __init__(self, key: bytes):
+        if isinstance(key, str):
+            key = key.encode('utf-8')
+        if not key:
+            raise ValueError("A non-empty pseudonymization key is required.")
+        self._mac = hmac.new(key, digestmod=hashlib.sha256)
+
+    def digest(self, identity: str) -> bytes:
+        mac = self._mac.copy()
+        mac.update(identity.encode('utf-8'))
+        return mac.digest()
+
+    def reference(self, value: str, length: int = 24) -> str:
+        """
+        Keyed hex reference to value for bookkeeping (e.g. which candidates were already
+        anonymized). Derived separately from the pseudonyms, so it matches none of them.
+        """
+        return self.digest('ref:' + value).hex()[:length]
+
+    def pseudonym(self, identity: str) -> dict:
+        """Returns {'candidateId', 'name', 'email'} for one identity."""
+        digest = self.digest(identity)
+        first = FIRST_NAMES[digest[6] % len(FIRST_NAMES)]
+        last = LAST_NAMES[digest[7] % len(LAST_NAMES)]
+        domain = EMAIL_DOMAINS[digest[8] % len(EMAIL_DOMAINS)]
+        return {
+            'candidateId': f"CAND_{digest[:6].hex().upper()}",
+            'name': f"{first} {last}",
+            'email': f"{first.lower()}.{last.lower()}{digest[9] % 100:02d}@{domain}",
+        }
+
+    def pseudonymize(self, record: dict, identity: str = None) -> dict:
+        """Returns a copy of record with ID, name and email replaced and the phone number masked."""
+        anonymized = record.copy()
+        anonymized.update(self.pseudonym(identity or record_id(record)))
+        if 'phoneNumber' in anonymized:
+            anonymized['phoneNumber'] = mask_phone(anonymized['phoneNumber'])
+        return anonymized
+
+    def pseudonymize_batch(self, records: list, identities: list = None) -> list:
+        """Pseudonymizes a whole list in one pass. identities, if given, lines up with records."""
+        if identities is None:
+            identities = [record_id(record) for record in records]
+        return [self.pseudonymize(record, identity) for record, identity in zip(records, identities)]
+
+
+def measure_throughput(record_count: int = 100000, key: bytes = b'benchmark-key') -> dict:
+    """Pseudonymizes record_count synthetic candidates and reports records per second."""
+    records = [{'candidateId': f"id-{index}", 'name': 'Real Name', 'email': 'real@mail.com',
+                'phoneNumber': '+91 98765 43210', 'skills': ['Python']} for index in range(record_count)]
+    started = time.perf_counter()
+    Pseudonymizer(key).pseudonymize_batch(records)
+    seconds = time.perf_counter() - started
+    return {'records': record_count, 'seconds': round(seconds, 3), 'recordsPerSecond': round(record_count / seconds)}
+
+
+if __name__ == '__main__':
+    print(measure_throughput())
@@ -0,0 +1,128 @@
+import re
+from functools import lru_cache
+
+# Section headings as they appear in resumes. Matching is case-sensitive on the
+# UPPER CASE and Title Case forms only, so "5 years of experience" in running text
+# does not start a section but "EXPERIENCE" or "Work Experience" does.
+SECTION_HEADINGS = {
+    'summary': ["summary", "professional summary", "profile", "career objective", "objective", "about me"],
+    'education': ["education", "academic background", "academic qualifications", "educational qualifications",
+                  "academics", "qualifications"],
+    'experience': ["experience", "work experience", "professional experience", "employment history",
+                   "work history", "internships", "internship", "projects", "academic projects"],
+    'skills': ["skills", "technical skills", "key skills", "core competencies", "technologies", "tech stack"],
+    'other': ["certifications", "certificates", "achievements", "awards", "hobbies", "interests",
+              "languages known", "extracurricular activities", "declaration", "personal details", "references"],
+}
+
+# Sections each prompt needs, in the order they are put into the prompt.
+FIELD_SECTIONS = {
+    'name': ['header'],
+    'postgrad': ['education'],
+    'summary': ['summary', 'experience', 'skills'],
+    'profile': ['header', 'summary', 'education', 'experience', 'skills'],
+}
+
+# Hard input budget per prompt context, in estimated tokens.
+FIELD_TOKEN_BUDGETS = {
+    'name': 150,
+    'postgrad': 400,
+    'summary': 1200,
+    'profile': 1600,
+}
+
+SECTION_NAMES = ['header'] + list(SECTION_HEADINGS)
+
+
+def _heading_pattern(line_anchored: bool):
+    heading_to_section = {}
+    for section, phrases in SECTION_HEADINGS.items():
+        for phrase in phrases:
+            heading_to_section[phrase.upper()] = section
+            heading_to_section[phrase.title()] = section
+    # Longest first so "Work Experience" wins over "Experience".
+    alternatives = '|'.join(re.escape(heading) for heading in sorted(heading_to_section, key=len, reverse=True))
+    if line_anchored:
+        pattern = r'(?m)^[ \t•\-*]*(' + alternatives + r')(?![\w])'
+    else:
+        pattern = r'(?<![\w])(' + alternatives + r')(?![\w])'
+    return re.compile(pattern), heading_to_section
+
+
+_FLAT_HEADINGS = _heading_pattern(line_anchored=False)
+_LINE_HEADINGS = _heading_pattern(line_anchored=True)
+
+
+def heading_section(line: str):
+    """
+    Returns the section a line is the heading of, or None. The line has to be just the
+    heading, optionally with a bullet before it and a colon after it.
+    """
+    pattern, heading_to_section = _LINE_HEADINGS
+    match = pattern.match(line)
+    if not match or line[match.end():].strip(' \t:'):
+        return None
+    return heading_to_section[match.group(1)]
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count (~4 characters per token), good enough for budgeting prompts."""
+    return (len(text) + 3) // 4
+
+
+def truncate_to_tokens(text: str, budget: int) -> str:
+    """Cuts text to at most budget estimated tokens, on a word boundary where possible."""
+    max_chars = budget * 4
+    if len(text) <= max_chars:
+        return text
+    cut = text.rfind(' ', 0, max_chars)
+    return text[:cut if cut > max_chars // 2 else max_chars]
+
+
+@lru_cache(maxsize=8)
+def segment_resume(resume_text: str) -> dict:
+    """
+    Splits resume text into header/summary/education/experience/skills/other in one pass.
+
+    Works on both the whitespace-collapsed text text_extraction writes and on text that
+    still has line breaks (headings then have to start a line). Everything before the
+    first heading is the header. Repeated sections of the same kind are joined.
+    """
+    multiline = resume_text.count('\n') >= 5
+    pattern, heading_to_section = _LINE_HEADINGS if multiline else _FLAT_HEADINGS
+
+    sections = {name: [] for name in SECTION_NAMES}
+    current, start = 'header', 0
+    for match in pattern.finditer(resume_text):
+        sections[current].append(resume_text[start:match.start(1)].strip())
+        current, start = heading_to_section[match.group(1)], match.start(1)
+    sections[current].append(resume_text[start:].strip())
+
+    return {name: '\n'.join(part for part in parts if part) for name, parts in sections.items()}
+
+
+def context_for_field(resume_text: str, field: str) -> str:
+    """
+    Returns the part of the resume a prompt for field ('name', 'postgrad', 'summary' or
+    'profile') needs, cut to FIELD_TOKEN_BUDGETS[field]. Falls back to the start of the
+    full text when none of the field's sections were found.
+    """
+    budget = FIELD_TOKEN_BUDGETS[field]
+    sections = segment_resume(resume_text)
+    parts = [sections[name] for name in FIELD_SECTIONS[field] if sections[name]]
+
+    if not parts:
+        context = truncate_to_tokens(resume_text, budget)
+    else:
+        # Share the budget between sections so one long section can't crowd out the others.
+        # Shortest sections are sized first and hand their unused share to the longer ones.
+        trimmed = {}
+        remaining = budget
+        order = sorted(range(len(parts)), key=lambda index: len(parts[index]))
+        for position, index in enumerate(order):
+            trimmed[index] = truncate_to_tokens(parts[index], remaining // (len(parts) - position))
+            remaining -= estimate_tokens(trimmed[index])
+        context = '\n'.join(trimmed[index] for index in range(len(parts)))
+
+    print(f"Prompt context for '{field}': {estimate_tokens(resume_text)} -> {estimate_tokens(context)} estimated tokens")
+    return context
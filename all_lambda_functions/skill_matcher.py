@@ -0,0 +1,103 @@
+import re
+
+# Marks the end of a library term inside the trie. Trie keys are single
+# characters, so the empty string can never collide with a real edge.
+_END = ''
+
+
+def _is_word_char(char: str) -> bool:
+    return char.isalnum() or char == '_'
+
+
+class SkillMatcher:
+    """
+    Finds every term of one or more keyword libraries in a single pass over the text.
+
+    The terms are loaded into a character trie once (at import time in the lambdas).
+    Matching only starts a trie walk where a term could begin, i.e. at characters that
+    are not preceded by a word character, so the text is scanned once instead of once
+    per library entry.
+
+    A term matches when it is not glued to other word characters on either side.
+    Unlike r'\\b' + re.escape(term) + r'\\b', this also works for terms that end in
+    punctuation such as "c++", "c#" and "f#".
+    """
+
+    def __init__(self, libraries: dict):
+        # libraries maps a label (e.g. 'technical') to a list of terms.
+        self._root = {}
+        self._labels = list(libraries)
+        self._term_labels = {}
+        first_chars = set()
+
+        for label, terms in libraries.items():
+            for term in terms:
+                term = term.lower()
+                if not term:
+                    continue
+                node = self._root
+                for char in term:
+                    node = node.setdefault(char, {})
+                node[_END] = term
+                self._term_labels.setdefault(term, set()).add(label)
+                first_chars.add(term[0])
+
+        # Candidate start positions: a possible first character with no word character before it.
+        char_class = ''.join(re.escape(char) for char in sorted(first_chars))
+        self._starts = re.compile(r'(?<!\w)[' + char_class + ']') if char_class else None
+
+    def find_matches(self, text: str) -> dict:
+        """
+        Returns {term: [offsets]} for every library term found in the text.
+        Offsets point into text.lower().
+        """
+        matches = {}
+        if not text or self._starts is None:
+            return matches
+
+        lower_text = text.lower()
+        length = len(lower_text)
+        root = self._root
+
+        for start_match in self._starts.finditer(lower_text):
+            start = start_match.start()
+            node = root
+            pos = start
+            while pos < length:
+                node = node.get(lower_text[pos])
+                if node is None:
+                    break
+                pos += 1
+                term = node.get(_END)
+                if term is not None and (pos == length or not _is_word_char(lower_text[pos])):
+                    matches.setdefault(term, []).append(start)
+        return matches
+
+    def count_matches(self, text: str) -> dict:
+        """Returns {term: number of occurrences}."""
+        return {term: len(offsets) for term, offsets in self.find_matches(text).items()}
+
+    def extract_items(self, text: str) -> dict:
+        """
+        Returns {label: sorted list of title-cased terms found}, the same shape
+        extract_items_from_library returns for a single library.
+        """
+        found = {label: set() for label in self._labels}
+        for term in self.find_matches(text):
+            for label in self._term_labels[term]:
+                found[label].add(term.title())
+        return {label: sorted(items) for label, items in found.items()}
+
+
+# Matchers built for plain library lists, keyed by the list's id().
+# The list itself is kept in the entry so a recycled id() is never mistaken for a hit.
+_LIBRARY_MATCHERS = {}
+
+
+def matcher_for_library(library: list) -> SkillMatcher:
+    """Returns a (cached) single-library matcher for the given list of terms."""
+    entry = _LIBRARY_MATCHERS.get(id(library))
+    if entry is None or entry[0] is not library:
+        entry = (library, SkillMatcher({'items': library}))
+        _LIBRARY_MATCHERS[id(library)] = entry
+    return entry[1]
@@ -0,0 +1,233 @@
+import argparse
+import hashlib
+import json
+import os
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+import bedrock_lambda
+from pipeline_harness import synthetic_resume
+from text_extraction import EXTRACTION_PRESET, LAPARAMS_PRESETS, clean_text, extract_pdf
+
+# Micro-benchmarks for the CPU-bound extraction stages, on a generated resume corpus:
+#
+#   python stage_benchmark.py --output baseline.json
+#   python stage_benchmark.py --compare baseline.json            # exits 1 on a regression
+#   python stage_benchmark.py --stages pdfminer:fast,extract_contact_info --repeats 9
+#
+# The corpus is rebuilt from --seed on every run, so two runs with the same seed and sizes
+# time the same documents. Every stage runs each document --repeats times after a warm-up
+# call; a run loops over the document until it takes MIN_SAMPLE_SECONDS, so microsecond
+# stages are not lost in timer noise, and the fastest run is the document's time. msPerMB is
+# the time over the whole corpus per MB of input (PDF bytes for PDF stages, extracted text
+# for text stages); it weighs every document, so compare mode uses it rather than the
+# per-document median, which jumps between resume lengths. Peak memory is traced in a
+# separate pass, because tracemalloc slows the timed code down. outputDigest hashes the
+# stage's results over the corpus: if it changes, the change altered what the stage
+# extracts, not just how fast it does it.
+
+EXPS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), '..', 'exps')
+
+DEFAULT_SEED = 1234
+# Pages per generated resume; --documents resumes of each length.
+CORPUS_PAGES = (1, 2, 4, 8)
+DEFAULT_DOCUMENTS = 5
+DEFAULT_REPEATS = 5
+MIN_SAMPLE_SECONDS = 0.02
+# Compare mode flags a stage whose time per MB or peak memory grew by more than the
+# threshold, and by more than the floor (tiny stages are dominated by timer noise). Record
+# the baseline on the machine the comparison runs on.
+DEFAULT_THRESHOLD = 0.10
+MIN_REGRESSION_MS_PER_MB = 1.0
+MIN_REGRESSION_KB = 16
+
+
+def build_corpus(seed: int = DEFAULT_SEED, documents: int = DEFAULT_DOCUMENTS, page_counts=CORPUS_PAGES) -> list:
+    """Generated resume PDFs with their extracted text, the same for the same arguments."""
+    rng = random.Random(seed)
+    corpus = []
+    for pages in page_counts:
+        for number in range(documents):
+            pdf_bytes = synthetic_resume(rng, pages)
+            text = clean_text(extract_pdf(pdf_bytes, EXTRACTION_PRESET)[0])
+            corpus.append({'name': f"{pages}p-{number}", 'pages': pages, 'pdf': pdf_bytes, 'text': text})
+    return corpus
+
+
+def _exps_stages() -> dict:
+    # exps/ is not part of the Lambda package; its stages are benchmarked when it is next to it.
+    if not os.path.isdir(EXPS_DIR):
+        return {}
+    sys.path.insert(0, EXPS_DIR)
+    from phone_extractor import extract_phone_number_from_text
+    from temp import EnhancedResumeAnalyzer
+    analyzer = EnhancedResumeAnalyzer()
+    return {
+        'exps.extract_phone_number_from_text': ('text', extract_phone_number_from_text),
+        'exps.extract_skills_with_regex': ('text', analyzer.extract_skills_with_regex),
+    }
+
+
+def benchmark_stages() -> dict:
+    """Stage name -> (input, function); input is 'pdf' (PDF bytes) or 'text' (extracted text)."""
+    stages = {f"pdfminer:{preset}": ('pdf', lambda pdf_bytes, preset=preset: extract_pdf(pdf_bytes, preset)[0])
+              for preset in LAPARAMS_PRESETS}
+    stages.update({
+        'extract_contact_info': ('text', bedrock_lambda.extract_contact_info),
+        'extract_items_from_library': ('text', lambda text: bedrock_lambda.extract_items_from_library(
+            text, bedrock_lambda.TECHNICAL_SKILLS_LIBRARY)),
+        'LIBRARY_MATCHER.extract_items': ('text', bedrock_lambda.LIBRARY_MATCHER.extract_items),
+    })
+    stages.update(_exps_stages())
+    return stages
+
+
+def _median(values: list) -> float:
+    ordered = sorted(values)
+    return ordered[len(ordered) // 2]
+
+
+def _input_bytes(document: dict, kind: str) -> int:
+    return len(document['pdf']) if kind == 'pdf' else len(document['text'].encode('utf-8'))
+
+
+def run_stage(function, kind: str, corpus: list, repeats: int = DEFAULT_REPEATS) -> dict:
+    per_document, by_pages, outputs, input_bytes = [], {}, [], 0
+    for document in corpus:
+        argument = document[kind]
+        started = time.perf_counter()
+        outputs.append(function(argument))  # warm-up: caches, lazily compiled regexes
+        loops = max(1, int(MIN_SAMPLE_SECONDS / max(time.perf_counter() - started, 1e-6)))
+        runs = []
+        for _ in range(repeats):
+            started = time.perf_counter()
+            for _ in range(loops):
+                function(argument)
+            runs.append((time.perf_counter() - started) / loops)
+        seconds = min(runs)
+        per_document.append(seconds)
+        by_pages.setdefault(document['pages'], []).append(seconds)
+        input_bytes += _input_bytes(document, kind)
+
+    peaks = []
+    for document in corpus:
+        tracemalloc.start()
+        function(document[kind])
+        peaks.append(tracemalloc.get_traced_memory()[1])
+        tracemalloc.stop()
+
+    total_seconds = sum(per_document)
+    return {
+        'input': kind,
+        'documents': len(corpus),
+        'medianMsPerDoc': round(_median(per_document) * 1000, 3),
+        'maxMsPerDoc': round(max(per_document) * 1000, 3),
+        'msPerMB': round(total_seconds * 1000 / (input_bytes / 1024 ** 2), 1) if input_bytes else 0.0,
+        'medianMsByPages': {str(pages): round(_median(times) * 1000, 3) for pages, times in sorted(by_pages.items())},
+        'peakKB': round(max(peaks) / 1024, 1),
+        'meanPeakKB': round(sum(peaks) / len(peaks) / 1024, 1),
+        'outputDigest': hashlib.sha256(json.dumps(outputs, sort_keys=True, default=repr).encode('utf-8')).hexdigest()[:16],
+    }
+
+
+def run_benchmarks(stage_names=None, seed: int = DEFAULT_SEED, documents: int = DEFAULT_DOCUMENTS,
+                   repeats: int = DEFAULT_REPEATS) -> dict:
+    stages = benchmark_stages()
+    unknown = set(stage_names or []) - set(stages)
+    if unknown:
+        raise ValueError(f"Unknown stage(s): {', '.join(sorted(unknown))}. Known: {', '.join(stages)}")
+
+    corpus = build_corpus(seed, documents)
+    results = {}
+    for name, (kind, function) in stages.items():
+        if stage_names and name not in stage_names:
+            continue
+        results[name] = run_stage(function, kind, corpus, repeats)
+        print(f"{name:>36}: {results[name]['medianMsPerDoc']:>9.3f} ms/doc  {results[name]['msPerMB']:>9.1f} ms/MB  "
+              f"{results[name]['peakKB']:>8.1f} KB peak", file=sys.stderr)
+    return {
+        'environment': {'python': platform.python_version(), 'implementation': platform.python_implementation(),
+                        'machine': platform.machine(), 'cpus': os.cpu_count()},
+        'corpus': {'seed': seed, 'pagesPerDocument': list(CORPUS_PAGES), 'documentsPerLength': documents,
+                   'documents': len(corpus), 'pdfBytes': sum(len(document['pdf']) for document in corpus),
+                   'textBytes': sum(len(document['text'].encode('utf-8')) for document in corpus)},
+        'repeats': repeats,
+        'stages': results,
+    }
+
+
+def compare_reports(baseline: dict, current: dict, threshold: float = DEFAULT_THRESHOLD) -> list:
+    """
+    Returns one finding per stage present in both reports: status 'regression' (slower or
+    bigger beyond the threshold), 'improvement', 'unchanged' or 'changed-output'.
+    """
+    findings = []
+    if baseline.get('corpus', {}).get('seed') != current['corpus']['seed']:
+        print("⚠️ The baseline was recorded with another seed; the corpora differ.", file=sys.stderr)
+    for name, result in current['stages'].items():
+        before = baseline.get('stages', {}).get(name)
+        if before is None:
+            continue
+        time_delta = result['msPerMB'] - before['msPerMB']
+        memory_delta = result['peakKB'] - before['peakKB']
+        time_ratio = time_delta / before['msPerMB'] if before['msPerMB'] else 0.0
+        memory_ratio = memory_delta / before['peakKB'] if before['peakKB'] else 0.0
+
+        reasons = []
+        if time_ratio > threshold and time_delta > MIN_REGRESSION_MS_PER_MB:
+            reasons.append(f"{before['msPerMB']} -> {result['msPerMB']} ms/MB ({time_ratio:+.0%})")
+        if memory_ratio > threshold and memory_delta > MIN_REGRESSION_KB:
+            reasons.append(f"{before['peakKB']} -> {result['peakKB']} KB peak ({memory_ratio:+.0%})")
+        if reasons:
+            status = 'regression'
+        elif time_ratio < -threshold and -time_delta > MIN_REGRESSION_MS_PER_MB:
+            status = 'improvement'
+            reasons.append(f"{before['msPerMB']} -> {result['msPerMB']} ms/MB ({time_ratio:+.0%})")
+        else:
+            status = 'unchanged'
+        if before.get('outputDigest') != result['outputDigest']:
+            # Reported next to the timing finding: a faster stage that extracts something else
+            # is not an improvement.
+            reasons.append("output differs from the baseline")
+            if status == 'unchanged':
+                status = 'changed-output'
+        findings.append({'stage': name, 'status': status, 'timeRatio': round(time_ratio, 3),
+                         'memoryRatio': round(memory_ratio, 3), 'reasons': reasons})
+    return findings
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the CPU-bound resume extraction stages.")
+    parser.add_argument('--output', help="write the JSON report here (default: stdout)")
+    parser.add_argument('--compare', metavar='BASELINE', help="compare against a stored report; exit 1 on a regression")
+    parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD, help="relative slowdown that counts as a regression")
+    parser.add_argument('--stages', help="comma-separated stage names (default: all)")
+    parser.add_argument('--seed', type=int, default=DEFAULT_SEED)
+    parser.add_argument('--documents', type=int, default=DEFAULT_DOCUMENTS, help="resumes per page count")
+    parser.add_argument('--repeats', type=int, default=DEFAULT_REPEATS, help="timed runs per document")
+    arguments = parser.parse_args()
+
+    stage_names = arguments.stages.split(',') if arguments.stages else None
+    report = run_benchmarks(stage_names, arguments.seed, arguments.documents, arguments.repeats)
+    if arguments.output:
+        with open(arguments.output, 'w', encoding='utf-8') as output:
+            json.dump(report, output, indent=2)
+    elif not arguments.compare:
+        print(json.dumps(report, indent=2))
+
+    if arguments.compare:
+        with open(arguments.compare, encoding='utf-8') as baseline_file:
+            findings = compare_reports(json.load(baseline_file), report, arguments.threshold)
+        marks = {'regression': '❌', 'improvement': '✅', 'unchanged': '  ', 'changed-output': '⚠️'}
+        for finding in findings:
+            print(f"{marks[finding['status']]} {finding['stage']}: {finding['status']}"
+                  + (f" ({'; '.join(finding['reasons'])})" if finding['reasons'] else ''))
+        if any(finding['status'] == 'regression' for finding in findings):
+            sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,40 @@
+import io
+import json
+import os
+import sys
+import unittest
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+import json_stream  # noqa: E402
+
+# Peak RSS allowed for the streaming pass over 1M records, interpreter included. At 10k
+# records the same pass peaks around 21 MB; the write buffer (PART_SIZE) is most of the rest.
+RSS_CEILING_MB = 64
+
+
+class StreamingMemoryTest(unittest.TestCase):
+
+    def test_streaming_pass_over_1m_records_stays_under_the_ceiling(self):
+        result = json_stream.check_memory(1_000_000)
+        self.assertEqual(result['records'], 1_000_000)
+        self.assertLess(result['peakRssMB'], RSS_CEILING_MB)
+
+
+class RoundTripTest(unittest.TestCase):
+
+    def test_writer_output_reads_back_item_by_item(self):
+        items = [{'candidateId': f"id-{index}", 'score': -index / 7, 'name': 'José'} for index in range(200)]
+        for indent in (None, 4):
+            buffer = io.BytesIO()
+            json_stream.FileJSONArrayWriter(buffer, indent=indent, part_size=100).write_all(items).close()
+            self.assertEqual(json.loads(buffer.getvalue()), items)
+            self.assertEqual(list(json_stream.iter_array(io.BytesIO(buffer.getvalue()), chunk_size=7)), items)
+
+    def test_writer_needs_a_destination(self):
+        with self.assertRaises(TypeError):
+            json_stream.JSONArrayWriter()
+
+
+if __name__ == '__main__':
+    unittest.main()
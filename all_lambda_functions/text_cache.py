@@ -0,0 +1,90 @@
+import hashlib
+import os
+import re
+
+from botocore.exceptions import ClientError
+
+# Extracted text is cached in the destination bucket under TEXT_CACHE_PREFIX, keyed by the
+# PDF's content digest, so a re-upload or a backfill of a file that was already extracted is
+# served with server-side copies instead of another pdfminer run. Cache objects don't end in
+# .txt, so writing them never triggers the next stage. Bump the version in the prefix when a
+# change to the extraction makes old entries wrong.
+TEXT_CACHE_ENABLED = os.environ.get('TEXT_CACHE_ENABLED', 'true').lower() == 'true'
+TEXT_CACHE_PREFIX = os.environ.get('TEXT_CACHE_PREFIX', 'extraction-cache/v1/')
+
+CACHE_STATS = {'hits': 0, 'misses': 0}
+
+# The ETag of a single-part upload without SSE-KMS is the MD5 of the content.
+_MD5_ETAG = re.compile(r'^[0-9a-f]{32}$')
+
+
+def content_digest(s3_object: dict, pdf_bytes: bytes = None) -> str:
+    """
+    Returns 'md5-<etag>' when the object's ETag is a plain MD5, so no hashing is needed (and
+    the body needn't even be read on a hit); otherwise 'sha256-<hex>' of pdf_bytes, or None
+    when the bytes haven't been read yet.
+    """
+    etag = s3_object.get('ETag', '').strip('"')
+    if _MD5_ETAG.match(etag) and s3_object.get('ServerSideEncryption') != 'aws:kms':
+        return f"md5-{etag}"
+    if pdf_bytes is None:
+        return None
+    return f"sha256-{hashlib.sha256(pdf_bytes).hexdigest()}"
+
+
+def cache_key(digest: str, preset: str, max_pages: int) -> str:
+    # The preset and the truncation limit both change the text, so they are part of the key.
+    return f"{TEXT_CACHE_PREFIX}{digest}/{preset}-max{max_pages}"
+
+
+def _copy(s3, bucket: str, source_key: str, target_key: str, metadata: dict = None) -> bool:
+    """Server-side copy within the bucket. Returns False when the source doesn't exist."""
+    options = {'MetadataDirective': 'REPLACE', 'Metadata': metadata} if metadata is not None else {}
+    try:
+        s3.copy_object(Bucket=bucket, Key=target_key, CopySource={'Bucket': bucket, 'Key': source_key}, **options)
+        return True
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return False
+        raise
+
+
+def restore(s3, bucket: str, entry_key: str, output_key: str, layout_output_key: str = None,
+            metadata: dict = None) -> bool:
+    """
+    Copies a cached entry to the output keys: the layout document first (when asked for),
+    then the text, whose copy triggers the next stage like a fresh upload would.
+    Returns False, having written nothing that triggers anything, on a miss.
+    """
+    if layout_output_key and not _copy(s3, bucket, entry_key + '.layout.json', layout_output_key):
+        return False
+    return _copy(s3, bucket, entry_key + '.text', output_key, metadata or {})
+
+
+def load(s3, bucket: str, entry_key: str, with_layout: bool = True):
+    """Reads a cached entry: (text bytes, layout bytes or None), or None on a miss."""
+    try:
+        layout = s3.get_object(Bucket=bucket, Key=entry_key + '.layout.json')['Body'].read() if with_layout else None
+        text = s3.get_object(Bucket=bucket, Key=entry_key + '.text')['Body'].read()
+    except ClientError as e:
+        if e.response['Error']['Code'] in ('NoSuchKey', '404'):
+            return None
+        raise
+    return text, layout
+
+
+def store(s3, bucket: str, entry_key: str, text: bytes, layout: bytes = None, metadata: dict = None):
+    """Writes an entry after a miss. The text goes last, so an entry with text is always complete."""
+    if layout is not None:
+        s3.put_object(Bucket=bucket, Key=entry_key + '.layout.json', Body=layout, ContentType='application/json')
+    s3.put_object(Bucket=bucket, Key=entry_key + '.text', Body=text, ContentType='text/plain',
+                  Metadata=metadata or {})
+
+
+def record_lookup(hit: bool):
+    CACHE_STATS['hits' if hit else 'misses'] += 1
+
+
+def hit_rate() -> float:
+    lookups = CACHE_STATS['hits'] + CACHE_STATS['misses']
+    return round(CACHE_STATS['hits'] / lookups, 3) if lookups else 0.0
@@ -4,13 +4,17 @@ import datetime
 import requests
 import tempfile
 import json
+import csv
+import io
 
-from aws.config import bucket_name, output_bucket_name, json_extraction_bucket, json_dashboard_bucket, table_name, region, USE_DYNAMO,json_anonymous_bucket
+from aws.config import bucket_name, output_bucket_name, json_extraction_bucket, json_dashboard_bucket, table_name, region, USE_DYNAMO,json_anonymous_bucket, inference_cache_table_name, file_listing_ttl_seconds, candidate_index_refresh_seconds
 from aws.s3_utils import setup_s3_bucket
-from aws.dynamodb_utils import setup_dynamodb_table
+from aws.s3_listing import DEFAULT_PAGE_SIZE, ListingError, S3ListingCache, parse_date
+from aws.candidate_index import CandidateIndex, QueryError
+from aws.dynamodb_utils import setup_dynamodb_table, setup_inference_cache_table
 from aws.lambda_utils import create_lambda_function
 from aws.lambda_utils2 import create_lambda_function2
-from aws.lambda_utils3 import create_lambda_function3
+from aws.lambda_utils3 import create_lambda_function3, create_appender_queue_trigger, create_appender_compaction_schedule
 from aws.lambda_utils4 import create_lambda_function4
 from aws.lambda_utils5 import create_lambda_function5
 
@@ -22,6 +26,9 @@ session = boto3.session.Session()
 s3 = session.client('s3', region_name=region)
 dynamodb = session.client('dynamodb', region_name=region)
 dynamodb_resource = session.resource('dynamodb', region_name=region)
+# Shared by all requests, so concurrent page loads share one S3 listing per TTL.
+upload_listing = S3ListingCache(s3, bucket_name, file_listing_ttl_seconds)
+candidate_index = CandidateIndex(s3, json_dashboard_bucket, 'candidates.json', candidate_index_refresh_seconds)
 
 # Setup resources
 setup_s3_bucket(s3, bucket_name, region)
@@ -33,6 +40,7 @@ setup_s3_bucket(s3, json_anonymous_bucket, region)
 
 if USE_DYNAMO:
     table = setup_dynamodb_table(dynamodb, dynamodb_resource, table_name)
+    setup_inference_cache_table(dynamodb, dynamodb_resource, inference_cache_table_name)
 
 # Auto-create Lambda function on startup
 try:
@@ -53,6 +61,12 @@ try:
 except Exception as e:
     print("Failed to create Lambda function at startup:", e)
 
+try:
+    schedule_result = create_appender_compaction_schedule()
+    print("Appender schedule setup result:", schedule_result)
+except Exception as e:
+    print("Failed to create the appender schedule at startup:", e)
+
 try:
     lambda_creation_result4 = create_lambda_function4()
     print("Lambda setup result:", lambda_creation_result4)
@@ -116,6 +130,16 @@ def trigger_lambda_creation3():
     result = create_lambda_function3()
     return jsonify(result)
 
+@app.route('/create-appender-queue', methods=['GET'])
+def trigger_appender_queue_creation():
+    result = create_appender_queue_trigger()
+    return jsonify(result)
+
+@app.route('/create-appender-schedule', methods=['GET'])
+def trigger_appender_schedule_creation():
+    result = create_appender_compaction_schedule()
+    return jsonify(result)
+
 @app.route('/create-lambda4', methods=['GET'])
 def trigger_lambda_creation4():
     result = create_lambda_function4()
@@ -161,22 +185,76 @@ def candidate_pdfs():
 
 @app.route('/list-files')
 def list_files():
+    # ?sort=last_modified|name|size&order=desc|asc&limit=50&cursor=...&prefix=...&since=2024-01-01&until=2024-12-31
     try:
-        response = s3.list_objects_v2(Bucket=bucket_name)
-        files = []
-
-        for obj in response.get('Contents', []):
-            files.append({
-                'name': obj['Key'],
-                'size': round(obj['Size'] / 1024, 2),
-                'last_modified': obj['LastModified'].strftime('%Y-%m-%d %H:%M:%S'),
-                'url': f'https://{bucket_name}.s3.amazonaws.com/{obj["Key"]}'
-            })
-
-        return jsonify(files)
+        page = upload_listing.page(
+            sort=request.args.get('sort', 'last_modified'),
+            order=request.args.get('order', 'desc'),
+            limit=request.args.get('limit', DEFAULT_PAGE_SIZE, type=int),
+            cursor=request.args.get('cursor'),
+            prefix=request.args.get('prefix'),
+            since=parse_date(request.args.get('since')),
+            until=parse_date(request.args.get('until'), end_of_day=True),
+        )
+        return jsonify(page)
+    except ListingError as e:
+        return jsonify({'error': str(e)}), 400
     except Exception as e:
         return jsonify({'error': str(e)}), 500
     
+def candidate_query_args():
+    postgrad = request.args.get('postgrad', '').lower()
+    if postgrad not in ('', 'true', 'false', '1', '0'):
+        raise QueryError("postgrad must be true or false.")
+    return {
+        'q': request.args.get('q'),
+        'skills': request.args.getlist('skill'),
+        'languages': request.args.getlist('language'),
+        'postgrad': None if postgrad == '' else postgrad in ('true', '1'),
+        'expression': request.args.get('expr'),
+        'sort': request.args.get('sort', 'uploadDate'),
+        'order': request.args.get('order', 'desc'),
+    }
+
+
+@app.route('/api/candidates')
+def api_candidates():
+    # ?q=python+aws&skill=docker&language=english&postgrad=true&sort=name&order=asc&offset=0&limit=20
+    # &expr=python AND (aws OR gcp) AND NOT php&facets=skill,language&facet_limit=10
+    try:
+        facets = [field for field in request.args.get('facets', '').split(',') if field]
+        result = candidate_index.query(offset=request.args.get('offset', 0, type=int),
+                                       limit=request.args.get('limit', 20, type=int), facets=facets,
+                                       facet_limit=request.args.get('facet_limit', 20, type=int), **candidate_query_args())
+        return jsonify(result)
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    except Exception as e:
+        return jsonify({'error': str(e)}), 500
+
+
+@app.route('/api/candidates/export')
+def export_candidates():
+    # Every candidate matching the same filters as /api/candidates, as CSV.
+    try:
+        result = candidate_index.query(limit=None, **candidate_query_args())
+    except QueryError as e:
+        return jsonify({'error': str(e)}), 400
+    output = io.StringIO()
+    writer = csv.writer(output)
+    writer.writerow(['ID', 'Name', 'Email', 'Upload Date', 'Experience Summary', 'Skills', 'Languages'])
+    for c in result['candidates']:
+        skills = c.get('skills') or {}
+        languages = c.get('languages')
+        writer.writerow([c.get('candidateId'), c.get('name'), c.get('email') or 'N/A', c.get('uploadDate') or 'N/A',
+                         c.get('experienceSummary') or '',
+                         '; '.join(list(skills.get('technical') or []) + list(skills.get('nonTechnical') or [])),
+                         '; '.join(languages) if isinstance(languages, list) else (languages or 'N/A')])
+    filename = f"candidates_{datetime.date.today().isoformat()}.csv"
+    return app.response_class(output.getvalue(), mimetype='text/csv',
+                              headers={'Content-Disposition': f'attachment; filename={filename}'})
+
+
 @app.route('/download-anonymized-json')
 def download_anonymized_json():
     # Initialize S3 client
@@ -0,0 +1,473 @@
+import bisect
+import itertools
+import json
+import os
+import re
+import sys
+import threading
+import time
+
+from botocore.exceptions import ClientError
+
+from aws.skill_index import FIELDS, ExpressionError, SkillIndex, bitmap_of, normalize, ordinals_of
+
+# The candidate log's layout and merge rules live with the appender that writes it.
+sys.path.append(os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), 'all_lambda_functions'))
+import candidate_log  # noqa: E402
+
+# In-process index of the candidates for /api/candidates, so the dashboard asks the server
+# for one page of candidates instead of downloading the whole file.
+#
+# The candidates are the appender's candidate log (all_lambda_functions/candidate_log.py):
+# the snapshot named by its manifest plus the tail segments written since, so a new
+# candidate shows up at the next refresh rather than at the next compaction. Before the
+# first compaction, and in the appender's rewrite mode, candidates.json is the snapshot.
+# At most once per refresh interval the manifest (or candidates.json) is fetched with
+# IfNoneMatch on its ETag and the tail is listed; an unchanged view costs a 304 and one
+# listing, and nothing is re-indexed. Snapshots and segments are immutable, so each is
+# read once. When only new tail segments showed up, just their records are looked at;
+# when the snapshot changed (a compaction, or candidates.json rewritten), every record is
+# compared with the one indexed. Either way only the candidates whose record changed are
+# re-indexed, the others keep their entries, and the cached sort orders are patched
+# rather than re-sorted. Requests never wait for a refresh, except the first one.
+#
+# Index: candidateId -> record, a SkillIndex (skill, language, postgrad flag -> candidates,
+# see skill_index.py) for filters, boolean skill expressions and facets, and a sorted word
+# list for the text search, which matches every query word as a prefix of a word in the
+# name, email, skills or experience summary. Candidates are numbered with ordinals for the
+# SkillIndex bitmaps; a candidate keeps its ordinal while the process runs.
+
+SORT_FIELDS = ('uploadDate', 'name', 'email', 'experienceSummary')
+DEFAULT_PAGE_SIZE = 20
+MAX_PAGE_SIZE = 200
+WORD_PATTERN = re.compile(r'[\w.+#@-]+')
+# Up to this many changed candidates are moved into place in the cached sort orders and the
+# word list one by one; more than that and they are sorted again.
+PATCH_LIMIT = 256
+# Spacing of the ranks in a freshly sorted order, so a candidate moved into it can take a
+# rank between its neighbours' without renumbering the others.
+RANK_GAP = 1 << 32
+
+
+class QueryError(ValueError):
+    """Bad query parameters; reported to the client as a 400."""
+
+
+def _skills(record: dict) -> list:
+    skills = record.get('skills') or {}
+    return list(skills.get('technical') or []) + list(skills.get('nonTechnical') or [])
+
+
+def _languages(record: dict) -> list:
+    languages = record.get('languages')
+    return languages if isinstance(languages, list) else []
+
+
+def _is_postgraduate(record: dict) -> bool:
+    value = record.get('isPostGraduate')
+    return value in (1, True) or str(value).lower() in ('1', 'true', 'yes')
+
+
+def _words(record: dict) -> set:
+    text = ' '.join([str(record.get('name') or ''), str(record.get('email') or ''),
+                     str(record.get('experienceSummary') or ''), ' '.join(_skills(record))])
+    return {word.strip('.-') for word in WORD_PATTERN.findall(text.lower())} - {''}
+
+
+class _Entry:
+    """What the index holds for one candidate."""
+    __slots__ = ('record', 'skills', 'languages', 'postgraduate', 'words', 'is_error')
+
+    def __init__(self, record: dict):
+        self.record = record
+        self.skills = {normalize('skill', skill) for skill in _skills(record)}
+        self.languages = {normalize('language', language) for language in _languages(record)}
+        self.postgraduate = _is_postgraduate(record)
+        self.words = _words(record)
+        self.is_error = 'error' in str(record.get('name') or '').lower()
+
+    def values(self) -> dict:
+        return {'skill': self.skills, 'language': self.languages, 'postgrad': {'true' if self.postgraduate else 'false'}}
+
+
+class CandidateIndex:
+
+    def __init__(self, s3, bucket: str, key: str = 'candidates.json', refresh_seconds: float = 15):
+        self.s3 = s3
+        self.bucket = bucket
+        self.key = key
+        self.refresh_seconds = refresh_seconds
+        self.etag = None  # of the file last used as the snapshot
+        self.manifest, self.manifest_etag = None, None
+        self.snapshot_id = None  # snapshot key, or ETag of the file
+        self.snapshot_records = []
+        self.segments = {}  # tail segment key -> records
+        self.view = None  # (snapshot_id, tail segment keys) last indexed
+        self.loaded_at = 0.0
+        self.checked_at = 0.0
+        self.entries = {}
+        self.ordinals = {}  # candidateId -> ordinal
+        self.ids = []  # ordinal -> candidateId
+        self.skill_index = SkillIndex()
+        self.vocabulary = {}  # word -> ordinals
+        self._sorted_words = []
+        # (sort field, order) -> (ordinals, ordinal -> rank, count with a value), empty values last;
+        # ranks increase along the ordinals but are not their positions.
+        self._orders = {}
+        self.error_count = 0
+        self.version = 0
+        self.stats = {'checks': 0, 'notModified': 0, 'reloads': 0, 'reindexed': 0, 'removed': 0}
+        self._lock = threading.Lock()  # guards the index structures
+        self._refresh_lock = threading.Lock()  # one refresh at a time
+
+    # --- loading ---
+
+    def _get(self, key: str, etag: str = None):
+        """The object, or None when it still has etag. Missing objects raise ClientError."""
+        arguments = {'Bucket': self.bucket, 'Key': key}
+        if etag:
+            arguments['IfNoneMatch'] = etag
+        try:
+            return self.s3.get_object(**arguments)
+        except ClientError as e:
+            if e.response['Error']['Code'] in ('304', 'NotModified'):
+                return None
+            raise
+
+    @staticmethod
+    def _is_missing(error: ClientError) -> bool:
+        return error.response['Error']['Code'] in ('NoSuchKey', '404')
+
+    def _read_records(self, response) -> list:
+        records = json.loads(response['Body'].read())
+        if not isinstance(records, list):
+            raise ValueError(f"A candidates snapshot in s3://{self.bucket} is not a JSON array.")
+        return records
+
+    def _load_snapshot(self) -> str:
+        """Brings the snapshot up to date; returns the watermark its tail starts after."""
+        try:
+            response = self._get(candidate_log.MANIFEST_KEY, self.manifest_etag)
+            if response is not None:
+                self.manifest = json.loads(response['Body'].read())
+                self.manifest_etag = response.get('ETag')
+        except ClientError as e:
+            if not self._is_missing(e):
+                raise
+            self.manifest, self.manifest_etag = None, None
+
+        if self.manifest and self.manifest.get('snapshotKey'):
+            key = self.manifest['snapshotKey']
+            if key != self.snapshot_id:
+                self.snapshot_records, self.snapshot_id = self._read_records(self._get(key)), key
+            return self.manifest['watermark']
+
+        # Nothing compacted yet, or the appender rewrites candidates.json itself.
+        try:
+            response = self._get(self.key, self.etag)
+            if response is not None:
+                self.snapshot_records, self.etag = self._read_records(response), response.get('ETag')
+        except ClientError as e:
+            if not self._is_missing(e):
+                raise
+            self.snapshot_records, self.etag = [], None  # nothing appended yet
+        self.snapshot_id = self.etag
+        return ''
+
+    def _fetch(self):
+        """
+        (records, view, complete) for the log's current view, or None when it is the view we
+        indexed. When the snapshot is the indexed one and segments were only added after the
+        indexed ones, records are just the new segments' (complete False); otherwise they are
+        every record of the view, later ones replacing earlier ones with the same candidateId.
+        """
+        for attempt in range(3):
+            try:
+                watermark = self._load_snapshot()
+                tail = [segment['Key'] for segment in candidate_log.list_tail_segments(self.s3, self.bucket, watermark)]
+                view = (self.snapshot_id, tuple(tail))
+                if view == self.view:
+                    return None
+                for key in tail:
+                    if key not in self.segments:
+                        self.segments[key] = candidate_log.read_segment(self.s3, self.bucket, key)
+                break
+            except ClientError as e:
+                # A compaction removed the snapshot or a segment meanwhile; read the new manifest.
+                if not self._is_missing(e) or attempt == 2:
+                    raise
+                self.manifest_etag = None
+        self.segments = {key: self.segments[key] for key in tail}
+        if self.view and self.view[0] == self.snapshot_id and view[1][:len(self.view[1])] == self.view[1]:
+            # Segments only append or replace candidates, so nothing else can have changed.
+            return [record for key in tail[len(self.view[1]):] for record in self.segments[key]], view, False
+        return itertools.chain(self.snapshot_records, *(self.segments[key] for key in tail)), view, True
+
+    def _add(self, candidate_id: str, entry: _Entry, words: list):
+        ordinal = self.ordinals[candidate_id]
+        self.entries[candidate_id] = entry
+        self.error_count += entry.is_error
+        self.skill_index.add(ordinal, entry.values())
+        for word in entry.words:
+            ordinals = self.vocabulary.get(word)
+            if ordinals is None:
+                ordinals = self.vocabulary[word] = set()
+                words.append(word)
+            ordinals.add(ordinal)
+
+    def _remove(self, candidate_id: str, words: list):
+        entry, ordinal = self.entries.pop(candidate_id), self.ordinals[candidate_id]
+        self.error_count -= entry.is_error
+        self.skill_index.remove(ordinal, entry.values())
+        for word in entry.words:
+            self.vocabulary[word].discard(ordinal)
+            if not self.vocabulary[word]:
+                del self.vocabulary[word]
+                words.append(word)
+
+    def _apply(self, records, view: tuple, complete: bool):
+        fresh = {}
+        for record in records:
+            if isinstance(record, dict) and record.get('candidateId'):
+                fresh[str(record['candidateId'])] = record  # later records win, as in the merge
+
+        # Only the refresh thread changes the entries, so the diff and the new entries are
+        # worked out without blocking queries; the lock is held to swap them in and to move
+        # the few changed candidates into place in the sort orders. Many changes are sorted
+        # again before taking the lock.
+        removed = [candidate_id for candidate_id in self.entries if candidate_id not in fresh] if complete else []
+        changed = {}
+        for candidate_id, record in fresh.items():
+            current = self.entries.get(candidate_id)
+            if current is None or current.record != record:
+                changed[candidate_id] = _Entry(record)
+        for candidate_id in changed:
+            if candidate_id not in self.ordinals:
+                # No bitmap or order holds the new ordinal until the entries are swapped in.
+                self.ordinals[candidate_id] = len(self.ids)
+                self.ids.append(candidate_id)
+        orders = None
+        if len(changed) + len(removed) > PATCH_LIMIT:
+            with self._lock:
+                sorts = list(self._orders)
+            entries = dict(self.entries)
+            for candidate_id in removed:
+                del entries[candidate_id]
+            entries.update(changed)
+            orders = {(sort, order): self._sorted_order(sort, order, entries) for sort, order in sorts}
+
+        with self._lock:
+            words = []
+            for candidate_id in removed:
+                self._remove(candidate_id, words)
+            for candidate_id, entry in changed.items():
+                if candidate_id in self.entries:
+                    self._remove(candidate_id, words)
+                self._add(candidate_id, entry, words)
+            if removed or changed:
+                self._update_sorted_words(words)
+                if orders is None:
+                    for sort, order in self._orders:
+                        self._orders[sort, order] = self._patch_order(sort, order, changed, removed)
+                else:
+                    self._orders = orders
+                self.version += 1
+            self.view, self.loaded_at = view, time.time()
+            self.stats['reloads'] += 1
+            self.stats['reindexed'] += len(changed)
+            self.stats['removed'] += len(removed)
+
+    def refresh(self):
+        """Re-reads the candidates if the log changed. Other requests keep using the current index meanwhile."""
+        with self._refresh_lock:
+            self.checked_at = time.time()
+            self.stats['checks'] += 1
+            fetched = self._fetch()
+            if fetched is None:
+                self.stats['notModified'] += 1
+                return
+            self._apply(*fetched)
+
+    def _refresh_in_background(self):
+        try:
+            self.refresh()
+        except Exception as e:
+            print(f"⚠️ Refreshing the candidate index from s3://{self.bucket} failed: {e}")
+
+    def ensure_fresh(self):
+        if not self.loaded_at:
+            self.refresh()  # the first request waits for the initial load
+        elif time.time() - self.checked_at > self.refresh_seconds and not self._refresh_lock.locked():
+            self.checked_at = time.time()
+            threading.Thread(target=self._refresh_in_background, daemon=True).start()
+
+    # --- sort orders ---
+
+    @staticmethod
+    def _sort_key(sort: str, candidate_id: str, entry: _Entry) -> tuple:
+        value = entry.record.get(sort)
+        return (str(value) if sort == 'uploadDate' else str(value).lower()) if value else '', candidate_id
+
+    def _sorted_order(self, sort: str, order: str, entries: dict) -> tuple:
+        filled = sorted((candidate_id for candidate_id, entry in entries.items() if entry.record.get(sort)),
+                        key=lambda candidate_id: self._sort_key(sort, candidate_id, entries[candidate_id]),
+                        reverse=order == 'desc')
+        empty = sorted(candidate_id for candidate_id, entry in entries.items() if not entry.record.get(sort))
+        # Candidates without a value come last in both directions.
+        ranked = [self.ordinals[candidate_id] for candidate_id in filled + empty]
+        return ranked, dict(zip(ranked, range(0, len(ranked) * RANK_GAP, RANK_GAP))), len(filled)
+
+    def _patch_order(self, sort: str, order: str, changed: dict, removed: list) -> tuple:
+        """Moves the changed candidates into place in a cached order and drops the removed ones."""
+        ranked, rank, filled = self._orders[sort, order]
+        for candidate_id in itertools.chain(changed, removed):
+            ordinal = self.ordinals[candidate_id]
+            if ordinal in rank:
+                position = bisect.bisect_left(ranked, rank[ordinal], key=rank.__getitem__)
+                del ranked[position], rank[ordinal]
+                filled -= position < filled
+
+        crowded = False
+        for candidate_id, entry in changed.items():
+            key = self._sort_key(sort, candidate_id, entry)
+            # Binary search for the first candidate it goes before.
+            if key[0]:
+                low, high, descending = 0, filled, order == 'desc'
+                filled += 1
+            else:
+                low, high, descending = filled, len(ranked), False
+            while low < high:
+                middle = (low + high) // 2
+                other_id = self.ids[ranked[middle]]
+                other = self._sort_key(sort, other_id, self.entries[other_id])
+                if other > key if descending else other < key:
+                    low = middle + 1
+                else:
+                    high = middle
+            before = rank[ranked[low - 1]] if low else None
+            after = rank[ranked[low]] if low < len(ranked) else None
+            if before is None:
+                new_rank = 0 if after is None else after - RANK_GAP
+            elif after is None:
+                new_rank = before + RANK_GAP
+            else:
+                new_rank = (before + after) // 2
+                crowded = crowded or new_rank == before
+            ranked.insert(low, self.ordinals[candidate_id])
+            rank[self.ordinals[candidate_id]] = new_rank
+        if crowded:
+            # No rank was left between two neighbours; space them all out again.
+            rank.update(zip(ranked, range(0, len(ranked) * RANK_GAP, RANK_GAP)))
+        return ranked, rank, filled
+
+    def _update_sorted_words(self, words: list):
+        """Brings the sorted word list in line with the vocabulary; words were added or dropped from it."""
+        if len(words) > PATCH_LIMIT:
+            self._sorted_words = sorted(self.vocabulary)
+            return
+        for word in set(words):
+            position = bisect.bisect_left(self._sorted_words, word)
+            listed = position < len(self._sorted_words) and self._sorted_words[position] == word
+            if word in self.vocabulary and not listed:
+                self._sorted_words.insert(position, word)
+            elif word not in self.vocabulary and listed:
+                del self._sorted_words[position]
+
+    # --- querying ---
+
+    def _order(self, sort: str, order: str) -> tuple:
+        if (sort, order) not in self._orders:
+            self._orders[sort, order] = self._sorted_order(sort, order, self.entries)
+        return self._orders[sort, order]
+
+    def _matching_words(self, term: str) -> set:
+        ordinals = set()
+        start = bisect.bisect_left(self._sorted_words, term)
+        for word in self._sorted_words[start:]:
+            if not word.startswith(term):
+                break
+            ordinals |= self.vocabulary[word]
+        return ordinals
+
+    @staticmethod
+    def _ranked_page(ranked: list, rank: dict, bits: int, total: int, start: int, end):
+        """The ordinals in bits, in ranked order, from start to end."""
+        if total * 8 < len(ranked):
+            # Few matches: sort them by rank.
+            return sorted(ordinals_of(bits), key=rank.__getitem__)[start:end]
+        # Many matches: walk the ranked order until the page is full, testing bits byte-wise.
+        data = bits.to_bytes((bits.bit_length() + 7) // 8, 'little')
+        page, seen = [], 0
+        for ordinal in ranked:
+            byte = ordinal >> 3
+            if byte < len(data) and data[byte] >> (ordinal & 7) & 1:
+                if seen >= start:
+                    page.append(ordinal)
+                    if end is not None and len(page) == end - start:
+                        break
+                seen += 1
+        return page
+
+    def query(self, q: str = None, skills: list = None, languages: list = None, postgrad: bool = None,
+              expression: str = None, sort: str = 'uploadDate', order: str = 'desc', offset: int = 0,
+              limit: int = DEFAULT_PAGE_SIZE, facets: list = None, facet_limit: int = 20) -> dict:
+        """
+        Candidates with all the given skills and languages (case-insensitive, exact names),
+        the given postgrad flag, matching the boolean skill expression (see skill_index.py) and
+        with every word of q as a word prefix; sorted, one page of them (limit None: all of
+        them, for exports). facets names the fields to break the matches down by.
+        """
+        if sort not in SORT_FIELDS:
+            raise QueryError(f"sort must be one of {', '.join(SORT_FIELDS)}.")
+        if order not in ('asc', 'desc'):
+            raise QueryError("order must be asc or desc.")
+        unknown_fields = set(facets or []) - set(FIELDS)
+        if unknown_fields:
+            raise QueryError(f"facets must be among {', '.join(FIELDS)}.")
+        offset = max(0, int(offset))
+        limit = None if limit is None else max(1, min(int(limit), MAX_PAGE_SIZE))
+        self.ensure_fresh()
+
+        with self._lock:
+            index = self.skill_index
+            bits, unknown_terms = None, []  # None: no filter, every candidate
+
+            def narrow(matches):
+                nonlocal bits
+                bits = matches if bits is None else bits & matches
+
+            for skill in skills or []:
+                narrow(index.bitmap('skill', skill))
+            for language in languages or []:
+                narrow(index.bitmap('language', language))
+            if postgrad is not None:
+                narrow(index.bitmap('postgrad', 'true' if postgrad else 'false'))
+            if expression and expression.strip():
+                try:
+                    matches, unknown_terms = index.search(expression)
+                except ExpressionError as e:
+                    raise QueryError(f"Invalid skill expression: {e}")
+                narrow(matches)
+            for term in {word.strip('.-') for word in WORD_PATTERN.findall((q or '').lower())} - {''}:
+                narrow(bitmap_of(self._matching_words(term)))
+
+            ranked, rank, _ = self._order(sort, order)
+            end = None if limit is None else offset + limit
+            if bits is None:
+                total, page = len(ranked), ranked[offset:end]
+            else:
+                total = bits.bit_count()
+                page = self._ranked_page(ranked, rank, bits, total, offset, end)
+            result = {
+                'candidates': [self.entries[self.ids[ordinal]].record for ordinal in page],
+                'total': total,
+                'offset': offset,
+                'limit': limit,
+                'stats': {'totalUploads': len(self.entries), 'errors': self.error_count},
+                'version': self.version,
+            }
+            if expression:
+                result['unknownTerms'] = unknown_terms
+            if facets:
+                result['facets'] = index.facets(index.universe() if bits is None else bits, facets, facet_limit)
+            return result
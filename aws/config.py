@@ -5,10 +5,21 @@ json_dashboard_bucket= 'PLEASE SPECIFY THIS YOURSELF'
 LAMBDA_FUNCTION_NAME = 'PLEASE SPECIFY THIS YOURSELF'
 json_creation_lambda= 'PLEASE SPECIFY THIS YOURSELF'
 json_appender_lambda= 'PLEASE SPECIFY THIS YOURSELF'
+json_appender_queue = 'PLEASE SPECIFY THIS YOURSELF'
 json_anonymous_bucket = 'PLEASE SPECIFY THIS YOURSELF'
 json_data_anonymus_lambda ='PLEASE SPECIFY THIS YOURSELF'
+# Secrets Manager secret holding the anonymizer's HMAC key; the anonymizer won't run without it.
+pseudonymization_secret_id = 'PLEASE SPECIFY THIS YOURSELF'
 email_notifier_lambda = 'PLEASE SPECIFY THIS YOURSELF'
 layer_storage_bucket = 'PLEASE SPECIFY THIS YOURSELF'
 table_name = 'PLEASE SPECIFY THIS YOURSELF'
+inference_cache_table_name = 'PLEASE SPECIFY THIS YOURSELF'
 region = 'PLEASE SPECIFY THIS YOURSELF'
+# 'chained': one Lambda per stage, linked by S3 events. 'fused': the PDF Lambda runs
+# extraction, enrichment and the append itself (all_lambda_functions/fused_pipeline.py).
+pipeline_mode = 'chained'
+# Seconds the Candidates page serves a cached listing of the upload bucket before listing it again.
+file_listing_ttl_seconds = 30
+# Seconds between ETag checks of candidates.json by the dashboard's /api/candidates index.
+candidate_index_refresh_seconds = 15
 USE_DYNAMO = True
\ No newline at end of file
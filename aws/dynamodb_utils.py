@@ -15,3 +15,27 @@ def setup_dynamodb_table(dynamodb, dynamodb_resource, table_name):
         print(f"ℹ️ DynamoDB table '{table_name}' already exists.")
     
     return dynamodb_resource.Table(table_name)
+
+
+def setup_inference_cache_table(dynamodb, dynamodb_resource, table_name):
+    # Cache of parsed LLM fields keyed by resume content hash, see all_lambda_functions/inference_cache.py
+    existing_tables = dynamodb.list_tables()['TableNames']
+    if table_name not in existing_tables:
+        dynamodb.create_table(
+            TableName=table_name,
+            KeySchema=[{'AttributeName': 'cacheKey', 'KeyType': 'HASH'}],
+            AttributeDefinitions=[{'AttributeName': 'cacheKey', 'AttributeType': 'S'}],
+            BillingMode='PAY_PER_REQUEST'
+        )
+        print(f"⏳ Creating DynamoDB table '{table_name}'...")
+        waiter = dynamodb.get_waiter('table_exists')
+        waiter.wait(TableName=table_name)
+        dynamodb.update_time_to_live(
+            TableName=table_name,
+            TimeToLiveSpecification={'Enabled': True, 'AttributeName': 'expiresAt'}
+        )
+        print(f"✅ DynamoDB table '{table_name}' created with TTL on 'expiresAt'.")
+    else:
+        print(f"ℹ️ DynamoDB table '{table_name}' already exists.")
+
+    return dynamodb_resource.Table(table_name)
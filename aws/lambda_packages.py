@@ -0,0 +1,79 @@
+import ast
+import os
+import zipfile
+
+from aws.config import pipeline_mode
+
+# Builds the deployment zips from the handler sources.
+#
+# A handler imports shared modules from all_lambda_functions/ (candidate_log, json_stream,
+# resume_sections, ...) that must sit next to it in the zip. Each package starts from its
+# handler module and follows its imports: every imported module that has a .py file in one
+# of SOURCE_DIRS is added, and its imports are followed in turn. Anything else (boto3,
+# pdfminer, requests) comes from the runtime or a layer. create_lambda_function*() rebuild
+# their zip this way before uploading it; to build them all without deploying:
+#
+#   python -m aws.lambda_packages
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+SOURCE_DIRS = [os.path.join(ROOT, 'all_lambda_functions'), os.path.join(ROOT, 'issue_aws_comprehend')]
+# zip name -> handler module
+PACKAGES = {
+    'lambda_package.zip': 'fused_pipeline' if pipeline_mode == 'fused' else 'text_extraction',
+    'json_creation.zip': 'bedrock_lambda',
+    'json_appender.zip': 'json_appender_lambda',
+    'lambda_anonymous.zip': 'anonymous_lambda',
+    'ses_notification.zip': 'ses_lambda_function',
+    'comprehend_lambda.zip': 'comprehend_lambda_function',
+}
+
+
+def source_path(module: str):
+    for directory in SOURCE_DIRS:
+        path = os.path.join(directory, f"{module}.py")
+        if os.path.isfile(path):
+            return path
+    return None
+
+
+def imported_modules(path: str) -> set:
+    """Top-level names of the modules a source file imports, wherever in the file."""
+    with open(path, encoding='utf-8') as f:
+        tree = ast.parse(f.read(), filename=path)
+    names = set()
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names.update(alias.name.split('.')[0] for alias in node.names)
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.add(node.module.split('.')[0])
+    return names
+
+
+def module_set(handler: str) -> dict:
+    """module -> source path, for the handler and every local module it reaches."""
+    modules, pending = {}, [handler]
+    while pending:
+        module = pending.pop()
+        path = source_path(module)
+        if module in modules or path is None:
+            continue
+        modules[module] = path
+        pending.extend(imported_modules(path))
+    if handler not in modules:
+        raise FileNotFoundError(f"No source for handler module '{handler}' in {', '.join(SOURCE_DIRS)}.")
+    return modules
+
+
+def build_package(zip_name: str, handler: str = None) -> list:
+    """Writes zip_name (relative to the working directory, like ZIP_FILE_NAME) and returns the files it holds."""
+    modules = module_set(handler or PACKAGES[zip_name])
+    with zipfile.ZipFile(zip_name, 'w', zipfile.ZIP_DEFLATED) as package:
+        for module, path in sorted(modules.items()):
+            package.write(path, f"{module}.py")
+    return sorted(f"{module}.py" for module in modules)
+
+
+if __name__ == '__main__':
+    for zip_name, handler in PACKAGES.items():
+        files = build_package(zip_name, handler)
+        print(f"✅ {zip_name} ({handler}): {', '.join(files)}")
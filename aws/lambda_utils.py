@@ -2,7 +2,8 @@
 
 import boto3
 import json
-from aws.config import bucket_name, table_name, region,LAMBDA_FUNCTION_NAME
+from aws.config import bucket_name, table_name, region,LAMBDA_FUNCTION_NAME, pipeline_mode
+from aws.lambda_packages import build_package
 
 ZIP_FILE_NAME = 'lambda_package.zip'
 LAMBDA_ROLE_ARN = 'PLEASE SPECIFY THIS YOURSELF YOUR LAMBDA IAM ROLE'
@@ -11,6 +12,14 @@ ARCHITECTURE = 'x86_64'
 HANDLER = 'lambda_function.lambda_handler'
 LAMBDA_TIMEOUT = 60
 LAMBDA_MEMORY = 128
+if pipeline_mode == 'fused':
+    # The package then holds every stage's modules, and one invocation also waits on Bedrock.
+    HANDLER = 'fused_pipeline.lambda_handler'
+    LAMBDA_TIMEOUT = 120
+    LAMBDA_MEMORY = 1024
+# Parallel page-range extraction (text_extraction.PARALLEL_WORKERS) only pays off with more
+# than one vCPU, and Lambda gives one per 1769 MB; raise LAMBDA_MEMORY to raise this.
+PARALLEL_WORKERS = max(1, LAMBDA_MEMORY // 1769)
 
 # Layer ARNs
 LAYER_ARNs = [
@@ -22,6 +31,7 @@ def create_lambda_function():
     s3_client = boto3.client('s3', region_name=region)
 
     try:
+        build_package(ZIP_FILE_NAME)
         with open(ZIP_FILE_NAME, 'rb') as f:
             zipped_code = f.read()
 
@@ -36,7 +46,8 @@ def create_lambda_function():
             MemorySize=LAMBDA_MEMORY,
             Publish=True,
             Architectures=[ARCHITECTURE],
-            Layers=LAYER_ARNs
+            Layers=LAYER_ARNs,
+            Environment={'Variables': {'PARALLEL_WORKERS': str(PARALLEL_WORKERS)}}
         )
 
         print("✅ Lambda function created.")
@@ -3,6 +3,7 @@
 import boto3
 import json
 from aws.config import output_bucket_name, region,json_creation_lambda
+from aws.lambda_packages import build_package
 
 
 ZIP_FILE_NAME = 'json_creation.zip'
@@ -23,6 +24,7 @@ def create_lambda_function2():
     s3_client = boto3.client('s3', region_name=region)
 
     try:
+        build_package(ZIP_FILE_NAME)
         with open(ZIP_FILE_NAME, 'rb') as f:
             zipped_code = f.read()
 
@@ -69,7 +71,9 @@ def create_lambda_function2():
                 'LambdaFunctionConfigurations': [
                     {
                         'LambdaFunctionArn': f'arn:aws:lambda:{region}:8319xxx614080(change):function:{json_creation_lambda}',
-                        'Events': ['s3:ObjectCreated:*']
+                        'Events': ['s3:ObjectCreated:*'],
+                        # Only the extracted text; the .layout.json files next to it are read, not processed
+                        'Filter': {'Key': {'FilterRules': [{'Name': 'suffix', 'Value': '.txt'}]}}
                     }
                 ]
             }
@@ -2,7 +2,8 @@
 
 import boto3
 import json
-from aws.config import json_extraction_bucket, region,json_appender_lambda
+from aws.config import json_extraction_bucket, region,json_appender_lambda, json_appender_queue
+from aws.lambda_packages import build_package
 
 
 ZIP_FILE_NAME = 'json_appender.zip'
@@ -12,6 +13,14 @@ ARCHITECTURE = 'x86_64'
 HANDLER = 'lambda_function.lambda_handler'
 LAMBDA_TIMEOUT = 60
 LAMBDA_MEMORY = 512
+# Batching of the optional SQS trigger: up to this many uploads per invocation,
+# waiting at most this many seconds to fill a batch.
+QUEUE_BATCH_SIZE = 500
+QUEUE_BATCHING_WINDOW = 20
+# The appender is also invoked on this schedule, without records, to compact the candidate
+# log segments (APPEND_MODE 'segmented') once they are past the grace period. Uploads only
+# write segments, so this schedule is the only thing that compacts.
+COMPACTION_SCHEDULE = 'rate(1 minute)'
 
 
 def create_lambda_function3():
@@ -19,6 +28,7 @@ def create_lambda_function3():
     s3_client = boto3.client('s3', region_name=region)
 
     try:
+        build_package(ZIP_FILE_NAME)
         with open(ZIP_FILE_NAME, 'rb') as f:
             zipped_code = f.read()
 
@@ -73,4 +83,101 @@ def create_lambda_function3():
         return {'message': 'Lambda function and S3 trigger created successfully'}
 
     except Exception as e:
-        return {'error': f'Trigger setup failed: {str(e)}'}
\ No newline at end of file
+        return {'error': f'Trigger setup failed: {str(e)}'}
+
+
+def create_appender_queue_trigger():
+    # Routes json bucket uploads through an SQS queue so the appender merges many candidates
+    # per master-file write. Replaces the direct S3 -> Lambda trigger set up above.
+    sqs_client = boto3.client('sqs', region_name=region)
+    lambda_client = boto3.client('lambda', region_name=region)
+    s3_client = boto3.client('s3', region_name=region)
+
+    try:
+        queue_url = sqs_client.create_queue(
+            QueueName=json_appender_queue,
+            Attributes={'VisibilityTimeout': str(LAMBDA_TIMEOUT * 6)}
+        )['QueueUrl']
+        queue_arn = sqs_client.get_queue_attributes(
+            QueueUrl=queue_url, AttributeNames=['QueueArn']
+        )['Attributes']['QueueArn']
+
+        queue_policy = {
+            "Version": "2012-10-17",
+            "Statement": [{
+                "Effect": "Allow",
+                "Principal": {"Service": "s3.amazonaws.com"},
+                "Action": "sqs:SendMessage",
+                "Resource": queue_arn,
+                "Condition": {"ArnLike": {"aws:SourceArn": f"arn:aws:s3:::{json_extraction_bucket}"}}
+            }]
+        }
+        sqs_client.set_queue_attributes(QueueUrl=queue_url, Attributes={'Policy': json.dumps(queue_policy)})
+        print(f"✅ SQS queue '{json_appender_queue}' ready.")
+
+        s3_client.put_bucket_notification_configuration(
+            Bucket=json_extraction_bucket,
+            NotificationConfiguration={
+                'QueueConfigurations': [
+                    {'QueueArn': queue_arn, 'Events': ['s3:ObjectCreated:*']}
+                ]
+            }
+        )
+        print("✅ S3 notifications now go to the queue.")
+
+        try:
+            lambda_client.create_event_source_mapping(
+                EventSourceArn=queue_arn,
+                FunctionName=json_appender_lambda,
+                BatchSize=QUEUE_BATCH_SIZE,
+                MaximumBatchingWindowInSeconds=QUEUE_BATCHING_WINDOW,
+                FunctionResponseTypes=['ReportBatchItemFailures']
+            )
+            print("✅ Queue trigger added to the appender Lambda.")
+        except lambda_client.exceptions.ResourceConflictException:
+            print("ℹ️ Queue trigger already exists.")
+
+        return {'message': 'Appender queue trigger created successfully'}
+
+    except Exception as e:
+        return {'error': f'Queue trigger setup failed: {str(e)}'}
+
+
+def create_appender_compaction_schedule():
+    # EventBridge rule that invokes the appender every minute with an event without
+    # 'Records', so the last uploads get compacted into candidates.json when traffic stops.
+    events_client = boto3.client('events', region_name=region)
+    lambda_client = boto3.client('lambda', region_name=region)
+    rule_name = f'{json_appender_lambda}-compaction'
+
+    try:
+        function_arn = lambda_client.get_function(FunctionName=json_appender_lambda)['Configuration']['FunctionArn']
+        rule_arn = events_client.put_rule(
+            Name=rule_name,
+            ScheduleExpression=COMPACTION_SCHEDULE,
+            State='ENABLED',
+            Description='Compacts the candidate log segments written by the appender'
+        )['RuleArn']
+        print(f"✅ Schedule rule '{rule_name}' ready.")
+
+        try:
+            lambda_client.add_permission(
+                FunctionName=json_appender_lambda,
+                StatementId='eventbridge-compaction-invoke',
+                Action='lambda:InvokeFunction',
+                Principal='events.amazonaws.com',
+                SourceArn=rule_arn
+            )
+            print("✅ Permission added to allow EventBridge to invoke Lambda.")
+        except lambda_client.exceptions.ResourceConflictException:
+            print("ℹ️ Permission already exists, skipping add_permission.")
+
+        events_client.put_targets(
+            Rule=rule_name,
+            Targets=[{'Id': 'json-appender', 'Arn': function_arn, 'Input': json.dumps({'compact': True})}]
+        )
+        print("✅ Compaction schedule added to the appender Lambda.")
+        return {'message': 'Appender compaction schedule created successfully'}
+
+    except Exception as e:
+        return {'error': f'Compaction schedule setup failed: {str(e)}'}
@@ -2,7 +2,8 @@
 
 import boto3
 import json
-from aws.config import json_dashboard_bucket, region, json_data_anonymus_lambda
+from aws.config import json_dashboard_bucket, region, json_data_anonymus_lambda, pseudonymization_secret_id
+from aws.lambda_packages import build_package
 
 
 ZIP_FILE_NAME = 'lambda_anonymous.zip'
@@ -23,6 +24,7 @@ def create_lambda_function4():
     s3_client = boto3.client('s3', region_name=region)
 
     try:
+        build_package(ZIP_FILE_NAME)
         with open(ZIP_FILE_NAME, 'rb') as f:
             zipped_code = f.read()
 
@@ -37,7 +39,9 @@ def create_lambda_function4():
             MemorySize=LAMBDA_MEMORY,
             Publish=True,
             Architectures=[ARCHITECTURE],
-            Layers=LAYER_ARNs
+            Layers=LAYER_ARNs,
+            # The role also needs secretsmanager:GetSecretValue on this secret.
+            Environment={'Variables': {'PSEUDONYMIZATION_SECRET_ID': pseudonymization_secret_id}}
         )
 
         print("✅ Lambda function created.")
@@ -69,7 +73,9 @@ def create_lambda_function4():
                 'LambdaFunctionConfigurations': [
                     {
                         'LambdaFunctionArn': f'arn:aws:lambda:{region}:83xxx6614080(change):function:{json_data_anonymus_lambda}',
-                        'Events': ['s3:ObjectCreated:*']
+                        'Events': ['s3:ObjectCreated:*'],
+                        # Only the published master file; the appender's segments and snapshots live in the same bucket
+                        'Filter': {'Key': {'FilterRules': [{'Name': 'prefix', 'Value': 'candidates.json'}]}}
                     }
                 ]
             }
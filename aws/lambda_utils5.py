@@ -3,6 +3,7 @@
 import boto3
 import json
 from aws.config import json_anonymous_bucket, region, email_notifier_lambda
+from aws.lambda_packages import build_package
 
 
 ZIP_FILE_NAME = 'ses_notification.zip'
@@ -19,6 +20,7 @@ def create_lambda_function5():
     s3_client = boto3.client('s3', region_name=region)
 
     try:
+        build_package(ZIP_FILE_NAME)
         with open(ZIP_FILE_NAME, 'rb') as f:
             zipped_code = f.read()
 
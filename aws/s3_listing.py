@@ -0,0 +1,211 @@
+import base64
+import bisect
+import datetime
+import json
+import threading
+import time
+
+# In-memory listing of a bucket for the Candidates page.
+#
+# The whole bucket is listed (every page of list_objects_v2) into one snapshot, kept for
+# ttl_seconds. Requests that arrive while a listing is running wait for that listing
+# instead of starting their own, so any number of dashboard users cost one S3 listing per
+# TTL. Once a snapshot exists, an expired one is still served while a background thread
+# lists the bucket again; only the very first request waits for S3.
+#
+# Pages are cut from per-sort-field views of the snapshot. Cursors hold the sort value and
+# key of the last row served (keyset pagination), so paging through a listing that was
+# refreshed in between neither repeats nor skips objects.
+
+SORT_FIELDS = ('last_modified', 'name', 'size')
+DEFAULT_PAGE_SIZE = 50
+MAX_PAGE_SIZE = 500
+
+
+class ListingError(ValueError):
+    """Bad listing parameters (sort field, cursor, date); reported to the client as a 400."""
+
+
+def _sort_value(item: tuple, sort: str):
+    key, size, modified = item
+    return (modified if sort == 'last_modified' else size if sort == 'size' else key), key
+
+
+def encode_cursor(sort: str, order: str, item: tuple) -> str:
+    value, key = _sort_value(item, sort)
+    payload = json.dumps({'s': sort, 'o': order, 'v': value, 'k': key}, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def decode_cursor(cursor: str, sort: str, order: str) -> tuple:
+    try:
+        payload = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+        position = (payload['v'], payload['k'])
+    except (ValueError, KeyError, TypeError):
+        raise ListingError("Invalid cursor.")
+    if payload.get('s') != sort or payload.get('o') != order:
+        raise ListingError("The cursor belongs to a listing with another sort order.")
+    value_type = str if sort == 'name' else (int, float)
+    if not isinstance(position[0], value_type) or not isinstance(position[1], str):
+        raise ListingError("Invalid cursor.")
+    return position
+
+
+def parse_date(value: str, end_of_day: bool = False):
+    """'2024-05-01' or an ISO timestamp (UTC when it has no offset) -> epoch seconds; None for empty."""
+    if not value:
+        return None
+    try:
+        parsed = datetime.datetime.fromisoformat(value)
+    except ValueError:
+        raise ListingError(f"Invalid date: {value}")
+    if parsed.tzinfo is None:
+        parsed = parsed.replace(tzinfo=datetime.timezone.utc)
+    if end_of_day and len(value) == 10:
+        parsed += datetime.timedelta(days=1) - datetime.timedelta(microseconds=1)
+    return parsed.timestamp()
+
+
+class Snapshot:
+    """One listing of the bucket: (key, size, last_modified epoch) tuples and sorted views of them."""
+
+    def __init__(self, items: list, listed_at: float, list_calls: int):
+        self.items = items
+        self.listed_at = listed_at
+        self.list_calls = list_calls
+        self._views = {}
+        self._lock = threading.Lock()
+
+    def view(self, sort: str) -> list:
+        # Sorted ascending by (sort value, key); built on first use, once per snapshot.
+        with self._lock:
+            if sort not in self._views:
+                self._views[sort] = sorted(self.items, key=lambda item: _sort_value(item, sort))
+            return self._views[sort]
+
+
+class S3ListingCache:
+
+    def __init__(self, s3, bucket: str, ttl_seconds: float = 30):
+        self.s3 = s3
+        self.bucket = bucket
+        self.ttl_seconds = ttl_seconds
+        self._snapshot = None
+        self._lock = threading.Lock()
+        self._listing = None  # threading.Event of the listing in progress, if any
+        self._error = None
+        self.stats = {'requests': 0, 'listings': 0, 'coalesced': 0, 'listCalls': 0}
+
+    def _list_bucket(self) -> Snapshot:
+        items, calls = [], 0
+        for page in self.s3.get_paginator('list_objects_v2').paginate(Bucket=self.bucket):
+            calls += 1
+            items.extend((obj['Key'], obj['Size'], obj['LastModified'].timestamp()) for obj in page.get('Contents', []))
+        snapshot = Snapshot(items, time.time(), calls)
+        snapshot.view('last_modified')  # the page's default order, sorted before the snapshot is served
+        return snapshot
+
+    def _refresh(self, done: threading.Event):
+        try:
+            snapshot = self._list_bucket()
+            with self._lock:
+                self._snapshot, self._error = snapshot, None
+                self.stats['listings'] += 1
+                self.stats['listCalls'] += snapshot.list_calls
+        except Exception as e:
+            print(f"⚠️ Listing s3://{self.bucket} failed: {e}")
+            with self._lock:
+                self._error = e
+        finally:
+            with self._lock:
+                self._listing = None
+            done.set()
+
+    def snapshot(self) -> Snapshot:
+        """The current snapshot; waits only when there is none yet."""
+        with self._lock:
+            self.stats['requests'] += 1
+            snapshot, listing = self._snapshot, self._listing
+            expired = snapshot is None or time.time() - snapshot.listed_at > self.ttl_seconds
+            start = expired and listing is None
+            if start:
+                listing = self._listing = threading.Event()
+            elif expired:
+                self.stats['coalesced'] += 1
+        if start and snapshot is not None:
+            threading.Thread(target=self._refresh, args=(listing,), daemon=True).start()
+        elif start:
+            self._refresh(listing)
+        if snapshot is not None:
+            return snapshot
+
+        listing.wait()
+        with self._lock:
+            if self._snapshot is None:
+                raise self._error or RuntimeError(f"Listing s3://{self.bucket} failed.")
+            return self._snapshot
+
+    def page(self, sort: str = 'last_modified', order: str = 'desc', limit: int = DEFAULT_PAGE_SIZE,
+             cursor: str = None, prefix: str = None, since: float = None, until: float = None) -> dict:
+        """
+        One page of the listing, filtered by key prefix and last-modified range (epoch seconds,
+        both inclusive). Returns the rows, the cursor of the next page (None on the last page)
+        and the number of objects matching the filters.
+        """
+        if sort not in SORT_FIELDS:
+            raise ListingError(f"sort must be one of {', '.join(SORT_FIELDS)}.")
+        if order not in ('asc', 'desc'):
+            raise ListingError("order must be asc or desc.")
+        limit = max(1, min(int(limit), MAX_PAGE_SIZE))
+        snapshot = self.snapshot()
+        view = snapshot.view(sort)
+        position_key = lambda item: _sort_value(item, sort)
+
+        # Ascending pages walk the view forwards from the cursor, descending ones backwards.
+        # Filters on the sort field narrow the walk to their range of the view.
+        low, high = 0, len(view)
+        if prefix and sort == 'name':
+            low = bisect.bisect_left(view, (prefix, ''), key=position_key)
+            high = bisect.bisect_left(view, (prefix + '\U0010ffff', ''), key=position_key)
+        elif sort == 'last_modified':
+            if since is not None:
+                low = bisect.bisect_left(view, (since, ''), key=position_key)
+            if until is not None:
+                high = bisect.bisect_right(view, (until, '\U0010ffff'), key=position_key)
+        start, end = low, high
+        if cursor:
+            position = decode_cursor(cursor, sort, order)
+            if order == 'asc':
+                start = max(low, bisect.bisect_right(view, position, key=position_key))
+            else:
+                end = min(high, bisect.bisect_left(view, position, key=position_key))
+
+        def matches(item):
+            key, _, modified = item
+            return ((not prefix or key.startswith(prefix))
+                    and (since is None or modified >= since) and (until is None or modified <= until))
+
+        indexes = range(start, end) if order == 'asc' else range(end - 1, start - 1, -1)
+        rows, next_cursor = [], None
+        for index in indexes:
+            item = view[index]
+            if not matches(item):
+                continue
+            if len(rows) == limit:
+                next_cursor = encode_cursor(sort, order, rows[-1])
+                break
+            rows.append(item)
+
+        filtered = prefix or since is not None or until is not None
+        total = sum(1 for index in range(low, high) if matches(view[index])) if filtered else len(view)
+        return {
+            'files': [{
+                'name': key,
+                'size': round(size / 1024, 2),
+                'last_modified': datetime.datetime.fromtimestamp(modified, datetime.timezone.utc).strftime('%Y-%m-%d %H:%M:%S'),
+                'url': f'https://{self.bucket}.s3.amazonaws.com/{key}',
+            } for key, size, modified in rows],
+            'next_cursor': next_cursor,
+            'total': total,
+            'listed_at': datetime.datetime.fromtimestamp(snapshot.listed_at, datetime.timezone.utc).isoformat(),
+        }
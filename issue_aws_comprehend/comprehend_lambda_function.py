@@ -9,12 +9,28 @@ import uuid
 import time
 from datetime import datetime
 
+# The shared helper modules live in all_lambda_functions/ and are zipped alongside this handler
+# (comprehend_lambda.zip, built by `python -m aws.lambda_packages`).
+from local_name_extractor import extract_name_locally
+from layout_document import header_text, load_layout
+from resume_sections import context_for_field
+from inference_cache import InferenceCache, DynamoDBCacheBackend, SQLiteCacheBackend
+from skill_matcher import SkillMatcher, matcher_for_library
+
 # --- Configuration ---
 # WARNING: For production, it is strongly recommended to use environment variables
 # instead of hardcoding secrets like API keys.
 
 DESTINATION_BUCKET = "specify your bucket"
 GEMINI_API_KEY = "specify your api key" # Still needed for experience summary
+GEMINI_MODEL_NAME = "gemini-1.5-flash"
+# Bump PROMPT_VERSION whenever a prompt changes so cached answers are no longer served.
+PROMPT_VERSION = "comprehend-gemini-trimmed-v3"
+# The local header-based name extractor answers on its own at or above this confidence.
+NAME_CONFIDENCE_THRESHOLD = float(os.environ.get("NAME_CONFIDENCE_THRESHOLD", "0.75"))
+INFERENCE_CACHE_BACKEND = os.environ.get("INFERENCE_CACHE_BACKEND", "dynamodb")  # "dynamodb", "sqlite" or "none"
+INFERENCE_CACHE_TABLE = os.environ.get("INFERENCE_CACHE_TABLE", "specify your table")
+INFERENCE_CACHE_PATH = os.environ.get("INFERENCE_CACHE_PATH", "/tmp/inference_cache.sqlite3")
 # ----------------------------------------------------
 
 
@@ -22,6 +38,14 @@ GEMINI_API_KEY = "specify your api key" # Still needed for experience summary
 s3_client = boto3.client('s3')
 comprehend_client = boto3.client('comprehend') # Added Comprehend client
 
+if INFERENCE_CACHE_BACKEND == "dynamodb":
+    inference_cache = InferenceCache(DynamoDBCacheBackend(boto3.resource('dynamodb').Table(INFERENCE_CACHE_TABLE)),
+                                     PROMPT_VERSION, GEMINI_MODEL_NAME)
+elif INFERENCE_CACHE_BACKEND == "sqlite":
+    inference_cache = InferenceCache(SQLiteCacheBackend(INFERENCE_CACHE_PATH), PROMPT_VERSION, GEMINI_MODEL_NAME)
+else:
+    inference_cache = None
+
 # --- Skill & Language Libraries (kept as is) ---
 TECHNICAL_SKILLS_LIBRARY = [
     # --- Programming Languages & Scripting (40+) ---
@@ -116,20 +140,48 @@ LANGUAGES_SPOKEN_LIBRARY = [
     "persian", "polish", "pashto", "kannada", "malayalam", "dutch"
 ]
 
+# One trie over all three libraries, built once per container, so each resume
+# is scanned a single time instead of once per library entry.
+LIBRARY_MATCHER = SkillMatcher({
+    'technical': TECHNICAL_SKILLS_LIBRARY,
+    'nonTechnical': NON_TECHNICAL_SKILLS_LIBRARY,
+    'languages': LANGUAGES_SPOKEN_LIBRARY,
+})
+
+# How many names were settled by the local extractor vs AWS Comprehend in this container.
+LOCAL_DECISIONS = {'nameLocal': 0, 'nameComprehend': 0}
+
+
+def determine_candidate_name(resume_text: str, header: str = None) -> str:
+    """
+    Uses the local header-based extractor when it is confident, otherwise AWS Comprehend.
+    header (the layout document's header lines, if text_extraction wrote one) replaces the full text.
+    """
+    resume_text = header or resume_text
+    result = extract_name_locally(resume_text)
+    if result['confidence'] >= NAME_CONFIDENCE_THRESHOLD:
+        LOCAL_DECISIONS['nameLocal'] += 1
+        return result['name']
+
+    LOCAL_DECISIONS['nameComprehend'] += 1
+    return get_name_via_comprehend(resume_text)
+
+
 def get_name_via_comprehend(resume_text: str) -> str:
     """
     Extracts a person's name from the first 5 lines of text using AWS Comprehend.
     Selects the name with the highest confidence score.
     """
     try:
-        # Limit analysis to the first few lines where the name is most likely to appear.
-        first_five_lines = "\n".join(resume_text.splitlines()[:5])
-        if not first_five_lines.strip():
+        # Limit analysis to the resume header where the name is most likely to appear.
+        # The extracted text has no line breaks, so splitlines() alone would send everything.
+        header = context_for_field(resume_text, 'name')
+        if not header.strip():
             return "Could not extract name."
 
         # Call AWS Comprehend to detect entities
         response = comprehend_client.detect_entities(
-            Text=first_five_lines,
+            Text=header,
             LanguageCode='en'
         )
 
@@ -156,7 +208,7 @@ def call_gemini_api(prompt: str, api_key: str, error_message: str) -> str:
     """
     Generic function to call the Gemini API with a specific prompt, now with a retry mechanism.
     """
-    model_name = "gemini-1.5-flash"
+    model_name = GEMINI_MODEL_NAME
     url = f"https://generativelanguage.googleapis.com/v1beta/models/{model_name}:generateContent?key={api_key}"
     payload = {"contents": [{"parts": [{"text": prompt}]}]}
     headers = {'Content-Type': 'application/json'}
@@ -190,9 +242,15 @@ def call_gemini_api(prompt: str, api_key: str, error_message: str) -> str:
 
     return error_message # Should not be reached, but as a fallback
 
-def get_experience_summary_via_gemini(resume_text: str, api_key: str) -> str:
-    """Creates a 1-2 line experience summary using the Gemini API with a strict confidence check."""
-    if not resume_text: return "Not defined"
+def get_experience_summary_via_gemini(resume_text: str, api_key: str) -> tuple:
+    """
+    Creates a 1-2 line experience summary using the Gemini API with a strict confidence check.
+    Returns (summary, answered): answered is False when the summary is the "Not defined"
+    fallback for an API error, a refusal or empty input rather than Gemini's answer.
+    """
+    if not resume_text: return "Not defined", False
+
+    prompt_context = context_for_field(resume_text, 'summary')
 
     prompt = f"""
     Act as an expert technical recruiter. Analyze the following resume text and provide a 1-2 line professional summary.
@@ -204,17 +262,19 @@ def get_experience_summary_via_gemini(resume_text: str, api_key: str) -> str:
 
     Resume Text:
     ---
-    {resume_text}
+    {prompt_context}
     ---
     """
 
     api_response = call_gemini_api(prompt, api_key, "NONE")
 
     response_lower = api_response.lower()
-    if "none" in response_lower or "sorry" in response_lower or "unable" in response_lower or not api_response or "error" in response_lower:
-        return "Not defined"
+    if not api_response or "error" in response_lower or "sorry" in response_lower or "unable" in response_lower:
+        return "Not defined", False
+    if "none" in response_lower:
+        return "Not defined", True
 
-    return api_response
+    return api_response, True
 
 def extract_contact_info(resume_text: str) -> dict:
     """Extracts email and phone number using regex."""
@@ -228,12 +288,7 @@ def extract_contact_info(resume_text: str) -> dict:
 
 def extract_items_from_library(resume_text: str, library: list) -> list:
     """Generic function to find items from a given library within the resume text."""
-    found_items = set()
-    lower_resume = resume_text.lower()
-    for item in library:
-        if re.search(r'\b' + re.escape(item) + r'\b', lower_resume):
-            found_items.add(item.title())
-    return sorted(list(found_items))
+    return matcher_for_library(library).extract_items(resume_text)['items']
 
 def lambda_handler(event, context):
     """Main AWS Lambda handler function triggered by S3 file upload."""
@@ -242,18 +297,39 @@ def lambda_handler(event, context):
         source_key = urllib.parse.unquote_plus(event['Records'][0]['s3']['object']['key'], encoding='utf-8')
         print(f"New file detected: '{source_key}' in bucket '{source_bucket}'.")
 
+        if not source_key.endswith('.txt'):
+            print(f"Skipping '{source_key}', only extracted .txt files are processed.")
+            return {'statusCode': 200, 'body': json.dumps(f"Skipped '{source_key}'.")}
+
         s3_object = s3_client.get_object(Bucket=source_bucket, Key=source_key)
         resume_text = s3_object['Body'].read().decode('utf-8')
+        layout = load_layout(s3_client, source_bucket, source_key)
 
         print("Extracting details...")
-        # MODIFIED: Use AWS Comprehend for name extraction
-        extracted_name = get_name_via_comprehend(resume_text)
-        # Gemini is still used for the experience summary
-        experience_summary = get_experience_summary_via_gemini(resume_text, GEMINI_API_KEY)
+        cached_fields = inference_cache.get(resume_text) if inference_cache else None
+        if cached_fields is not None:
+            print("Inference cache hit. Skipping Comprehend and Gemini.")
+            extracted_name = cached_fields['name']
+            experience_summary = cached_fields['experienceSummary']
+        else:
+            started = time.perf_counter()
+            # MODIFIED: Use the local header extractor, falling back to AWS Comprehend
+            extracted_name = determine_candidate_name(resume_text, header_text(layout) if layout else None)
+            # Gemini is still used for the experience summary
+            experience_summary, summary_answered = get_experience_summary_via_gemini(resume_text, GEMINI_API_KEY)
+            # Error fallbacks ("... due to AWS error.", a failed Gemini call) are not cached so they get retried.
+            if inference_cache and "error" not in extracted_name.lower() and summary_answered:
+                inference_cache.put(resume_text, {'name': extracted_name, 'experienceSummary': experience_summary},
+                                    compute_ms=(time.perf_counter() - started) * 1000)
+        print(f"Names settled locally: {LOCAL_DECISIONS['nameLocal']}/"
+              f"{LOCAL_DECISIONS['nameLocal'] + LOCAL_DECISIONS['nameComprehend']} in this container.")
+        if inference_cache:
+            print(f"Inference cache stats: {inference_cache.stats}, hit rate {inference_cache.hit_rate():.0%}")
         contact_info = extract_contact_info(resume_text)
-        technical_skills = extract_items_from_library(resume_text, TECHNICAL_SKILLS_LIBRARY)
-        non_technical_skills = extract_items_from_library(resume_text, NON_TECHNICAL_SKILLS_LIBRARY)
-        languages_spoken = extract_items_from_library(resume_text, LANGUAGES_SPOKEN_LIBRARY)
+        library_items = LIBRARY_MATCHER.extract_items(resume_text)
+        technical_skills = library_items['technical']
+        non_technical_skills = library_items['nonTechnical']
+        languages_spoken = library_items['languages']
         print("Extraction complete.")
 
         # Get current UTC time in ISO 8601 format
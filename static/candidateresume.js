@@ -1,17 +1,27 @@
-document.addEventListener("DOMContentLoaded", async () => {
+document.addEventListener("DOMContentLoaded", () => {
     const tableBody = document.getElementById("tableBody");
+    const status = document.getElementById("listingStatus");
+    const loadMore = document.getElementById("loadMore");
+    const filters = document.getElementById("filters");
+    let nextCursor = null;
+    let shown = 0;
 
-    try {
-        const response = await fetch("/list-files");
-        const files = await response.json();
-
-        if (!Array.isArray(files)) {
-            tableBody.innerHTML = `<tr><td colspan="4">Error loading files</td></tr>`;
-            return;
+    // The listing is paged on the server; each page asks for the rows after the cursor of the previous one.
+    function listingUrl(cursor) {
+        const params = new URLSearchParams({
+            sort: document.getElementById("sort").value,
+            order: document.getElementById("order").value,
+            limit: 50,
+        });
+        for (const field of ["prefix", "since", "until"]) {
+            const value = document.getElementById(field).value.trim();
+            if (value) params.set(field, value);
         }
+        if (cursor) params.set("cursor", cursor);
+        return `/list-files?${params}`;
+    }
 
-        tableBody.innerHTML = "";
-
+    function addRows(files) {
         files.forEach(file => {
             const row = document.createElement("tr");
 
@@ -24,8 +34,47 @@ document.addEventListener("DOMContentLoaded", async () => {
 
             tableBody.appendChild(row);
         });
-    } catch (err) {
-        console.error(err);
-        tableBody.innerHTML = `<tr><td colspan="4">Error fetching file list</td></tr>`;
     }
+
+    async function loadPage(cursor) {
+        loadMore.disabled = true;
+        try {
+            const response = await fetch(listingUrl(cursor));
+            const page = await response.json();
+
+            if (!response.ok || !Array.isArray(page.files)) {
+                tableBody.innerHTML = `<tr><td colspan="4">Error loading files${page.error ? ": " + page.error : ""}</td></tr>`;
+                loadMore.style.display = "none";
+                return;
+            }
+
+            if (!cursor) {
+                tableBody.innerHTML = "";
+                shown = 0;
+            }
+            addRows(page.files);
+            shown += page.files.length;
+            if (!tableBody.children.length) {
+                tableBody.innerHTML = `<tr><td colspan="4">No files found</td></tr>`;
+            }
+
+            nextCursor = page.next_cursor;
+            status.textContent = `Showing ${shown} of ${page.total} files (listed ${new Date(page.listed_at).toLocaleTimeString()})`;
+            loadMore.style.display = nextCursor ? "inline-block" : "none";
+        } catch (err) {
+            console.error(err);
+            tableBody.innerHTML = `<tr><td colspan="4">Error fetching file list</td></tr>`;
+        } finally {
+            loadMore.disabled = false;
+        }
+    }
+
+    filters.addEventListener("submit", event => {
+        event.preventDefault();
+        tableBody.innerHTML = `<tr><td colspan="4">Loading files...</td></tr>`;
+        loadPage(null);
+    });
+    loadMore.addEventListener("click", () => loadPage(nextCursor));
+
+    loadPage(null);
 });
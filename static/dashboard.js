@@ -8,38 +8,57 @@
  */
 
 // --- STATE MANAGEMENT ---
-let masterCandidatesData = [];
-let filteredCandidatesData = [];
+// Filtering, sorting and pagination run on the server (/api/candidates); the page only
+// holds the candidates it shows.
+let pageCandidatesData = [];
+let totalMatches = 0;
 let currentPage = 1;
 const ITEMS_PER_PAGE = 5;
-let sortState = { column: null, direction: 'asc' };
+const FACET_OPTIONS = 15;
+let sortState = { column: 'uploadDate', direction: 'desc' };
+let searchTimer = null;
+let latestRequest = 0;
 
 // --- INITIALIZATION ---
 document.addEventListener('DOMContentLoaded', initializeDashboard);
 
 async function initializeDashboard() {
     try {
-        const data = await fetchCandidates();
-        if (!Array.isArray(data)) {
-            throw new Error("Fetched data is not a valid JSON array. Please check the file content.");
-        }
-        masterCandidatesData = data;
-        filteredCandidatesData = [...masterCandidatesData];
-
         setupEventListeners();
-        updateDashboard();
+        await updateDashboard();
     } catch (error) {
         console.error("Dashboard Initialization Failed:", error);
-        displayFatalError("Could not load candidate data. Please check the S3 bucket permissions (CORS), ensure the file is public, or verify the file URL and try again.");
+        displayFatalError("Could not load candidate data. Please check that the server can read candidates.json from the dashboard bucket and try again.");
     }
 }
 
-async function fetchCandidates() {
-    const dataUrl = 'PLEASE SPECIFY THIS YOURSELF';
-    const response = await fetch(`${dataUrl}?t=${new Date().getTime()}`, {
-        cache: 'no-cache'
-    });
+function queryParams() {
+    const params = new URLSearchParams({ sort: sortState.column, order: sortState.direction });
+    const searchTerm = document.getElementById('searchInput').value.trim();
+    const skill = document.getElementById('skillFilter').value;
+    const language = document.getElementById('languageFilter').value;
+    const postgrad = document.getElementById('postgradFilter').value;
+    const skillQuery = document.getElementById('skillQuery').value.trim();
+    if (searchTerm) params.set('q', searchTerm);
+    if (skillQuery) params.set('expr', skillQuery);
+    if (skill) params.set('skill', skill);
+    if (language) params.set('language', language);
+    if (postgrad) params.set('postgrad', postgrad);
+    return params;
+}
 
+async function fetchCandidates() {
+    const params = queryParams();
+    params.set('offset', (currentPage - 1) * ITEMS_PER_PAGE);
+    params.set('limit', ITEMS_PER_PAGE);
+    params.set('facets', 'skill,language');
+    params.set('facet_limit', FACET_OPTIONS);
+    const response = await fetch(`/api/candidates?${params}`);
+
+    if (response.status === 400) {
+        // A skill query that does not parse: shown in place of the count, the table is kept.
+        return { invalid: (await response.json()).error };
+    }
     if (!response.ok) {
         throw new Error(`Network response was not ok: ${response.status} ${response.statusText}`);
     }
@@ -47,26 +66,60 @@ async function fetchCandidates() {
 }
 
 function setupEventListeners() {
-    document.getElementById('searchInput').addEventListener('input', filterData);
+    // Waits for a pause in typing instead of querying on every keystroke.
+    for (const id of ['searchInput', 'skillQuery']) {
+        document.getElementById(id).addEventListener('input', () => {
+            clearTimeout(searchTimer);
+            searchTimer = setTimeout(filterData, 250);
+        });
+    }
     document.getElementById('skillFilter').addEventListener('change', filterData);
+    document.getElementById('languageFilter').addEventListener('change', filterData);
+    document.getElementById('postgradFilter').addEventListener('change', filterData);
 }
 
 // --- DATA MANIPULATION & DISPLAY ---
-function updateDashboard() {
-    updateStats();
+async function updateDashboard() {
+    // Responses can arrive out of order while the user types; only the latest one is shown.
+    const request = ++latestRequest;
+    const result = await fetchCandidates();
+    if (request !== latestRequest) return;
+    if (result.invalid) {
+        document.getElementById('candidateCount').textContent = result.invalid;
+        return;
+    }
+
+    pageCandidatesData = result.candidates;
+    totalMatches = result.total;
+    updateStats(result.stats);
+    updateFacetOptions('skillFilter', 'All Skills', result.facets.skill);
+    updateFacetOptions('languageFilter', 'All Languages', result.facets.language);
     renderTable();
     updatePagination();
+    if (result.unknownTerms?.length) {
+        document.getElementById('candidateCount').textContent += ` (no candidate has ${result.unknownTerms.join(', ')})`;
+    }
 }
 
-function updateStats() {
-    const totalUploads = masterCandidatesData.length;
-
-    let errorCount = 0;
-    masterCandidatesData.forEach(candidate => {
-        if (candidate?.name?.toLowerCase().includes("error")) {
-            errorCount++;
-        }
+// The filter options are the most common values among the current matches, with counts.
+function updateFacetOptions(selectId, allLabel, facetValues) {
+    const select = document.getElementById(selectId);
+    const selected = select.value;
+    const options = [`<option value="">${allLabel}</option>`];
+    const values = facetValues.map(facet => facet.value);
+    if (selected && !values.includes(selected)) {
+        options.push(`<option value="${escapeHtml(selected)}">${escapeHtml(selected)}</option>`);
+    }
+    facetValues.forEach(facet => {
+        options.push(`<option value="${escapeHtml(facet.value)}">${escapeHtml(facet.value)} (${facet.count})</option>`);
     });
+    select.innerHTML = options.join('');
+    select.value = selected;
+}
+
+function updateStats(stats) {
+    const totalUploads = stats.totalUploads;
+    const errorCount = stats.errors;
 
     const successCount = totalUploads - errorCount;
     const successRate = totalUploads > 0 ? Math.round((successCount / totalUploads) * 100) : 0;
@@ -78,46 +131,22 @@ function updateStats() {
 }
 
 function filterData() {
-    const searchTerm = document.getElementById('searchInput').value.toLowerCase();
-    const skillFilter = document.getElementById('skillFilter').value.toLowerCase();
-
-    filteredCandidatesData = masterCandidatesData.filter(candidate => {
-        if (!candidate || !candidate.name) return false;
-
-        const allSkills = [
-            ...(candidate.skills?.technical || []),
-            ...(candidate.skills?.nonTechnical || [])
-        ];
-
-        const matchesSearch = searchTerm === '' ||
-            candidate.name.toLowerCase().includes(searchTerm) ||
-            (candidate.email && candidate.email.toLowerCase().includes(searchTerm)) ||
-            allSkills.some(skill => skill.toLowerCase().includes(searchTerm));
-
-        const matchesSkill = skillFilter === '' ||
-            allSkills.some(skill => skill.toLowerCase().includes(skillFilter));
-
-        return matchesSearch && matchesSkill;
-    });
-
     currentPage = 1;
-    updateDashboard();
+    updateDashboard().catch(error => console.error("Filtering failed:", error));
 }
 
 function renderTable() {
     const tableBody = document.getElementById('candidatesTableBody');
     tableBody.innerHTML = '';
 
-    document.getElementById('candidateCount').textContent = `Showing ${filteredCandidatesData.length} candidate${filteredCandidatesData.length !== 1 ? 's' : ''}`;
+    document.getElementById('candidateCount').textContent = `Showing ${totalMatches} candidate${totalMatches !== 1 ? 's' : ''}`;
 
-    if (filteredCandidatesData.length === 0) {
+    if (totalMatches === 0) {
         tableBody.innerHTML = `<tr><td colspan="8" class="no-results">No candidates found matching your criteria.</td></tr>`;
         return;
     }
 
-    const pageData = filteredCandidatesData.slice((currentPage - 1) * ITEMS_PER_PAGE, currentPage * ITEMS_PER_PAGE);
-
-    pageData.forEach(candidate => {
+    pageCandidatesData.forEach(candidate => {
         const row = document.createElement('tr');
         const allSkills = [
             ...(candidate.skills?.technical || []),
@@ -150,7 +179,8 @@ function renderTable() {
 
 function sortTable(columnIndex) {
     const columnKey = ['name', 'email', 'skills', 'experienceSummary', 'uploadDate', 'status'][columnIndex - 1];
-    if (columnKey === 'status') return;
+    // The server sorts by name, email, experience summary and upload date.
+    if (columnKey === 'status' || columnKey === 'skills') return;
 
     if (sortState.column === columnKey) {
         sortState.direction = sortState.direction === 'asc' ? 'desc' : 'asc';
@@ -159,37 +189,13 @@ function sortTable(columnIndex) {
         sortState.direction = 'asc';
     }
 
-    filteredCandidatesData.sort((a, b) => {
-        let valA = a[columnKey] || '';
-        let valB = b[columnKey] || '';
-
-        if (!valA) return 1;
-        if (!valB) return -1;
-
-        if (columnKey === 'skills') {
-            const skillsA = [...(a.skills?.technical || []), ...(a.skills?.nonTechnical || [])];
-            const skillsB = [...(b.skills?.technical || []), ...(b.skills?.nonTechnical || [])];
-            valA = skillsA.join(', ');
-            valB = skillsB.join(', ');
-        }
-
-        if (typeof valA === 'string' && columnKey !== 'uploadDate') {
-            valA = valA.toLowerCase();
-            valB = valB.toLowerCase();
-        }
-
-        if (valA < valB) return sortState.direction === 'asc' ? -1 : 1;
-        if (valA > valB) return sortState.direction === 'asc' ? 1 : -1;
-        return 0;
-    });
-
     currentPage = 1;
-    updateDashboard();
+    updateDashboard().catch(error => console.error("Sorting failed:", error));
 }
 
 // --- UI ACTIONS & MODALS ---
 function viewResume(id) {
-    const candidate = masterCandidatesData.find(c => c.candidateId == id);
+    const candidate = pageCandidatesData.find(c => c.candidateId == id);
     if (!candidate) return;
 
     const allSkills = [
@@ -233,29 +239,9 @@ function viewResume(id) {
 }
 
 function downloadCSV() {
-    const headers = ['ID', 'Name', 'Email', 'Upload Date', 'Experience Summary', 'Skills', 'Languages'];
-    const rows = filteredCandidatesData.map(c => {
-        const allSkills = [...(c.skills?.technical || []), ...(c.skills?.nonTechnical || [])];
-        const languages = Array.isArray(c.languages) ? c.languages.join('; ') : (c.languages || 'N/A');
-        return [
-            c.candidateId,
-            c.name,
-            c.email || 'N/A',
-            c.uploadDate || 'N/A',
-            (c.experienceSummary || '').replace(/,/g, ''),
-            allSkills.join('; '),
-            languages
-        ];
-    });
-
-    let csvContent = "data:text/csv;charset=utf-8," +
-        headers.join(",") + "\n" +
-        rows.map(e => e.map(cell => `"${(cell || '').replace(/"/g, '""')}"`).join(",")).join("\n");
-
-    const encodedUri = encodeURI(csvContent);
+    // The export holds every candidate matching the current filters, not just this page.
     const link = document.createElement("a");
-    link.setAttribute("href", encodedUri);
-    link.setAttribute("download", `candidates_${new Date().toISOString().slice(0, 10)}.csv`);
+    link.setAttribute("href", `/api/candidates/export?${queryParams()}`);
     document.body.appendChild(link);
     link.click();
     document.body.removeChild(link);
@@ -263,7 +249,7 @@ function downloadCSV() {
 
 // --- PAGINATION ---
 function updatePagination() {
-    const totalPages = Math.ceil(filteredCandidatesData.length / ITEMS_PER_PAGE) || 1;
+    const totalPages = Math.ceil(totalMatches / ITEMS_PER_PAGE) || 1;
     document.getElementById('currentPage').textContent = currentPage;
     document.getElementById('totalPages').textContent = totalPages;
 
@@ -274,12 +260,11 @@ function updatePagination() {
 }
 
 function changePage(direction) {
-    const totalPages = Math.ceil(filteredCandidatesData.length / ITEMS_PER_PAGE);
+    const totalPages = Math.ceil(totalMatches / ITEMS_PER_PAGE);
     const newPage = currentPage + direction;
     if (newPage >= 1 && newPage <= totalPages) {
         currentPage = newPage;
-        renderTable();
-        updatePagination();
+        updateDashboard().catch(error => console.error("Loading the page failed:", error));
     }
 }
 
@@ -324,6 +309,9 @@ window.closeModal = () => document.getElementById('resumeModal').style.display =
 window.clearFilters = () => {
     document.getElementById('searchInput').value = '';
     document.getElementById('skillFilter').value = '';
+    document.getElementById('skillQuery').value = '';
+    document.getElementById('languageFilter').value = '';
+    document.getElementById('postgradFilter').value = '';
     filterData();
 };
 window.toggleSelectAll = () => {